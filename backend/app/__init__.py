@@ -8,6 +8,7 @@ from app.routes.auth_routes import auth_bp
 from app.routes.main_routes import main_bp
 from app.routes.analytics_routes import analytics_bp
 from app.routes.camera_routes import camera_bp
+from app.services.indexes import ensure_indexes
 
 # Create JWT manager
 jwt = JWTManager()
@@ -31,6 +32,10 @@ def create_app():
     client = MongoClient(app.config["MONGO_URI"])  # You will need to update the URI in the config file
     app.db = client.get_database('surveil')  # Specify your database name here
 
+    # Create the indexes the routes and the query tool rely on (idempotent)
+    if app.config.get("ENSURE_INDEXES", True):
+        ensure_indexes(client)
+
     # Initialize JWT
     jwt.init_app(app)
     print("[INFO] MongoDB and JWT initialized")
@@ -4,6 +4,9 @@ from datetime import datetime
 from dotenv import load_dotenv
 import os
 
+from app.detection.detection_schema import adapt_query, to_v1, NO_DETECTIONS
+from app.detection.track_store import to_track_query
+
 
 load_dotenv()
 mongo_uri = os.getenv('MONGO_URI')
@@ -19,6 +22,10 @@ MongoDB collection stores surveillance video frames. Each document has:
   camera_id: string,
   frame_timestamp: ISODate,
   frame_number: int,
+  frame_step: int,
+  source_fps: float,
+  analysis_fps: float,
+  interpolated: bool,
   detections: [
     {{
       object_id: string,
@@ -84,7 +91,7 @@ def safe_eval_query(query_str: str) -> dict:
 
 from collections import defaultdict
 
-FRAME_TOLERANCE = 5  # how many skipped frames are tolerated
+FRAME_TOLERANCE = 5  # how many skipped frames are tolerated (in analysed frames)
 
 feeds_collection = mongo_client["SurveillanceAI"]["camera_feeds"]
 
@@ -97,69 +104,117 @@ def get_video_path(camera_id: str) -> str:
 from moviepy.video.io.VideoFileClip import VideoFileClip
 import os
 
-FPS = 30  # Change if your video has different framerate
+FPS = 30  # fallback for documents that do not record the source frame rate
 
-def save_clip(video_path, start_frame, end_frame, output_path):
+def save_clip(video_path, start_frame, end_frame, output_path, fps=FPS):
     try:
-        start_time = start_frame / FPS
-        end_time = end_frame / FPS
-        clip = VideoFileClip(video_path).subclip(start_time, end_time)
+        # frame numbers are source video frames, also when the analysis skipped frames
+        start_time = start_frame / fps
+        end_time = (end_frame + 1) / fps
+        video = VideoFileClip(video_path)
+        clip = video.subclip(start_time, min(end_time, video.duration))
         clip.write_videofile(output_path, codec='libx264', audio=False)
         return output_path
     except Exception as e:
         return f"Clip error: {str(e)}"
 
+tracks_collection = mongo_client["SurveillanceAI"]["tracks"]
+
+def find_track_spans(track_query: dict):
+    spans = []
+    cursor = tracks_collection.find(track_query, {"trajectory": 0, "attribute_scores": 0})
+    for doc in cursor:
+        spans.append({
+            "video_id": doc["video_id"],
+            "camera_id": doc["camera_id"],
+            "start_frame": doc["first_frame"],
+            "start_time": doc["first_seen"],
+            "end_frame": doc["last_frame"],
+            "end_time": doc["last_seen"],
+            "frame_step": doc.get("frame_step", 1),
+            "fps": doc.get("source_fps") or FPS
+        })
+    return spans
+
+def tracked_coverage(track_query: dict):
+    """
+    (video_id, first_seen, last_seen) of every analysis run with tracks in
+    the camera/video/time scope of track_query: the frames those runs
+    stored are already answered by their tracks.
+    """
+    scope = {k: v for k, v in track_query.items() if k in ("camera_id", "video_id", "first_seen", "last_seen")}
+    rows = tracks_collection.aggregate([
+        {"$match": scope},
+        {"$group": {"_id": {"run_id": "$run_id", "video_id": "$video_id"},
+                    "start": {"$min": "$first_seen"}, "end": {"$max": "$last_seen"}}},
+    ])
+    return [(row["_id"]["video_id"], row["start"], row["end"]) for row in rows]
+
+def find_frame_spans(query: dict, exclude=()):
+    # frame documents are stored in the v1 layout of schema_description or
+    # the compact v2 one (detection_schema); the query is written for v1.
+    # exclude: (video_id, start, end) windows covered by the track store
+    frame_query = adapt_query(query)
+    if exclude:
+        frame_query = {"$and": [frame_query, {"$nor": [
+            adapt_query({"video_id": video_id, "frame_timestamp": {"$gte": start, "$lte": end}})
+            for video_id, start, end in exclude
+        ]}]}
+    cursor = collection.find(frame_query, NO_DETECTIONS)
+    spans = []
+    for doc in map(to_v1, cursor):
+        spans.append({
+            "video_id": doc["video_id"],
+            "camera_id": doc["camera_id"],
+            "start_frame": doc["frame_number"],
+            "start_time": doc["frame_timestamp"],
+            "end_frame": doc["frame_number"],
+            "end_time": doc["frame_timestamp"],
+            "frame_step": doc.get("frame_step", 1),
+            "fps": doc.get("source_fps") or FPS
+        })
+    return spans
+
+def merge_spans(spans):
+    """Merge frame spans of the same video/camera that are at most FRAME_TOLERANCE apart."""
+    # Group spans by video/camera
+    span_groups = defaultdict(list)
+    for span in spans:
+        span_groups[(span["video_id"], span["camera_id"])].append(span)
+
+    clips = []
+    for spans in span_groups.values():
+        spans = sorted(spans, key=lambda s: s["start_frame"])
+        current_clip = dict(spans[0])
+        for span in spans[1:]:
+            # sampled analyses only store every frame_step-th frame
+            if span["start_frame"] - current_clip["end_frame"] <= FRAME_TOLERANCE * span["frame_step"]:
+                # Extend current clip
+                if span["end_frame"] > current_clip["end_frame"]:
+                    current_clip["end_frame"] = span["end_frame"]
+                    current_clip["end_time"] = span["end_time"]
+            else:
+                # Save current clip and start new
+                clips.append(current_clip)
+                current_clip = dict(span)
+        clips.append(current_clip)  # Add final clip
+    return clips
+
 def query_mongodb(query_str: str) -> str:
     try:
         query = safe_eval_query(query_str)
-        cursor = collection.find(query).sort([
-            ("video_id", 1),
-            ("frame_number", 1)
-        ])
-
-        # Group frames by video/camera
-        frame_groups = defaultdict(list)
-        for doc in cursor:
-            key = (doc["video_id"], doc["camera_id"])
-            frame_groups[key].append({
-                "frame_number": doc["frame_number"],
-                "timestamp": doc["frame_timestamp"]
-            })
-
-        clips = []
-
-        for (video_id, camera_id), frames in frame_groups.items():
-            frames = sorted(frames, key=lambda f: f["frame_number"])
-            current_clip = {
-                "video_id": video_id,
-                "camera_id": camera_id,
-                "start_frame": frames[0]["frame_number"],
-                "start_time": frames[0]["timestamp"],
-                "end_frame": frames[0]["frame_number"],
-                "end_time": frames[0]["timestamp"]
-            }
-
-            for i in range(1, len(frames)):
-                prev = frames[i - 1]["frame_number"]
-                curr = frames[i]["frame_number"]
-
-                if curr - prev <= FRAME_TOLERANCE:
-                    # Extend current clip
-                    current_clip["end_frame"] = curr
-                    current_clip["end_time"] = frames[i]["timestamp"]
-                else:
-                    # Save current clip and start new
-                    clips.append(current_clip)
-                    current_clip = {
-                        "video_id": video_id,
-                        "camera_id": camera_id,
-                        "start_frame": curr,
-                        "start_time": frames[i]["timestamp"],
-                        "end_frame": curr,
-                        "end_time": frames[i]["timestamp"]
-                    }
-
-            clips.append(current_clip)  # Add final clip
+
+        # person presence is answered from the track store when possible,
+        # which scans one document per person instead of one per frame;
+        # frames of runs without tracks (--store frames, older analyses)
+        # are still scanned, and overlapping spans merge below
+        track_query = to_track_query(query)
+        spans, covered = [], []
+        if track_query is not None:
+            spans = find_track_spans(track_query)
+            covered = tracked_coverage(track_query)
+        spans += find_frame_spans(query, covered)
+        clips = merge_spans(spans)
 
         if not clips:
             return None
@@ -176,7 +231,7 @@ def query_mongodb(query_str: str) -> str:
             output_filename = f"{clip['video_id']}_{clip['start_frame']}_{clip['end_frame']}.mp4"
             output_path = os.path.join("clips", output_filename)
 
-            result = save_clip(video_path, clip["start_frame"], clip["end_frame"], output_path)
+            result = save_clip(video_path, clip["start_frame"], clip["end_frame"], output_path, fps=clip["fps"])
             clip_paths.append({"video": result, "location": video_location})
 
         return clip_paths
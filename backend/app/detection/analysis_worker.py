@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Long-running analysis worker.
+
+Started by app.detection.detect (cwd = backend) as
+
+    python ./app/detection/analysis_worker.py [working_yolov9 options...]
+
+It builds one DetectionPipeline (models loaded once) and then runs one
+video analysis job at a time. Commands arrive on stdin and events leave on
+stdout, one JSON object per line:
+
+    -> {"cmd": "run", "job_id": ..., "video": ..., "savepath": ..., "camera_id": ..., "classes": [...],
+        "analysis_fps": ...}
+    -> {"cmd": "cancel", "job_id": ...}
+    -> {"cmd": "shutdown"}
+    <- {"event": "ready", "pid": ...}
+    <- {"event": "started", "job_id": ...}
+    <- {"event": "progress", "job_id": ..., "frames": ..., "total_frames": ...}
+    <- {"event": "finished", "job_id": ..., "status": "completed" | "cancelled" | "failed", "error": ...,
+        "frames": ..., "total_frames": ...}
+
+Anything the detection code prints goes to stderr, so stdout only carries
+the protocol.
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+PROGRESS_INTERVAL = 1.0   # seconds between progress events
+
+
+# keep the real stdout for the protocol and send everything else to stderr
+_protocol = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1)
+os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+_protocol_lock = threading.Lock()
+
+
+def send(event, **fields):
+    fields["event"] = event
+    with _protocol_lock:
+        _protocol.write(json.dumps(fields) + "\n")
+        _protocol.flush()
+
+
+import working_yolov9 as detector  # noqa: E402
+from detection_pipeline import DetectionPipeline  # noqa: E402
+
+from logging import getLogger  # noqa: E402
+logger = getLogger(__name__)
+
+
+class JobRunner:
+    """Reads commands on a background thread and runs jobs on the main thread."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.jobs = queue.Queue()
+        self.current = None
+        self.cancelled = set()   # jobs cancelled before they started
+        self.cancel = threading.Event()
+        self.lock = threading.Lock()
+
+    def read_commands(self):
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                command = json.loads(line)
+            except ValueError:
+                logger.error(f"analysis worker: bad command {line!r}")
+                continue
+            cmd = command.get("cmd")
+            if cmd == "run":
+                self.jobs.put(command)
+            elif cmd == "cancel":
+                with self.lock:
+                    if self.current == command.get("job_id"):
+                        self.cancel.set()
+                    else:
+                        self.cancelled.add(command.get("job_id"))
+            elif cmd == "shutdown":
+                break
+        # stdin closed or shutdown: stop the running job and exit
+        self.cancel.set()
+        self.jobs.put(None)
+
+    def run_job(self, job):
+        job_id = job["job_id"]
+        counts = {"frames": 0, "total_frames": 0}
+        last_sent = [0.0]
+
+        def progress(frames, total_frames):
+            counts.update(frames=frames, total_frames=total_frames)
+            now = time.monotonic()
+            if now - last_sent[0] >= PROGRESS_INTERVAL:
+                last_sent[0] = now
+                send("progress", job_id=job_id, **counts)
+
+        with self.lock:
+            if job_id in self.cancelled:
+                self.cancelled.discard(job_id)
+                send("finished", job_id=job_id, status="cancelled", error=None, **counts)
+                return
+            self.current = job_id
+            self.cancel.clear()
+        send("started", job_id=job_id)
+        try:
+            finished = self.pipeline.process_video(
+                job["video"],
+                savepath=job.get("savepath"),
+                camera_id=job["camera_id"],
+                classes=job.get("classes") or None,
+                analysis_fps=job.get("analysis_fps"),
+                progress=progress,
+                cancel=self.cancel,
+            )
+            status = "completed" if finished else "cancelled"
+            send("finished", job_id=job_id, status=status, error=None, **counts)
+        except SystemExit:
+            # the capture helpers call sys.exit() when a source cannot be opened
+            send("finished", job_id=job_id, status="failed", error=f"cannot open video {job['video']}", **counts)
+        except Exception as e:
+            logger.exception(f"analysis job {job_id} failed")
+            send("finished", job_id=job_id, status="failed", error=str(e), **counts)
+        finally:
+            with self.lock:
+                self.current = None
+
+    def serve(self):
+        threading.Thread(target=self.read_commands, name="worker-commands", daemon=True).start()
+        send("ready", pid=os.getpid())
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                self.run_job(job)
+        finally:
+            self.pipeline.close()
+
+
+def main():
+    # jobs always run in video mode and bring their own source
+    if '-v' not in sys.argv and '--video' not in sys.argv:
+        sys.argv += ['--video', '0']
+    args = detector.parse_args()
+    pipeline = DetectionPipeline(detector.get_config(args, headless=True))
+    JobRunner(pipeline).serve()
+
+
+if __name__ == '__main__':
+    main()
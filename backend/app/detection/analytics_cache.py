@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Analytics response cache.
+
+The analytics routes (routes/analytics_routes.py) cache their counts and
+series per time window [start, end). A closed window (end in the past) is
+cached until a write touches it, an open one (e.g. "today") at most
+OPEN_TTL seconds.
+
+Writes reach the cache through CacheUpdater, a DetectionWriter listener of
+the detection pipeline. The pipeline runs in other processes than the
+application, so every flushed batch is recorded as a write event
+({created, min_ts, max_ts} in SurveillanceAI.analytics_cache_events), and
+the shared entries are updated directly:
+
+  LRUBackend    in-process and bounded. AnalyticsCache polls the write
+                events (at most every SYNC_INTERVAL seconds) and drops the
+                entries they overlap.
+  MongoBackend  SurveillanceAI.analytics_cache, shared by all application
+                processes. CacheUpdater adds the new detections to
+                overlapping additive entries (detection counts) and drops
+                the other overlapping ones.
+
+Writes made outside the pipeline (migrations, rollup backfills) are not
+seen; clear the caches after them:
+
+    python ./app/detection/analytics_cache.py --clear
+"""
+import argparse
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from pymongo import DeleteOne, MongoClient, UpdateOne
+from pymongo.errors import PyMongoError
+
+# the pipeline imports the detection modules flat, the application as a package
+try:
+    from detection_schema import detection_classes, frame_field
+except ImportError:
+    from app.detection.detection_schema import detection_classes, frame_field
+
+# logger
+from logging import getLogger, basicConfig, INFO
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+CACHE_COLLECTION = "analytics_cache"
+EVENTS_COLLECTION = "analytics_cache_events"
+OPEN_TTL = 60           # seconds an entry of an open window is served
+MAX_ENTRIES = 4096      # LRUBackend size
+SYNC_INTERVAL = 1.0     # seconds between two polls of the write events
+EVENT_TTL = 3600        # seconds write events are kept
+EVENT_SKEW = 10.0       # seconds of clock skew / computation time tolerated
+
+
+def _overlaps(entry, min_ts, max_ts):
+    return entry["start"] <= max_ts and entry["end"] > min_ts
+
+
+# ======================
+# Backends
+# ======================
+
+class LRUBackend:
+    """Bounded in-process entries, least recently used evicted first."""
+
+    shared = False
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def expire(self, key, expires_at):
+        with self._lock:
+            if key in self.entries:
+                self.entries[key]["expires_at"] = expires_at
+
+    def invalidate(self, min_ts, max_ts):
+        """Drop the entries whose window overlaps [min_ts, max_ts]."""
+        with self._lock:
+            keys = [key for key, entry in self.entries.items() if _overlaps(entry, min_ts, max_ts)]
+            for key in keys:
+                del self.entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class MongoBackend:
+    """
+    Entries shared by every process in a collection:
+
+        {_id: key, value, start, end, classes, additive, computed_at, expires_at}
+
+    expires_at is only set for open windows; a TTL index removes them.
+    """
+
+    shared = True
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, key):
+        entry = self.collection.find_one({"_id": key})
+        # the TTL monitor only runs once a minute
+        if entry is not None and entry.get("expires_at") and entry["expires_at"] <= datetime.datetime.utcnow():
+            return None
+        return entry
+
+    def set(self, key, entry):
+        self.collection.replace_one({"_id": key}, dict(entry, _id=key), upsert=True)
+
+    def expire(self, key, expires_at):
+        self.collection.update_one({"_id": key}, {"$set": {"expires_at": expires_at}})
+
+    def invalidate(self, min_ts, max_ts):
+        return self.collection.delete_many({"start": {"$lte": max_ts}, "end": {"$gt": min_ts}}).deleted_count
+
+    def clear(self):
+        self.collection.delete_many({})
+
+    def __len__(self):
+        return self.collection.estimated_document_count()
+
+
+# ======================
+# Cache
+# ======================
+
+class AnalyticsCache:
+    """
+    Window-keyed cache in front of the analytics queries.
+
+        cache.cached("count|...", start, end, lambda: count(...), classes=["person"], additive=True)
+
+    `additive` marks values that are detection counts of `classes` (all
+    classes if None) in [start, end), which writes can increment instead
+    of dropping. `events` is the write event collection; without it
+    entries are only bounded by OPEN_TTL and LRU eviction.
+    """
+
+    def __init__(self, backend, events=None, open_ttl=OPEN_TTL, sync_interval=SYNC_INTERVAL):
+        self.backend = backend
+        self.events = events
+        self.open_ttl = open_ttl
+        self.sync_interval = sync_interval
+        self._synced_at = None
+        self._next_sync = 0.0
+        self._sync_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "downgraded": 0,
+                       "invalidated": 0, "errors": 0}
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def sync(self, force=False):
+        """Apply the write events recorded since the last poll (in-process backends only)."""
+        if self.events is None or self.backend.shared:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        with self._sync_lock:
+            self._next_sync = now + self.sync_interval
+            utcnow = datetime.datetime.utcnow()
+            synced_at, self._synced_at = self._synced_at, utcnow
+            if synced_at is None:
+                # nothing cached before the first poll
+                return
+            if (utcnow - synced_at).total_seconds() > EVENT_TTL - EVENT_SKEW:
+                # events may have expired unseen
+                self.backend.clear()
+                return
+            # events are re-read EVENT_SKEW seconds back: dropping twice is harmless
+            since = synced_at - datetime.timedelta(seconds=EVENT_SKEW)
+            dropped = 0
+            for event in self.events.find({"created": {"$gte": since}}, {"_id": 0}):
+                if event.get("clear"):
+                    self.backend.clear()
+                else:
+                    dropped += self.backend.invalidate(event["min_ts"], event["max_ts"])
+            if dropped:
+                self._count("invalidated", dropped)
+
+    def _written_since(self, since, start, end):
+        if self.events is None:
+            return False
+        query = {"created": {"$gte": since - datetime.timedelta(seconds=EVENT_SKEW)},
+                 "$or": [{"clear": True}, {"min_ts": {"$lt": end}, "max_ts": {"$gte": start}}]}
+        return self.events.find_one(query, {"_id": 1}) is not None
+
+    def cached(self, key, start, end, compute, classes=None, additive=False):
+        """The cached value of `key` for [start, end), computing and storing it on a miss."""
+        try:
+            self.sync()
+            entry = self.backend.get(key)
+        except PyMongoError as e:
+            logger.warning(f"analytics cache unavailable: {e}")
+            self._count("errors")
+            return compute()
+        now = datetime.datetime.utcnow()
+        if entry is not None:
+            if entry.get("expires_at") is None or entry["expires_at"] > now:
+                self._count("hits")
+                return entry["value"]
+            self._count("expired")
+        self._count("misses")
+
+        value = compute()
+        closed = end <= now
+        entry = {
+            "value": value, "start": start, "end": end, "classes": classes, "additive": additive,
+            "computed_at": now,
+            "expires_at": None if closed else now + datetime.timedelta(seconds=self.open_ttl),
+        }
+        try:
+            self.backend.set(key, entry)
+            self._count("stores")
+            # a batch flushed while computing may or may not be in the value:
+            # keep it no longer than an open window
+            if self.backend.shared and closed and self._written_since(now, start, end):
+                self.backend.expire(key, now + datetime.timedelta(seconds=self.open_ttl))
+                self._count("downgraded")
+        except PyMongoError as e:
+            logger.warning(f"analytics cache store failed: {e}")
+            self._count("errors")
+        return value
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["backend"] = type(self.backend).__name__
+        try:
+            stats["entries"] = len(self.backend)
+        except PyMongoError:
+            stats["entries"] = None
+        if isinstance(self.backend, LRUBackend):
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+
+# ======================
+# Writes
+# ======================
+
+def written_detections(docs):
+    """(timestamp, class name) of every detection in frame documents of either layout."""
+    detections = []
+    for doc in docs:
+        ts = frame_field(doc, "frame_timestamp")
+        if ts is not None:
+            detections.extend((ts, class_name) for class_name, _ in detection_classes(doc))
+    return detections
+
+
+def written_window(docs):
+    """[min, max] timestamp covered by frame or track documents, or None."""
+    stamps = []
+    for doc in docs:
+        if "first_seen" in doc:
+            stamps += [doc["first_seen"], doc["last_seen"]]
+        else:
+            ts = frame_field(doc, "frame_timestamp")
+            if ts is not None:
+                stamps.append(ts)
+    return (min(stamps), max(stamps)) if stamps else None
+
+
+class CacheUpdater:
+    """
+    DetectionWriter listener that records every flushed batch (frame or
+    track documents) as a write event and updates the shared cache entries:
+
+        doc_writer.add_listener(CacheUpdater(db["analytics_cache_events"], db["analytics_cache"]))
+
+    Entries computed within the last EVENT_SKEW seconds may already contain
+    the batch, so they are dropped rather than incremented.
+    """
+
+    def __init__(self, events, entries=None):
+        self.events = events
+        self.entries = entries
+        self.batches = 0
+        self.incremented = 0
+        self.invalidated = 0
+        self.failures = 0
+
+    def __call__(self, docs):
+        window = written_window(docs)
+        if window is None:
+            return
+        min_ts, max_ts = window
+        now = datetime.datetime.utcnow()
+        try:
+            self.events.insert_one({"created": now, "min_ts": min_ts, "max_ts": max_ts})
+            self.batches += 1
+            if self.entries is not None:
+                self._update_entries(docs, min_ts, max_ts, now)
+        except PyMongoError as e:
+            self.failures += 1
+            logger.error(f"analytics cache update failed for {len(docs)} documents: {e}")
+
+    def _update_entries(self, docs, min_ts, max_ts, now):
+        detections = None
+        recent = now - datetime.timedelta(seconds=EVENT_SKEW)
+        ops = []
+        for entry in self.entries.find({"start": {"$lte": max_ts}, "end": {"$gt": min_ts}},
+                                       {"value": 0}):
+            if not entry.get("additive") or entry["computed_at"] >= recent:
+                ops.append(DeleteOne({"_id": entry["_id"]}))
+                continue
+            if detections is None:
+                detections = written_detections(docs)
+            classes = entry.get("classes")
+            delta = sum(1 for ts, class_name in detections
+                        if entry["start"] <= ts < entry["end"] and (classes is None or class_name in classes))
+            if delta:
+                ops.append(UpdateOne({"_id": entry["_id"]}, {"$inc": {"value": delta}}))
+        if ops:
+            self.entries.bulk_write(ops, ordered=False)
+            self.incremented += sum(isinstance(op, UpdateOne) for op in ops)
+            self.invalidated += sum(isinstance(op, DeleteOne) for op in ops)
+
+    def stats(self):
+        return {"batches": self.batches, "incremented": self.incremented,
+                "invalidated": self.invalidated, "failures": self.failures}
+
+
+def clear(db):
+    """Drop every shared entry and tell the in-process caches to do the same."""
+    deleted = db[CACHE_COLLECTION].delete_many({}).deleted_count
+    db[EVENTS_COLLECTION].insert_one({"created": datetime.datetime.utcnow(), "clear": True})
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clear the analytics response caches')
+    parser.add_argument('--mongo_uri', default=None)
+    parser.add_argument('--clear', action='store_true', help='drop all cached analytics entries')
+    args = parser.parse_args()
+
+    load_dotenv()
+    basicConfig(level=INFO)
+    db = MongoClient(args.mongo_uri or os.getenv("MONGO_URI"))["SurveillanceAI"]
+    if args.clear:
+        print(f"Cleared {clear(db)} shared entries; application caches follow within {SYNC_INTERVAL}s")
+    else:
+        print(f"{db[CACHE_COLLECTION].estimated_document_count()} shared entries, "
+              f"{db[EVENTS_COLLECTION].estimated_document_count()} write events")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import sys
 import time
+import threading
 from collections import OrderedDict
 
 import numpy as np
@@ -158,21 +159,7 @@ def recognize_from_image(image_frame, detector):
     logger.info(f'Image with bounding boxes saved at: {SAVE_IMAGE_PATH}')
 
     # extract clothing items and their bounding coordinates
-    results = []
-    for obj in detect_objects_list:
-        clothing_item = category[obj.category]
-        # Calculate bounding coordinates in pixel values
-        img_height, img_width = image_frame.shape[:2]
-        x1 = int(obj.x * img_width)
-        y1 = int(obj.y * img_height)
-        x2 = int((obj.x + obj.w) * img_width)
-        y2 = int((obj.y + obj.h) * img_height)
-        results.append({
-            "item": clothing_item,
-            "bounding_box": [x1, y1, x2, y2]  # [top-left-x, top-left-y, bottom-right-x, bottom-right-y]
-        })
-
-    return results
+    return extract_cloth_items(image_frame, detect_objects_list)
 
 def recognize_from_video(video, detector):
     capture = get_capture(video)
@@ -200,15 +187,85 @@ def recognize_from_video(video, detector):
     if writer is not None:
         writer.release()
 
+def extract_cloth_items(image_frame, detect_objects_list, categories=None):
+    """Convert detector objects into clothing items with pixel bounding boxes."""
+    categories = category if categories is None else categories
+    img_height, img_width = image_frame.shape[:2]
+    results = []
+    for obj in detect_objects_list:
+        x1 = int(obj.x * img_width)
+        y1 = int(obj.y * img_height)
+        x2 = int((obj.x + obj.w) * img_width)
+        y2 = int((obj.y + obj.h) * img_height)
+        results.append({
+            "item": categories[obj.category],
+            "bounding_box": [x1, y1, x2, y2]  # [top-left-x, top-left-y, bottom-right-x, bottom-right-y]
+        })
+    return results
+
+
+class ClothDetector:
+    """
+    Long-lived clothing detector.
+
+    The modanet/df2 network is downloaded, loaded and shaped once in the
+    constructor and then reused for every call to detect(). The underlying
+    ailia.Net is not thread-safe, so calls are serialized with a lock.
+    """
+
+    def __init__(self, dataset=DATASET, env_id=None):
+        self.dataset = dataset
+        self.categories = DATASETS_CATEGORY[dataset]
+        weight, model = DATASETS_MODEL_PATH[dataset]
+        check_and_download_models(weight, model, REMOTE_PATH)
+
+        if env_id is None:
+            self.net = ailia.Net(model, weight)
+        else:
+            self.net = ailia.Net(model, weight, env_id=env_id)
+        id_image_shape = self.net.find_blob_index_by_name("image_shape")
+        self.net.set_input_shape((1, 3, DETECTION_WIDTH, DETECTION_WIDTH))
+        self.net.set_input_blob_shape((1, 2), id_image_shape)
+        self._lock = threading.Lock()
+
+    def detect_one(self, image_frame):
+        """Detect clothing items on a single BGR crop."""
+        if image_frame is None or image_frame.size == 0:
+            return []
+        x = cv2.cvtColor(image_frame, cv2.COLOR_BGR2RGB)
+        with self._lock:
+            detect_objects_list = detect_objects(x, self.net)
+        return extract_cloth_items(image_frame, detect_objects_list, self.categories)
+
+    def detect(self, frames_or_crops):
+        """
+        Detect clothing items on a batch of BGR crops.
+
+        Returns one list of {"item", "bounding_box"} dicts per input crop, in
+        the same order. The exported network embeds its own NMS and only
+        accepts one image per call, so the batch is run crop by crop on the
+        already loaded network.
+        """
+        return [self.detect_one(crop) for crop in frames_or_crops]
+
+
+# process-wide registry, one loaded detector per (dataset, env_id)
+_cloth_detectors = {}
+_cloth_detectors_lock = threading.Lock()
+
+
+def get_cloth_detector(dataset=DATASET, env_id=None):
+    key = (dataset, env_id)
+    with _cloth_detectors_lock:
+        if key not in _cloth_detectors:
+            _cloth_detectors[key] = ClothDetector(dataset=dataset, env_id=env_id)
+        return _cloth_detectors[key]
+
+
 def detect_cloths(image_frame=None, video=None):
-    # model files check and download
-    check_and_download_models(weight_path, model_path, REMOTE_PATH)
-
-    # initialize
-    detector = ailia.Net(model_path, weight_path)
-    id_image_shape = detector.find_blob_index_by_name("image_shape")
-    detector.set_input_shape((1, 3, DETECTION_WIDTH, DETECTION_WIDTH))
-    detector.set_input_blob_shape((1, 2), id_image_shape)
+    # model is loaded once per process and shared
+    cloth_detector = get_cloth_detector()
+    detector = cloth_detector.net
 
     if video is not None:
         # video mode
@@ -1,31 +1,317 @@
 # app/detection/detect.py
+import json
 import os
-import threading
+import queue
 import subprocess
+import sys
+import threading
+import time
 import uuid
 import shutil
+from collections import OrderedDict
+from datetime import datetime
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+MAX_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 2))   # warm worker processes = concurrent jobs
+MAX_FINISHED_JOBS = 200                                # finished jobs kept for status queries
+WORKER_SCRIPT = "./app/detection/analysis_worker.py"
+# what the workers persist: per-frame documents, per-track documents or both
+ANALYSIS_STORE = os.getenv("ANALYSIS_STORE", "both")
+# frame document layout (see detection_schema); readers understand both
+ANALYSIS_SCHEMA = os.getenv("ANALYSIS_SCHEMA", "2")
+WORKER_ARGS = ["--headless", "--motion_gate", "diff", "--store", ANALYSIS_STORE, "--schema", ANALYSIS_SCHEMA]
+# with INFERENCE_SOCKET set, workers share one inference_server.py instead of
+# loading their own models
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+SERVER_SCRIPT = "./app/detection/inference_server.py"
+SERVER_START_TIMEOUT = 300   # seconds, includes model download/loading
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class AnalysisJob:
+    def __init__(self, video_path, camera_id, classes=None, analysis_fps=None):
+        self.job_id = str(uuid.uuid4())
+        self.video_path = video_path
+        self.camera_id = camera_id
+        self.classes = classes
+        self.analysis_fps = analysis_fps
+        self.save_path = f"./processed_videos/{camera_id}.mp4"
+        self.status = QUEUED
+        self.frames = 0
+        self.total_frames = 0
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+
+    @property
+    def progress(self):
+        if self.status == COMPLETED:
+            return 1.0
+        if not self.total_frames:
+            return 0.0
+        return min(1.0, self.frames / self.total_frames)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "camera_id": self.camera_id,
+            "analysis_fps": self.analysis_fps,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "frames": self.frames,
+            "total_frames": self.total_frames,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class WorkerProcess:
+    """
+    One warm analysis_worker.py process, talking JSON lines over stdin/stdout.
+
+    The process keeps its models loaded between jobs; it is (re)started
+    lazily and replaced if it dies.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.proc = None
+        self._stdin_lock = threading.Lock()
+
+    def _start(self):
+        logger.info(f"starting analysis worker {self.name}")
+        args = list(WORKER_ARGS)
+        if INFERENCE_SOCKET:
+            args += ["--inference_server", INFERENCE_SOCKET]
+        self.proc = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, *args],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+        )
+        event = self._read()
+        if event is None or event.get("event") != "ready":
+            self.stop()
+            raise RuntimeError(f"analysis worker {self.name} failed to start")
+
+    def _read(self):
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                return None
+            try:
+                return json.loads(line)
+            except ValueError:
+                logger.warning(f"analysis worker {self.name}: unexpected output {line.strip()!r}")
+
+    def send(self, **command):
+        with self._stdin_lock:
+            if self.proc is None or self.proc.poll() is not None:
+                return False
+            try:
+                self.proc.stdin.write(json.dumps(command) + "\n")
+                self.proc.stdin.flush()
+                return True
+            except (BrokenPipeError, OSError):
+                return False
+
+    def run(self, job, on_event):
+        """Run one job to completion; on_event(event) is called for every event."""
+        if self.proc is None or self.proc.poll() is not None:
+            self._start()
+        # a cancel that came while the process was (re)starting could not be
+        # sent and is only recorded on the job; once the process is up,
+        # cancels reach it (before the run command, too)
+        if job.cancel_requested:
+            return {"event": "finished", "job_id": job.job_id, "status": CANCELLED, "error": None}
+        self.send(cmd="run", job_id=job.job_id, video=job.video_path, savepath=job.save_path,
+                  camera_id=job.camera_id, classes=job.classes, analysis_fps=job.analysis_fps)
+        while True:
+            event = self._read()
+            if event is None:
+                self.proc = None
+                raise RuntimeError(f"analysis worker {self.name} exited unexpectedly")
+            on_event(event)
+            if event.get("event") == "finished" and event.get("job_id") == job.job_id:
+                return event
 
+    def stop(self, timeout=5):
+        if self.proc is None:
+            return
+        self.send(cmd="shutdown")
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.proc = None
 
 
-def start_analysis(video_path, camera_id):
-    def run_analysis():
-        
-        save_path = f"./processed_videos/{camera_id}.mp4"
-        print("save path is : ",save_path)
-        command = f"python ./app/detection/working_yolov9.py -v {video_path} --savepath {save_path} --camera_id {camera_id}"
-        subprocess.run(command, shell=True)
-        original_save_path = f"./processed_original/{camera_id}.mp4"
-        shutil.copy(video_path, original_save_path)
+class AnalysisScheduler:
+    """
+    Job queue in front of a fixed pool of warm analysis workers.
 
-        print("Original video saved to:", original_save_path)
-    
-    thread = threading.Thread(target=run_analysis)
-    thread.start()
-    return "Success"
+    submit() returns a job immediately; at most max_workers jobs run at the
+    same time and the rest wait in FIFO order. Jobs can be queried with
+    get()/list_jobs() and cancelled whether they are queued or running.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max(1, int(max_workers))
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        self._server = None
+        self._started = False
+
+    def _start(self):
+        # workers are spawned on first use so importing the routes stays cheap
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # the inference server may take a while to load its models, so the
+        # pool is brought up in the background; jobs simply wait in the queue
+        threading.Thread(target=self._launch, name="analysis-launcher", daemon=True).start()
+
+    def _launch(self):
+        if INFERENCE_SOCKET:
+            self._start_inference_server()
+        for i in range(self.max_workers):
+            worker = WorkerProcess(f"worker-{i}")
+            self._workers.append(worker)
+            threading.Thread(target=self._dispatch, args=(worker,), name=f"analysis-{i}", daemon=True).start()
+
+    def _start_inference_server(self):
+        # reuse a daemon that is already serving this socket, otherwise start one
+        from app.detection.inference_client import server_available
+        if server_available(INFERENCE_SOCKET):
+            return
+        logger.info(f"starting inference server on {INFERENCE_SOCKET}")
+        self._server = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--socket", INFERENCE_SOCKET])
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline and self._server.poll() is None:
+            if server_available(INFERENCE_SOCKET):
+                return
+            time.sleep(0.5)
+        logger.error("inference server did not come up; workers will fail until it does")
+
+    def submit(self, video_path, camera_id, classes=None, analysis_fps=None):
+        job = AnalysisJob(video_path, camera_id, classes, analysis_fps)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, camera_id=None):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in jobs if camera_id is None or job.camera_id == camera_id]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns the job, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = datetime.utcnow()
+                return job
+            worker = self._running.get(job_id)
+        if worker is not None:
+            worker.send(cmd="cancel", job_id=job_id)
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.max_workers, "queued": self._queue.qsize(), "jobs": counts}
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+        if self._server is not None:
+            self._server.terminate()
+            self._server = None
+
+    def _prune(self):
+        # drop the oldest finished jobs once the table grows too large
+        finished = [jid for jid, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for jid in finished[:max(0, len(self._jobs) - MAX_FINISHED_JOBS)]:
+            del self._jobs[jid]
+
+    def _on_event(self, job, event):
+        kind = event.get("event")
+        with self._lock:
+            if kind == "started":
+                job.status = RUNNING
+            elif kind in ("progress", "finished"):
+                job.frames = event.get("frames", job.frames)
+                job.total_frames = event.get("total_frames", job.total_frames)
+
+    def _dispatch(self, worker):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status != QUEUED:
+                    continue   # cancelled while waiting
+                job.status = RUNNING
+                job.started_at = datetime.utcnow()
+                self._running[job.job_id] = worker
+            try:
+                result = worker.run(job, lambda event: self._on_event(job, event))
+                status, error = result.get("status", FAILED), result.get("error")
+            except Exception as e:
+                logger.error(f"analysis job {job.job_id} failed: {e}")
+                status, error = FAILED, str(e)
+                # avoid a tight restart loop if the worker cannot start at all
+                time.sleep(1.0)
+            if status == COMPLETED:
+                try:
+                    original_save_path = f"./processed_original/{job.camera_id}.mp4"
+                    shutil.copy(job.video_path, original_save_path)
+                    print("Original video saved to:", original_save_path)
+                except OSError as e:
+                    logger.error(f"could not copy original video for job {job.job_id}: {e}")
+            with self._lock:
+                self._running.pop(job.job_id, None)
+                job.status = status
+                job.error = error
+                job.finished_at = datetime.utcnow()
+
+
+scheduler = AnalysisScheduler()
+
+
+def start_analysis(video_path, camera_id, classes=None, analysis_fps=None):
+    """Queue an analysis of video_path for camera_id and return its job id."""
+    job = scheduler.submit(video_path, camera_id, classes, analysis_fps)
+    print(f"Analysis job {job.job_id} queued for camera {camera_id}")
+    return job.job_id
 
 
 # Example usage
 # vp = "C:\\Users\\Hp\\Downloads\\random.mp4"
-# start_analysis(vp)
-# print("Analysis started in a separate thread.")
-
+# job_id = start_analysis(vp, "cam0")
+# print(scheduler.get(job_id).to_dict())
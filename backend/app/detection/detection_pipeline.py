@@ -0,0 +1,856 @@
+"""
+Importable YOLOv9 + person attributes + clothing + tracking pipeline.
+
+    from detection_pipeline import DetectionPipeline, PipelineConfig
+
+    pipeline = DetectionPipeline(PipelineConfig(model_type='v9c', camera_id='cam1'))
+    pipeline.process_video('video.mp4', savepath='out.mp4')
+
+Nothing is parsed from the command line: working_yolov9.py and main_yolo9.py
+build a PipelineConfig from their arguments and call the methods below.
+"""
+import datetime
+import math
+import os
+import sys
+import threading
+import uuid
+from dataclasses import dataclass, fields
+
+import cv2
+import numpy as np
+
+# The detection modules and their util helpers import each other by flat
+# module name (they started life as scripts), so make both directories
+# importable no matter what the working directory is.
+_DETECTION_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (_DETECTION_DIR, os.path.join(_DETECTION_DIR, 'util')):
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+import ailia  # noqa: E402
+
+from cloth_detection import get_cloth_detector  # noqa: E402
+from person_attributes import PersonAttributeRecognizer, MAX_BATCH_SIZE  # noqa: E402
+from detection_writer import DetectionWriter, BATCH_SIZE, FLUSH_INTERVAL, MAX_QUEUE_SIZE  # noqa: E402
+from track_store import TrackRecorder, TRACKS_COLLECTION, TRAJECTORY_INTERVAL  # noqa: E402
+from detection_schema import COCO_CATEGORY, encode_detection, encode_frame, pack_boxes, unpack_boxes  # noqa: E402
+from rollups import RollupWriter, ROLLUPS_COLLECTION  # noqa: E402
+from analytics_cache import CacheUpdater, CACHE_COLLECTION, EVENTS_COLLECTION  # noqa: E402
+from heatmaps import HeatmapWriter, HEATMAPS_COLLECTION  # noqa: E402
+from staged_pipeline import StagedPipeline, Stage, QUEUE_SIZE  # noqa: E402
+from inference_client import InferenceClient  # noqa: E402
+
+from model_utils import check_and_download_models  # noqa: E402
+from letterbox_utils import LetterboxPreprocessor  # noqa: E402
+from yolo_decode_utils import decode_predictions, class_indices  # noqa: E402
+from color_utils import dominant_color, get_color_lut  # noqa: E402
+from motion_utils import MotionGate, MOTION_THRESHOLD, MAX_CARRY  # noqa: E402
+from tracker_utils import Tracker, interpolate_boxes  # noqa: E402
+from attribute_cache_utils import AttributeCache, REFRESH_INTERVAL, DRIFT_THRESHOLD, EMA_ALPHA  # noqa: E402
+from webcamera_utils import get_capture, get_writer  # noqa: E402
+
+# logger
+from logging import getLogger  # noqa: E402
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+# YOLOv9 model parameters
+WEIGHT_YOLOV9E_PATH = 'yolov9e.onnx'
+MODEL_YOLOV9E_PATH  = 'yolov9e.onnx.prototxt'
+WEIGHT_YOLOV9C_PATH = 'yolov9c.onnx'
+MODEL_YOLOV9C_PATH  = 'yolov9c.onnx.prototxt'
+REMOTE_YOLOV9_PATH = 'https://storage.googleapis.com/ailia-models/yolov9/'
+YOLOV9_MODELS = {
+    'v9e': (WEIGHT_YOLOV9E_PATH, MODEL_YOLOV9E_PATH),
+    'v9c': (WEIGHT_YOLOV9C_PATH, MODEL_YOLOV9C_PATH),
+}
+
+THRESHOLD = 0.40
+IOU = 0.7
+DETECTION_SIZE = 640
+
+STORE_MODES = ('frames', 'tracks', 'both')
+SCHEMA_VERSIONS = (1, 2)  # frame document layout, see detection_schema
+
+# Tracking
+MAX_DISAPPEARED = 20      # source frames a track may go unseen
+MAX_DISTANCE = 50         # pixels a box may move between analysed frames (at full rate)
+DEFAULT_SOURCE_FPS = 30.0 # used when the capture does not report a frame rate
+
+# Person Attributes model parameters
+DEFAULT_ATTR_MODEL = "0234"
+REMOTE_ATTR_PATH = "https://storage.googleapis.com/ailia-models/person-attributes-recognition-crossroad/"
+ATTR_LABELS = ['is_male', 'has_bag', 'has_backpack', 'has_hat',
+               'has_longsleeves', 'has_longpants', 'has_longhair', 'has_coat_jacket']
+
+
+def attr_model_paths(attr_model=DEFAULT_ATTR_MODEL):
+    weight = f"person-attributes-recognition-crossroad-{attr_model}.onnx"
+    return weight, weight + ".prototxt"
+
+
+@dataclass
+class PipelineConfig:
+    # models
+    model_type: str = 'v9e'
+    onnx: bool = False
+    env_id: int = 0
+    attr_model: str = DEFAULT_ATTR_MODEL
+    attr_batch_size: int = MAX_BATCH_SIZE
+    cloth: bool = True                  # clothing detection + clothing colours
+    inference_server: str = None        # socket of inference_server.py, instead of local models
+    # detection
+    threshold: float = THRESHOLD
+    iou: float = IOU
+    detection_size: int = DETECTION_SIZE
+    classes: list = None                # allowed COCO class names, None = all
+    attribute_threshold: float = None   # report attributes as booleans above this score
+    attr_refresh_interval: int = REFRESH_INTERVAL   # per-track attribute reuse, 1 = recompute every frame
+    attr_drift_threshold: float = DRIFT_THRESHOLD   # appearance change that forces a recompute
+    attr_ema_alpha: float = EMA_ALPHA               # weight of fresh attribute scores
+    color_space: str = 'rgb'
+    # video
+    camera_id: str = "camera123"
+    video_id: str = None                # defaults to camera_id
+    headless: bool = False
+    motion_gate: str = 'off'
+    motion_threshold: float = MOTION_THRESHOLD
+    motion_max_carry: int = MAX_CARRY
+    analysis_fps: float = None          # analyse at most this many frames per second, None = every frame
+    interpolate: bool = True            # store documents for the skipped frames (person boxes interpolated)
+    infer_workers: int = 2
+    analyze_workers: int = 1
+    queue_size: int = QUEUE_SIZE
+    # persistence
+    persist: bool = True
+    store: str = 'both'                 # 'frames' (one doc per frame), 'tracks' (one doc per track) or 'both'
+    schema: int = 1                     # frame document layout: 1 (original) or 2 (compact)
+    rollups: bool = True                # keep the hourly detection rollups up to date
+    cache_updates: bool = True          # invalidate / increment the cached analytics on every write
+    heatmaps: bool = True               # accumulate the per camera / hour / class foot-point heatmaps
+    trajectory_interval: int = TRAJECTORY_INTERVAL
+    mongo_uri: str = None               # defaults to $MONGO_URI
+    db_batch_size: int = BATCH_SIZE
+    db_flush_interval: float = FLUSH_INTERVAL
+    db_queue_size: int = MAX_QUEUE_SIZE
+
+    @classmethod
+    def from_args(cls, args, **overrides):
+        """Config from an argparse namespace; unknown attributes are ignored."""
+        values = {f.name: getattr(args, f.name) for f in fields(cls) if hasattr(args, f.name)}
+        values.update(overrides)
+        return cls(**values)
+
+
+# ======================
+# Helpers
+# ======================
+
+def convert_to_detector_object(preds, im_w, im_h):
+    det_objs = []
+    for i in range(len(preds)):
+        (x1, y1, x2, y2) = preds[i, :4]
+        score = float(preds[i, 4])
+        cls = int(preds[i, 5])
+        obj = ailia.DetectorObject(
+            category=COCO_CATEGORY[cls],
+            prob=score,
+            x=x1 / im_w,
+            y=y1 / im_h,
+            w=(x2 - x1) / im_w,
+            h=(y2 - y1) / im_h,
+        )
+        det_objs.append(obj)
+    return det_objs
+
+def crop_and_resize(img, x, y, w, h):
+    if w * 2 < h:
+        nw = h // 2; x = x + (w - nw) // 2; w = nw
+    else:
+        nh = w * 2; y = y + (h - nh) // 2; h = nh
+    ih, iw, _ = img.shape
+    x = max(x, 0); y = max(y, 0)
+    w = min(w, iw - x); h = min(h, ih - y)
+    cropped = img[y:y+h, x:x+w]
+    resized = cv2.resize(cropped, (80, 160))
+    return resized, x, y, w, h
+
+def draw_attributes(img, x, y, attributes, labels):
+    n = min(len(attributes), len(labels))
+    attr_text = ", ".join([f"{labels[i]}:{attributes[i]:.2f}" for i in range(n)])
+    cv2.putText(img, attr_text, (x, y - 25), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,255), 1)
+
+def annotate_frame(frame, objects, persons, tracking_ids):
+    res_img = frame.copy()
+    for obj, (x_abs, y_abs, w_abs, h_abs), _ in objects:
+        cv2.rectangle(res_img, (x_abs, y_abs), (x_abs+w_abs, y_abs+h_abs), (0,255,0), 2)
+        label = f"{obj.category} {obj.prob:.2f}"
+        cv2.putText(res_img, label, (x_abs, y_abs - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 2)
+    for (obj, (x_abs, y_abs, w_abs, h_abs), attributes_scores, _), tracking_id in zip(persons, tracking_ids):
+        draw_attributes(res_img, x_abs, y_abs, attributes_scores, ATTR_LABELS)
+        cv2.rectangle(res_img, (x_abs, y_abs), (x_abs+w_abs, y_abs+h_abs), (255,0,0), 2)
+        label = f"person {obj.prob:.2f} ID:{tracking_id if tracking_id is not None else 'N/A'}"
+        cv2.putText(res_img, label, (x_abs, y_abs - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,0,0), 2)
+    return res_img
+
+def convert_np_floats(obj):
+    """Recursively converts numpy float types to standard Python float."""
+    if isinstance(obj, dict):
+        return {k: convert_np_floats(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_np_floats(i) for i in obj]
+    elif isinstance(obj, np.float32) or isinstance(obj, np.float64):
+        return float(obj)  # Convert numpy float to Python float
+    return obj
+
+def frame_step(source_fps, analysis_fps):
+    """Analyse every n-th frame so that at most analysis_fps frames per second are analysed."""
+    if analysis_fps is not None and not math.isfinite(analysis_fps):
+        raise ValueError(f"analysis_fps must be a finite number, got {analysis_fps}")
+    if not analysis_fps or analysis_fps <= 0 or source_fps <= analysis_fps:
+        return 1
+    return max(1, int(round(source_fps / analysis_fps)))
+
+def read_frames(cap, motion_gate=None, step=1):
+    # capture/decode stage, also runs the (sequential) motion gate. Frames
+    # between two analysed ones are only grabbed, never decoded
+    frame_number = 0
+    while True:
+        if frame_number % step:
+            if not cap.grab():
+                break
+            frame_number += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield {
+            "frame": frame,
+            "frame_number": frame_number,
+            "frame_timestamp": datetime.datetime.utcnow(),
+            "carried_forward": motion_gate is not None and motion_gate.is_static(frame),
+        }
+        frame_number += 1
+
+
+def load_models(config):
+    """
+    Download (if needed) and load the YOLO, attribute and clothing models.
+
+    With config.inference_server set, nothing is loaded here; the returned
+    proxies send their work to inference_server.py.
+    """
+    if config.inference_server:
+        client = InferenceClient(config.inference_server)
+        client.ping()
+        return client.yolo(), client.attributes(), client.cloth() if config.cloth else None
+
+    weight_path, model_path = YOLOV9_MODELS[config.model_type]
+    weight_attr_path, model_attr_path = attr_model_paths(config.attr_model)
+    check_and_download_models(weight_path, model_path, REMOTE_YOLOV9_PATH)
+    check_and_download_models(weight_attr_path, model_attr_path, REMOTE_ATTR_PATH)
+    if not config.onnx:
+        yolo_net = ailia.Net(model_path, weight_path, env_id=config.env_id)
+    else:
+        import onnxruntime
+        cuda = 0 < ailia.get_gpu_environment_id()
+        providers = ['CUDAExecutionProvider', 'CPUExecutionProvider'] if cuda else ['CPUExecutionProvider']
+        yolo_net = onnxruntime.InferenceSession(weight_path, providers=providers)
+    attr_net = ailia.Net(model_attr_path, weight_attr_path, env_id=config.env_id)
+    attr_recognizer = PersonAttributeRecognizer(attr_net, max_batch_size=config.attr_batch_size)
+    cloth_detector = get_cloth_detector() if config.cloth else None
+    return yolo_net, attr_recognizer, cloth_detector
+
+
+# ======================
+# Pipeline
+# ======================
+
+class DetectionPipeline:
+    """
+    Detection, attributes, clothing colours and tracking for frames, videos
+    and images.
+
+    The models are loaded once in the constructor (or taken from `models`,
+    a (yolo_net, attr_recognizer, cloth_detector) tuple) and reused by every
+    call. process_frame() is stateless unless a Tracker is passed in;
+    process_video() creates its own tracker, motion gate and writer per run,
+    so one pipeline can analyse several videos one after the other. The
+    runs share one MongoDB client, which close() releases.
+    """
+
+    def __init__(self, config=None, models=None):
+        self.config = config or PipelineConfig()
+        self.yolo_net, self.attr_recognizer, self.cloth_detector = models or load_models(self.config)
+        self.letterbox = LetterboxPreprocessor(self.config.detection_size)
+        self.class_ids = class_indices(self.config.classes, COCO_CATEGORY)
+        self.color_lut = get_color_lut(space=self.config.color_space)
+        self._yolo_lock = threading.Lock()
+        self._mongo_client = None
+        self._mongo_lock = threading.Lock()
+
+    # ---- YOLO ----
+
+    def preprocess(self, img):
+        # letterboxed NCHW float32 input, written into a buffer reused across frames
+        return self.letterbox(img)
+
+    def post_processing(self, preds, orig_shape, class_ids=None):
+        preds = decode_predictions(preds, self.config.threshold, self.config.iou, classes=class_ids)
+        preds[:, :4] = np.round(self.letterbox.scale_boxes(preds[:, :4], orig_shape))
+        return preds
+
+    def run_yolo(self, inp):
+        net = self.yolo_net
+        with self._yolo_lock:
+            if not self.config.onnx:
+                return net.predict([inp])
+            return net.run([x.name for x in net.get_outputs()], {net.get_inputs()[0].name: inp})
+
+    def predict(self, img, class_ids=None):
+        """(N, 6) x1, y1, x2, y2, confidence, class in frame coordinates."""
+        class_ids = self.class_ids if class_ids is None else class_ids
+        output = self.run_yolo(self.preprocess(img))
+        return self.post_processing(output[0], img.shape, class_ids)
+
+    # ---- per frame stages ----
+
+    def split_detections(self, frame, preds):
+        """Detections as ([(obj, box)] for objects, [(obj, box)] for persons)."""
+        im_h, im_w = frame.shape[:2]
+        objects = []
+        persons = []
+        for obj in convert_to_detector_object(preds, im_w, im_h):
+            box = (int(obj.x * im_w), int(obj.y * im_h), int(obj.w * im_w), int(obj.h * im_h))
+            (persons if obj.category == "person" else objects).append((obj, box))
+        return objects, persons
+
+    def assign_tracks(self, frame, person_detections, tracker=None, attribute_cache=None):
+        """
+        Track ids of the persons and whether their attributes must be computed.
+
+        Without a tracker every id is None; without an attribute cache every
+        person is (re)computed.
+        """
+        n = len(person_detections)
+        if tracker is None:
+            return [None] * n, [True] * n
+        assignments = tracker.update([box for (_, box) in person_detections])
+        tracking_ids = [assignments.get(i) for i in range(n)]
+        if attribute_cache is None:
+            return tracking_ids, [True] * n
+        attribute_cache.forget(tracker.removed)
+        refresh = [
+            attribute_cache.needs_refresh(tracking_id, frame[y:y+h, x:x+w])
+            for tracking_id, (_, (x, y, w, h)) in zip(tracking_ids, person_detections)
+        ]
+        return tracking_ids, refresh
+
+    def describe_objects(self, frame, object_detections):
+        """(obj, box, attributes) with the dominant colour of every object."""
+        objects = []
+        for obj, (x_abs, y_abs, w_abs, h_abs) in object_detections:
+            cropped_object = frame[y_abs:y_abs+h_abs, x_abs:x_abs+w_abs]
+            object_color = dominant_color(cropped_object, lut=self.color_lut)
+            objects.append((obj, (x_abs, y_abs, w_abs, h_abs), {"color": object_color}))
+        return objects
+
+    def describe_persons(self, frame, person_boxes):
+        """Run the attribute and clothing models; one (scores, colours) per box."""
+        person_frames = [frame[y:y+h, x:x+w] for (x, y, w, h) in person_boxes]
+        if self.cloth_detector is not None:
+            person_cloths = self.cloth_detector.detect(person_frames)
+        else:
+            person_cloths = [[] for _ in person_frames]
+        person_crops = [crop_and_resize(frame, *box)[0] for box in person_boxes]
+        person_scores = self.attr_recognizer.run(person_crops)
+        described = []
+        for person_image_frame, cloths, attributes_scores in zip(person_frames, person_cloths, person_scores):
+            colors = {}
+            # Use dominant_color detection on the cropped image for top_color
+            for cloth in cloths:
+                item_name = cloth['item']
+                bbox = cloth['bounding_box']
+                x1, y1, x2, y2 = bbox
+                cropped_cloth = person_image_frame[y1:y2, x1:x2]
+                color = dominant_color(cropped_cloth, lut=self.color_lut)
+                colors[f"{item_name}_color"] = color
+            described.append((attributes_scores, colors))
+        return described
+
+    def person_attributes(self, attributes_scores, colors):
+        attribute_threshold = self.config.attribute_threshold
+        person_attributes = {}
+        for i, key in enumerate(ATTR_LABELS[:len(attributes_scores)]):
+            if attribute_threshold is None:
+                person_attributes[key] = attributes_scores[i]
+            else:
+                person_attributes[key] = bool(attributes_scores[i] > attribute_threshold)
+        person_attributes.update(colors)
+        return person_attributes
+
+    def merge_persons(self, frame, person_detections, tracking_ids, refresh, described, attribute_cache=None):
+        """
+        Combine fresh results (for the persons flagged in refresh, in order)
+        with cached ones. Returns (obj, box, attribute_scores, attributes).
+        """
+        fresh = iter(described)
+        persons = []
+        for (obj, box), tracking_id, recompute in zip(person_detections, tracking_ids, refresh):
+            cached = None if recompute or attribute_cache is None else attribute_cache.get(tracking_id)
+            if cached is not None:
+                attributes_scores, colors = cached
+            else:
+                # a track whose cache entry went missing is simply recomputed
+                attributes_scores, colors = next(fresh) if recompute else self.describe_persons(frame, [box])[0]
+                if attribute_cache is not None:
+                    attributes_scores, colors = attribute_cache.update(tracking_id, attributes_scores, colors)
+            persons.append((obj, box, attributes_scores, self.person_attributes(attributes_scores, colors)))
+        return persons
+
+    def build_detections(self, objects, persons, tracking_ids):
+        """Detection documents for one frame."""
+        frame_detections = []
+        for obj, (x_abs, y_abs, w_abs, h_abs), object_attributes in objects:
+            detection = {
+                "object_id": str(uuid.uuid4()),
+                "class": obj.category,
+                "bounding_box": {"x_min": x_abs, "y_min": y_abs, "x_max": x_abs+w_abs, "y_max": y_abs+h_abs},
+                "confidence": obj.prob,
+                "attributes": object_attributes
+            }
+            frame_detections.append(detection)
+
+        for (obj, box, attributes_scores, person_attributes), tracking_id in zip(persons, tracking_ids):
+            x_abs, y_abs, w_abs, h_abs = box
+            detection = {
+                "object_id": str(uuid.uuid4()),
+                "class": "person",
+                "bounding_box": {"x_min": x_abs, "y_min": y_abs, "x_max": x_abs+w_abs, "y_max": y_abs+h_abs},
+                "confidence": obj.prob,
+                "attributes": person_attributes,
+                "tracking_id": tracking_id
+            }
+            frame_detections.append(detection)
+        return convert_np_floats(frame_detections)
+
+    def encode_detections(self, objects, persons, tracking_ids):
+        """Compact (schema v2) detections of one frame and their packed boxes."""
+        detections, boxes = [], []
+        for obj, (x_abs, y_abs, w_abs, h_abs), object_attributes in objects:
+            detections.append(encode_detection(obj.category, obj.prob, attributes=object_attributes))
+            boxes.append((x_abs, y_abs, x_abs+w_abs, y_abs+h_abs))
+        for (obj, (x_abs, y_abs, w_abs, h_abs), _, person_attributes), tracking_id in zip(persons, tracking_ids):
+            detections.append(encode_detection("person", obj.prob, tracking_id, person_attributes))
+            boxes.append((x_abs, y_abs, x_abs+w_abs, y_abs+h_abs))
+        return detections, pack_boxes(boxes)
+
+    def new_attribute_cache(self):
+        config = self.config
+        if config.attr_refresh_interval <= 1:
+            return None
+        return AttributeCache(refresh_interval=config.attr_refresh_interval,
+                              drift_threshold=config.attr_drift_threshold,
+                              ema_alpha=config.attr_ema_alpha)
+
+    def process_frame(self, frame, tracker=None, attribute_cache=None):
+        """
+        Run the whole pipeline on one BGR frame.
+
+        Pass the same Tracker for consecutive frames of a stream to get
+        tracking ids, and an AttributeCache (see new_attribute_cache) to
+        reuse the attributes of known tracks; without a tracker the ids are
+        None and every person is analysed. Returns the list of detection
+        dicts, in the format stored in MongoDB.
+        """
+        preds = self.predict(frame)
+        object_detections, person_detections = self.split_detections(frame, preds)
+        tracking_ids, refresh = self.assign_tracks(frame, person_detections, tracker, attribute_cache)
+        objects = self.describe_objects(frame, object_detections)
+        described = self.describe_persons(frame, [box for (_, box), r in zip(person_detections, refresh) if r])
+        persons = self.merge_persons(frame, person_detections, tracking_ids, refresh, described, attribute_cache)
+        return self.build_detections(objects, persons, tracking_ids)
+
+    # ---- video ----
+
+    def is_headless(self):
+        # no GUI when asked for, or when there is no display to show it on
+        return self.config.headless or (sys.platform.startswith('linux') and not os.environ.get('DISPLAY'))
+
+    def _collection(self, name="detected_objects"):
+        # one client (and connection pool) shared by every run of this pipeline
+        with self._mongo_lock:
+            if self._mongo_client is None:
+                from pymongo import MongoClient
+                self._mongo_client = MongoClient(self.config.mongo_uri or os.getenv("MONGO_URI"))
+            return self._mongo_client["SurveillanceAI"][name]
+
+    def close(self):
+        """Close the MongoDB client of the pipeline; a later run opens a new one."""
+        with self._mongo_lock:
+            mongo_client, self._mongo_client = self._mongo_client, None
+        if mongo_client is not None:
+            mongo_client.close()
+
+    def _writer(self, collection):
+        config = self.config
+        return DetectionWriter(
+            collection,
+            batch_size=config.db_batch_size,
+            flush_interval=config.db_flush_interval,
+            max_queue_size=config.db_queue_size,
+        )
+
+    def process_video(self, source=0, savepath=None, camera_id=None, classes=None,
+                      progress=None, cancel=None, collection=None, analysis_fps=None, track_collection=None,
+                      rollup_collection=None, heatmap_collection=None, cache_event_collection=None,
+                      cache_collection=None):
+        """
+        Analyse a video file or camera and persist its detections.
+
+        With an analysis frame rate only every n-th frame is decoded and
+        analysed; the frames in between get documents (config.interpolate)
+        with the tracked persons' boxes interpolated and the other
+        detections of the previous analysed frame held, so every class is
+        stored at the source frame rate, and every document
+        records frame_step, source_fps and analysis_fps. frame_number is
+        always the frame index in the source video. config.schema 2 writes
+        the compact layout of detection_schema instead.
+
+        config.store selects what is persisted: frame documents in
+        `collection` (default SurveillanceAI.detected_objects), one summary
+        document per person track in `track_collection` (default
+        SurveillanceAI.tracks, see track_store.TrackRecorder), or both.
+        Frame documents also update the hourly rollups in
+        `rollup_collection` (default SurveillanceAI.detection_rollups, see
+        rollups.RollupWriter) unless config.rollups is False, and every
+        flushed batch updates the analytics cache (analytics_cache.CacheUpdater:
+        write events in `cache_event_collection`, default
+        SurveillanceAI.analytics_cache_events, and shared entries in
+        `cache_collection`, default SurveillanceAI.analytics_cache) unless
+        config.cache_updates is False. The foot-points of the
+        stored boxes are added to the occupancy heatmaps in
+        `heatmap_collection` (default SurveillanceAI.heatmaps, see
+        heatmaps.HeatmapWriter) unless config.heatmaps is False. Nothing
+        is written when config.persist is False.
+
+        camera_id, classes and analysis_fps override the config for this
+        run. progress(frames_done, total_frames) is
+        called after every frame and cancel is a threading.Event that stops
+        the run early. Returns True if the whole video was processed.
+        """
+        config = self.config
+        camera_id = camera_id or config.camera_id
+        video_id = config.video_id or camera_id
+        # tracking ids restart with every run, and video_id is often just the
+        # camera, so frames and tracks also record which run they belong to
+        run_id = uuid.uuid4().hex
+        class_ids = self.class_ids if classes is None else class_indices(classes, COCO_CATEGORY)
+
+        cap = get_capture(source)
+        assert cap.isOpened(), "Cannot open video source"
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        im_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        im_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_SOURCE_FPS
+        step = frame_step(source_fps, analysis_fps or config.analysis_fps)
+        sampling = {"frame_step": step, "source_fps": source_fps, "analysis_fps": round(source_fps / step, 3)}
+        if step > 1:
+            logger.info(f"analysing every {step}. frame ({sampling['analysis_fps']} of {source_fps} fps)")
+        writer = None
+        if savepath and savepath != "output.png":
+            save_dir = os.path.dirname(savepath)
+            if save_dir:
+                os.makedirs(save_dir, exist_ok=True)
+            if step > 1:
+                # only analysed frames are decoded, so the overlay video runs at the analysis rate
+                writer = get_writer(savepath, im_h, im_w, fps=max(1, round(sampling["analysis_fps"])))
+            else:
+                writer = get_writer(savepath, im_h, im_w)
+
+        if config.store not in STORE_MODES:
+            raise ValueError(f"Unknown store mode: {config.store}")
+        if config.schema not in SCHEMA_VERSIONS:
+            raise ValueError(f"Unknown document schema: {config.schema}")
+        compact = config.schema == 2
+        doc_writer = None
+        if config.persist and config.store in ('frames', 'both'):
+            doc_writer = self._writer(collection if collection is not None else self._collection())
+        rollup_writer = None
+        if doc_writer is not None and config.rollups:
+            rollup_writer = RollupWriter(
+                rollup_collection if rollup_collection is not None else self._collection(ROLLUPS_COLLECTION))
+            doc_writer.add_listener(rollup_writer)
+        heatmap_writer = None
+        if doc_writer is not None and config.heatmaps:
+            heatmap_writer = HeatmapWriter(
+                heatmap_collection if heatmap_collection is not None else self._collection(HEATMAPS_COLLECTION),
+                (im_w, im_h))
+            doc_writer.add_listener(heatmap_writer)
+        track_writer = track_recorder = None
+        if config.persist and config.store in ('tracks', 'both'):
+            track_writer = self._writer(
+                track_collection if track_collection is not None else self._collection(TRACKS_COLLECTION))
+            track_recorder = TrackRecorder(track_writer, video_id, camera_id, sampling,
+                                           trajectory_interval=config.trajectory_interval, run_id=run_id)
+        cache_updater = None
+        if config.persist and config.cache_updates:
+            cache_updater = CacheUpdater(
+                cache_event_collection if cache_event_collection is not None else self._collection(EVENTS_COLLECTION),
+                cache_collection if cache_collection is not None else self._collection(CACHE_COLLECTION))
+            for w in (doc_writer, track_writer):
+                if w is not None:
+                    w.add_listener(cache_updater)
+        # the tracker counts analysed frames, and boxes move further between them
+        tracker = Tracker(max_disappeared=max(1, MAX_DISAPPEARED // step), max_distance=MAX_DISTANCE * step)
+        attribute_cache = self.new_attribute_cache()
+        headless = self.is_headless()
+        draw_overlays = writer is not None or not headless
+        motion_gate = None
+        if config.motion_gate != 'off':
+            motion_gate = MotionGate(method=config.motion_gate, threshold=config.motion_threshold,
+                                     max_carry=config.motion_max_carry)
+        last_frame = {}
+        last_emitted = {}
+
+        # inference stage: letterbox and NMS run outside the YOLO lock, so
+        # with several workers they overlap with the network of another frame
+        def infer(item):
+            if item["carried_forward"]:
+                return item
+            frame = item["frame"]
+            output = self.run_yolo(self.preprocess(frame))
+            item["preds"] = self.post_processing(output[0], frame.shape, class_ids)
+            return item
+
+        # tracking stage: the tracker is stateful, so this stage always runs on
+        # a single worker and sees frames in order. It also decides which
+        # persons need their attributes computed (new tracks, stale or
+        # changed appearance); everyone else reuses the cached values
+        def track(item):
+            if item["carried_forward"]:
+                return item
+            frame = item["frame"]
+            item["object_detections"], item["person_detections"] = self.split_detections(frame, item["preds"])
+            item["tracking_ids"], item["refresh"] = self.assign_tracks(
+                frame, item["person_detections"], tracker, attribute_cache)
+            item["removed_tracks"] = tracker.removed
+            return item
+
+        # attributes stage: colours, clothing and person attributes, only for
+        # the persons the tracking stage flagged
+        def analyze(item):
+            if item["carried_forward"]:
+                return item
+            frame = item["frame"]
+            item["objects"] = self.describe_objects(frame, item["object_detections"])
+            item["described"] = self.describe_persons(frame, [
+                box for (_, box), refresh in zip(item["person_detections"], item["refresh"]) if refresh
+            ])
+            return item
+
+        # detections are a list of dicts (v1) or (detections, packed boxes) (v2)
+        def frame_doc(frame_number, frame_timestamp, carried_forward, detections, interpolated=False):
+            if compact:
+                return encode_frame(video_id, camera_id, frame_timestamp, frame_number, *detections,
+                                    sampling=sampling, carried_forward=carried_forward, interpolated=interpolated,
+                                    run_id=run_id)
+            return {
+                "video_id": video_id,
+                "camera_id": camera_id,
+                "run_id": run_id,
+                "frame_timestamp": frame_timestamp,
+                "frame_number": frame_number,
+                "carried_forward": carried_forward,
+                "interpolated": interpolated,
+                **sampling,
+                "detections": detections
+            }
+
+        def interpolated_docs(prev, item, tracking_ids, persons):
+            # documents for the skipped frames between the previous analysed
+            # frame and this one: tracked persons with interpolated boxes, the
+            # other detections (objects, untracked persons) held from the
+            # previous frame, so no class is counted at a lower rate
+            steps = item["frame_number"] - last_emitted["frame_number"]
+            prev_boxes = {tid: box for tid, (_, box, _, _) in zip(prev["tracking_ids"], prev["persons"])
+                          if tid is not None}
+            curr_boxes = {tid: box for tid, (_, box, _, _) in zip(tracking_ids, persons) if tid is not None}
+            if compact:
+                prev_detections = {d["t"]: d for d in prev["detections"][0] if "t" in d}
+                held = [(d, box) for d, box in zip(prev["detections"][0], unpack_boxes(prev["detections"][1]).tolist())
+                        if "t" not in d]
+            else:
+                prev_detections = {d["tracking_id"]: d for d in prev["detections"] if d.get("tracking_id") is not None}
+                held = [d for d in prev["detections"] if d.get("tracking_id") is None]
+            dt = (item["frame_timestamp"] - last_emitted["frame_timestamp"]) / steps
+            docs = []
+            for k, boxes in enumerate(interpolate_boxes(prev_boxes, curr_boxes, steps), 1):
+                if compact:
+                    detections = ([d for d, _ in held] + [prev_detections[tid] for tid in boxes],
+                                  pack_boxes([box for _, box in held] +
+                                             [(x, y, x+w, y+h) for (x, y, w, h) in boxes.values()]))
+                else:
+                    detections = [dict(d, object_id=str(uuid.uuid4())) for d in held]
+                    for tid, (x, y, w, h) in boxes.items():
+                        detection = dict(prev_detections[tid])
+                        detection["object_id"] = str(uuid.uuid4())
+                        detection["bounding_box"] = {"x_min": x, "y_min": y, "x_max": x+w, "y_max": y+h}
+                        detections.append(detection)
+                docs.append(frame_doc(last_emitted["frame_number"] + k, last_emitted["frame_timestamp"] + dt * k,
+                                      False, detections, interpolated=True))
+            return docs
+
+        # merge stage: fills the cache and the documents, in frame order
+        def merge(item):
+            prev = dict(last_frame)
+            if item["carried_forward"]:
+                # static frame: reuse the previous detections and leave the
+                # tracker untouched
+                item["objects"] = last_frame["objects"]
+                item["persons"] = last_frame["persons"]
+                tracking_ids = last_frame["tracking_ids"]
+                # v2 detections carry no id; v1 copies get their own object_id
+                frame_detections = last_frame["detections"] if compact else [
+                    dict(d, object_id=str(uuid.uuid4())) for d in last_frame["detections"]]
+            else:
+                item["carried_forward"] = False
+                tracking_ids = item["tracking_ids"]
+                item["persons"] = self.merge_persons(item["frame"], item["person_detections"], tracking_ids,
+                                                     item["refresh"], item["described"], attribute_cache)
+                if compact:
+                    frame_detections = self.encode_detections(item["objects"], item["persons"], tracking_ids)
+                else:
+                    frame_detections = self.build_detections(item["objects"], item["persons"], tracking_ids)
+                last_frame.update(
+                    objects=item["objects"],
+                    persons=item["persons"],
+                    tracking_ids=tracking_ids,
+                    detections=frame_detections,
+                )
+            item["docs"] = []
+            if step > 1 and config.interpolate and prev:
+                item["docs"] = interpolated_docs(prev, item, tracking_ids, item["persons"])
+            item["docs"].append(frame_doc(item["frame_number"], item["frame_timestamp"],
+                                          item["carried_forward"], frame_detections))
+            last_emitted.update(frame_number=item["frame_number"], frame_timestamp=item["frame_timestamp"])
+            if track_recorder is not None:
+                track_recorder.observe(item["frame_number"], item["frame_timestamp"], tracking_ids, item["persons"])
+                track_recorder.finish(item.get("removed_tracks", ()))
+            # without a writer or preview nobody looks at the overlay, so the
+            # frame is neither copied nor annotated
+            if draw_overlays:
+                item["res_img"] = annotate_frame(item["frame"], item["objects"], item["persons"], tracking_ids)
+            return item
+
+        pipeline = StagedPipeline([
+            Stage("infer", infer, workers=config.infer_workers, queue_size=config.queue_size),
+            Stage("track", track, workers=1, queue_size=config.queue_size),
+            Stage("analyze", analyze, workers=config.analyze_workers, queue_size=config.queue_size),
+            Stage("merge", merge, workers=1, queue_size=config.queue_size),
+        ])
+
+        # persistence/encoding stage runs here, on the calling thread, because
+        # OpenCV GUI calls must not move between threads
+        if headless:
+            print("Starting video processing (headless).")
+        else:
+            print("Starting video processing. Press 'q' to quit.")
+        finished = False
+        try:
+            for item in pipeline.run(read_frames(cap, motion_gate, step)):
+                if doc_writer is not None:
+                    for doc in item["docs"]:
+                        doc_writer.write(doc)
+                if writer is not None:
+                    writer.write(item["res_img"])
+                frames_done = item["frame_number"] + 1
+                if progress is not None:
+                    progress(frames_done, total_frames)
+                if cancel is not None and cancel.is_set():
+                    break
+                if not headless:
+                    cv2.imshow("Detection & Tracking", item["res_img"])
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+            else:
+                finished = True
+        finally:
+            pipeline.stop()
+            cap.release()
+            if writer is not None:
+                writer.release()
+            if not headless:
+                cv2.destroyAllWindows()
+            if doc_writer is not None:
+                doc_writer.close()
+            if heatmap_writer is not None:
+                heatmap_writer.close()
+            if track_recorder is not None:
+                track_recorder.close()
+                track_writer.close()
+        logger.info(f"Pipeline stage stats: {pipeline.stats()}")
+        if motion_gate is not None:
+            logger.info(f"Motion gate stats: {motion_gate.stats()}")
+        if attribute_cache is not None:
+            logger.info(f"Attribute cache stats: {attribute_cache.stats()}")
+        if doc_writer is not None:
+            logger.info(f"Detection writer stats: {doc_writer.stats()}")
+        if rollup_writer is not None:
+            logger.info(f"Rollup stats: {rollup_writer.stats()}")
+        if heatmap_writer is not None:
+            logger.info(f"Heatmap stats: {heatmap_writer.stats()}")
+        if cache_updater is not None:
+            logger.info(f"Analytics cache updates: {cache_updater.stats()}")
+        if track_recorder is not None:
+            logger.info(f"Track store stats: {track_recorder.stats()}, writer: {track_writer.stats()}")
+        print("Processing finished." if finished else "Processing stopped.")
+        return finished
+
+    # ---- images ----
+
+    def process_images(self, image_paths, savepath=None):
+        """
+        Detect objects and person attributes on still images.
+
+        Annotated results are written next to savepath (see get_savepath)
+        when it is given. Returns {image_path: preds} with preds as returned
+        by predict().
+        """
+        from arg_utils import get_savepath
+
+        if isinstance(image_paths, str):
+            image_paths = [image_paths]
+        results = {}
+        for image_path in image_paths:
+            logger.info("Processing " + image_path)
+            img = cv2.imread(image_path)
+            if img is None:
+                logger.error("Failed to load image " + image_path)
+                continue
+            preds = self.predict(img)
+            results[image_path] = preds
+            if not savepath:
+                continue
+            det_objs = convert_to_detector_object(preds, img.shape[1], img.shape[0])
+            res_img = img.copy()
+            boxes = [
+                (int(obj.x * img.shape[1]), int(obj.y * img.shape[0]), int(obj.w * img.shape[1]), int(obj.h * img.shape[0]))
+                for obj in det_objs
+            ]
+            person_idx = [i for i, obj in enumerate(det_objs) if obj.category == "person"]
+            person_scores = self.attr_recognizer.run([crop_and_resize(img, *boxes[i])[0] for i in person_idx])
+            person_scores = dict(zip(person_idx, person_scores))
+            for i, (x_abs, y_abs, w_abs, h_abs) in enumerate(boxes):
+                if i in person_scores:
+                    draw_attributes(res_img, x_abs, y_abs, person_scores[i], ATTR_LABELS)
+                cv2.rectangle(res_img, (x_abs, y_abs), (x_abs+w_abs, y_abs+h_abs), (0,255,0), 2)
+            image_savepath = get_savepath(savepath, image_path, ext='.png')
+            cv2.imwrite(image_savepath, res_img)
+            logger.info("Saved result at " + image_savepath)
+        print("Image processing finished.")
+        return results
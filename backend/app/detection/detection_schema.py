@@ -0,0 +1,406 @@
+"""
+Frame document schemas of SurveillanceAI.detected_objects.
+
+v1 (the original layout, described in ai/generate_query.schema_description):
+
+    {video_id, camera_id, frame_timestamp, frame_number, carried_forward, interpolated,
+     frame_step, source_fps, analysis_fps,
+     detections: [{object_id, class, confidence, bounding_box: {x_min, y_min, x_max, y_max},
+                   attributes: {...}, tracking_id}]}
+
+v2 (compact):
+
+    {v: 2, vid, cam, ts, f, fs, sfps, cf (only if true), ip (only if true),
+     b: int16 [x_min, y_min, x_max, y_max] * n packed into bytes, in detection order,
+     d: [{c: COCO class id, s: confidence * 1000, t: tracking id (if tracked),
+          a: {short attribute name: score * 100 | colour}}]}
+
+Both layouts can live in the same collection. Readers go through
+adapt_query() (a v1 query that also matches v2 documents) and to_v1() (a v2
+document in v1 shape), so queries written against schema_description keep
+working. This module only depends on numpy so the Flask side can import it.
+"""
+import numpy as np
+
+SCHEMA_VERSION = 2
+
+COCO_CATEGORY = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train",
+    "truck", "boat", "traffic light", "fire hydrant", "stop sign",
+    "parking meter", "bench", "bird", "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard",
+    "sports ball", "kite", "baseball bat", "baseball glove", "skateboard",
+    "surfboard", "tennis racket", "bottle", "wine glass", "cup", "fork",
+    "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "dining table", "toilet", "tv",
+    "laptop", "mouse", "remote", "keyboard", "cell phone", "microwave",
+    "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase",
+    "scissors", "teddy bear", "hair drier", "toothbrush"
+]
+CLASS_IDS = {name: i for i, name in enumerate(COCO_CATEGORY)}
+
+FRAME_FIELDS = {
+    "video_id": "vid",
+    "camera_id": "cam",
+    "run_id": "run",
+    "frame_timestamp": "ts",
+    "frame_number": "f",
+    "frame_step": "fs",
+    "source_fps": "sfps",
+    "carried_forward": "cf",
+    "interpolated": "ip",
+}
+ATTRIBUTE_FIELDS = {
+    "is_male": "m",
+    "has_bag": "bg",
+    "has_backpack": "bp",
+    "has_hat": "h",
+    "has_longsleeves": "ls",
+    "has_longpants": "lp",
+    "has_longhair": "lh",
+    "has_coat_jacket": "cj",
+    "color": "col",
+}
+COLOR_SUFFIX = "_color"    # v1 clothing colours: top_color, pants_color, ...
+COLOR_PREFIX = "c_"        # v2: c_top, c_pants, ...
+CONFIDENCE_SCALE = 1000
+SCORE_SCALE = 100          # attribute scores are stored as integer percent
+SCORE_TRUE = 50            # a stored score above this reads as True
+
+_FRAME_NAMES = {v: k for k, v in FRAME_FIELDS.items()}
+_ATTRIBUTE_NAMES = {v: k for k, v in ATTRIBUTE_FIELDS.items()}
+
+
+# ======================
+# Encoding
+# ======================
+
+def attribute_key(name):
+    """v1 attribute name -> v2 key."""
+    if name in ATTRIBUTE_FIELDS:
+        return ATTRIBUTE_FIELDS[name]
+    if name.endswith(COLOR_SUFFIX):
+        return COLOR_PREFIX + name[:-len(COLOR_SUFFIX)]
+    return name
+
+def attribute_name(key):
+    """v2 attribute key -> v1 name."""
+    if key in _ATTRIBUTE_NAMES:
+        return _ATTRIBUTE_NAMES[key]
+    if key.startswith(COLOR_PREFIX):
+        return key[len(COLOR_PREFIX):] + COLOR_SUFFIX
+    return key
+
+def encode_attributes(attributes):
+    encoded = {}
+    for name, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            encoded[attribute_key(name)] = value
+        else:
+            # scores and booleans alike become integer percent
+            encoded[attribute_key(name)] = int(round(float(value) * SCORE_SCALE))
+    return encoded
+
+def encode_detection(class_name, confidence, tracking_id=None, attributes=None):
+    detection = {"c": CLASS_IDS.get(class_name, -1), "s": int(round(float(confidence) * CONFIDENCE_SCALE))}
+    if tracking_id is not None:
+        detection["t"] = int(tracking_id)
+    if attributes:
+        detection["a"] = encode_attributes(attributes)
+    return detection
+
+def pack_boxes(boxes):
+    """[(x_min, y_min, x_max, y_max), ...] -> bytes of little endian int16."""
+    arr = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    return np.clip(arr, -32768, 32767).astype('<i2').tobytes()
+
+def unpack_boxes(packed):
+    return np.frombuffer(packed or b'', dtype='<i2').reshape(-1, 4)
+
+def encode_frame(video_id, camera_id, frame_timestamp, frame_number, detections, boxes,
+                 sampling=None, carried_forward=False, interpolated=False, run_id=None):
+    """
+    v2 frame document.
+
+    detections are encode_detection() dicts and boxes their
+    (x_min, y_min, x_max, y_max) in the same order (or already packed bytes).
+    """
+    doc = {"v": SCHEMA_VERSION, "vid": video_id, "cam": camera_id, "ts": frame_timestamp, "f": int(frame_number)}
+    if run_id:
+        doc["run"] = run_id
+    if sampling:
+        doc["fs"] = int(sampling.get("frame_step", 1))
+        doc["sfps"] = float(sampling["source_fps"]) if sampling.get("source_fps") else None
+    if carried_forward:
+        doc["cf"] = True
+    if interpolated:
+        doc["ip"] = True
+    doc["b"] = boxes if isinstance(boxes, bytes) else pack_boxes(boxes)
+    doc["d"] = detections
+    return doc
+
+def v1_to_v2(doc):
+    """Convert a stored v1 frame document (the _id is kept)."""
+    detections, boxes = [], []
+    for det in doc.get("detections", []):
+        detections.append(encode_detection(det.get("class"), det.get("confidence", 0.0),
+                                           det.get("tracking_id"), det.get("attributes")))
+        bb = det.get("bounding_box") or {}
+        boxes.append((bb.get("x_min", 0), bb.get("y_min", 0), bb.get("x_max", 0), bb.get("y_max", 0)))
+    sampling = {"frame_step": doc["frame_step"], "source_fps": doc.get("source_fps")} if "frame_step" in doc else None
+    v2 = encode_frame(doc.get("video_id"), doc.get("camera_id"), doc.get("frame_timestamp"),
+                      doc.get("frame_number", 0), detections, boxes, sampling,
+                      doc.get("carried_forward", False), doc.get("interpolated", False), doc.get("run_id"))
+    if "_id" in doc:
+        v2 = {"_id": doc["_id"], **v2}
+    return v2
+
+
+# ======================
+# Reading
+# ======================
+
+def is_v2(doc):
+    return doc.get("v") == SCHEMA_VERSION
+
+def frame_field(doc, name):
+    """A top-level v1 field (video_id, camera_id, frame_timestamp, ...) of either layout."""
+    return doc[name] if name in doc else doc.get(FRAME_FIELDS[name])
+
+def detection_classes(doc):
+    """(class name, tracking id or None) of every detection of either layout, without decoding boxes."""
+    if not is_v2(doc):
+        return [(det.get("class", "unknown"), det.get("tracking_id")) for det in doc.get("detections", [])]
+    return [(COCO_CATEGORY[det["c"]] if 0 <= det.get("c", -1) < len(COCO_CATEGORY) else "unknown", det.get("t"))
+            for det in doc.get("d", [])]
+
+def detection_boxes(doc):
+    """(class names, int array of (x_min, y_min, x_max, y_max) rows) of every detection of either layout."""
+    if not is_v2(doc):
+        detections = doc.get("detections", [])
+        boxes = [[det.get("bounding_box", {}).get(k, 0) for k in ("x_min", "y_min", "x_max", "y_max")]
+                 for det in detections]
+        return [det.get("class", "unknown") for det in detections], np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    return [class_name for class_name, _ in detection_classes(doc)], unpack_boxes(doc.get("b"))
+
+def to_v1(doc):
+    """A frame document in v1 shape; v1 documents are returned unchanged."""
+    if not is_v2(doc):
+        return doc
+    out = {name: doc[key] for key, name in _FRAME_NAMES.items() if key in doc}
+    if "_id" in doc:
+        out["_id"] = doc["_id"]
+    out.setdefault("carried_forward", False)
+    out.setdefault("interpolated", False)
+    if out.get("frame_step") and out.get("source_fps"):
+        out["analysis_fps"] = round(out["source_fps"] / out["frame_step"], 3)
+    detections = []
+    for det, (x1, y1, x2, y2) in zip(doc.get("d", []), unpack_boxes(doc.get("b")).tolist()):
+        c = det.get("c", -1)
+        attributes = {}
+        for key, value in det.get("a", {}).items():
+            attributes[attribute_name(key)] = value if isinstance(value, str) else value / SCORE_SCALE
+        detection = {
+            "class": COCO_CATEGORY[c] if 0 <= c < len(COCO_CATEGORY) else "unknown",
+            "bounding_box": {"x_min": x1, "y_min": y1, "x_max": x2, "y_max": y2},
+            "confidence": det.get("s", 0) / CONFIDENCE_SCALE,
+            "attributes": attributes,
+        }
+        if "t" in det:
+            detection["tracking_id"] = det["t"]
+        detections.append(detection)
+    out["detections"] = detections
+    return out
+
+
+# ---- query translation ----
+
+class Untranslatable(Exception):
+    pass
+
+_LOGICAL = ("$and", "$or", "$nor")
+
+def _map_value(value, fn):
+    # apply fn to the operands of a condition ({"$gt": x}, {"$in": [...]}, x)
+    if isinstance(value, dict):
+        out = {}
+        for op, operand in value.items():
+            if op in ("$in", "$nin", "$all"):
+                out[op] = [fn(v) for v in operand]
+            elif op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+                out[op] = fn(operand)
+            elif op == "$exists":
+                out[op] = operand
+            else:
+                raise Untranslatable(op)
+        return out
+    return fn(value)
+
+def _class_id(name):
+    return CLASS_IDS.get(name, -1) if isinstance(name, str) else name
+
+def _scaled(scale):
+    def fn(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise Untranslatable(value)
+        return value * scale
+    return fn
+
+def _attribute_condition(value):
+    # booleans over scores: true -> score above SCORE_TRUE
+    if value is True:
+        return {"$gt": SCORE_TRUE}
+    if value is False:
+        return {"$lte": SCORE_TRUE}
+    if isinstance(value, dict) and set(value) <= {"$eq", "$ne"} and isinstance(next(iter(value.values()), None), bool):
+        truth = value.get("$eq", not value.get("$ne"))
+        return _attribute_condition(bool(truth))
+    if isinstance(value, str) or (isinstance(value, dict) and all(
+            isinstance(v, str) or (isinstance(v, list) and all(isinstance(x, str) for x in v))
+            for v in value.values() if not isinstance(v, bool))):
+        return value   # colours
+    return _map_value(value, _scaled(SCORE_SCALE))
+
+def _translate_detection(field, value):
+    """(v2 field relative to a detection, v2 condition)."""
+    if field == "class":
+        return "c", _map_value(value, _class_id)
+    if field == "confidence":
+        return "s", _map_value(value, _scaled(CONFIDENCE_SCALE))
+    if field == "tracking_id":
+        return "t", value
+    if field.startswith("attributes."):
+        return "a." + attribute_key(field[len("attributes."):]), _attribute_condition(value)
+    raise Untranslatable(field)
+
+def _translate_detection_query(query):
+    out = {}
+    for field, value in query.items():
+        if field in _LOGICAL:
+            out[field] = [_translate_detection_query(q) for q in value]
+        else:
+            key, condition = _translate_detection(field, value)
+            out[key] = condition
+    return out
+
+# v2 only stores these flags when they are true
+FLAG_FIELDS = ("carried_forward", "interpolated")
+
+def _flag_condition(value):
+    """v2 condition on a flag field, None for "any value"."""
+    if isinstance(value, bool):
+        allowed = {value}
+    elif isinstance(value, dict) and value and set(value) <= {"$eq", "$ne", "$in", "$nin"}:
+        allowed = {True, False}
+        for op, operand in value.items():
+            operands = set(operand) if op in ("$in", "$nin") else {operand}
+            if not all(isinstance(x, bool) for x in operands):
+                raise Untranslatable(value)
+            allowed &= operands if op in ("$eq", "$in") else {True, False} - operands
+    else:
+        raise Untranslatable(value)
+    if allowed == {True}:
+        return True
+    if allowed == {False}:
+        return {"$ne": True}
+    return None if allowed else {"$in": []}
+
+# analysis_fps is not stored in v2, it is source_fps / frame_step
+_ANALYSIS_FPS = {"$round": [{"$divide": ["$sfps", "$fs"]}, 3]}
+_COMPARISONS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte")
+
+def _analysis_fps_condition(value):
+    """$expr on sfps / fs equivalent to a v1 condition on analysis_fps."""
+    if not isinstance(value, dict):
+        value = {"$eq": value}
+    # documents without sampling information have no analysis_fps
+    terms = [{"$gt": [{"$ifNull": ["$sfps", 0]}, 0]}, {"$gt": [{"$ifNull": ["$fs", 0]}, 0]}]
+    for op, bound in value.items():
+        if op in _COMPARISONS:
+            terms.append({op: [_ANALYSIS_FPS, bound]})
+        elif op == "$in":
+            terms.append({"$in": [_ANALYSIS_FPS, list(bound)]})
+        elif op == "$nin":
+            terms.append({"$not": [{"$in": [_ANALYSIS_FPS, list(bound)]}]})
+        else:
+            raise Untranslatable("analysis_fps")
+    return {"$and": terms}
+
+def translate_query(query):
+    """
+    The v2 equivalent of a v1 frame query, or None if it uses fields that
+    v2 does not store in a queryable form (bounding boxes, object ids).
+    """
+    try:
+        return {"v": SCHEMA_VERSION, **_translate_query(query)}
+    except Untranslatable:
+        return None
+
+def _translate_query(query):
+    out = {}
+    for field, value in query.items():
+        if field in _LOGICAL:
+            out[field] = [_translate_query(q) for q in value]
+        elif field in FLAG_FIELDS:
+            condition = _flag_condition(value)
+            if condition is not None:
+                out[FRAME_FIELDS[field]] = condition
+        elif field in FRAME_FIELDS:
+            out[FRAME_FIELDS[field]] = value
+        elif field == "analysis_fps":
+            out["$expr"] = _analysis_fps_condition(value)
+        elif field == "detections":
+            if not isinstance(value, dict) or set(value) - {"$elemMatch", "$size", "$exists"}:
+                raise Untranslatable(field)
+            out["d"] = {op: _translate_detection_query(v) if op == "$elemMatch" else v for op, v in value.items()}
+        elif field.startswith("detections."):
+            rest = field[len("detections."):]
+            if rest.isdigit():
+                out["d." + rest] = value
+            else:
+                key, condition = _translate_detection(rest, value)
+                out["d." + key] = condition
+        else:
+            raise Untranslatable(field)
+    return out
+
+def adapt_query(query):
+    """A v1 frame query that also matches the equivalent v2 documents."""
+    v2 = translate_query(query)
+    if v2 is None:
+        return query
+    # v2 documents lack the v1 fields, so $ne / $nin conditions would match them
+    return {"$or": [dict(query, v={"$exists": False}), v2]}
+
+# projection that leaves out the detections of both layouts
+NO_DETECTIONS = {"detections": 0, "d": 0, "b": 0}
+
+
+# ---- aggregation ----
+
+def v1_field(name):
+    """
+    Aggregation expression that reads a v1 field from documents of either
+    layout. "detections.class" gives the list of class names, one per
+    detection (null for the unknown class id -1).
+    """
+    if name == "detections.class":
+        # a negative index would count from the end of COCO_CATEGORY
+        return {"$cond": [
+            {"$eq": ["$v", SCHEMA_VERSION]},
+            {"$map": {"input": {"$ifNull": ["$d", []]}, "as": "det",
+                      "in": {"$cond": [{"$lt": ["$$det.c", 0]}, None,
+                                       {"$arrayElemAt": [{"$literal": COCO_CATEGORY}, "$$det.c"]}]}}},
+            {"$ifNull": ["$detections.class", []]},
+        ]}
+    if name in FRAME_FIELDS:
+        return {"$ifNull": ["$" + name, "$" + FRAME_FIELDS[name]]}
+    raise ValueError(f"No aggregation expression for {name}")
+
+def project_v1(**fields):
+    """$project stage with output field -> v1 field name, e.g. project_v1(classes="detections.class")."""
+    return {"$project": {"_id": 0, **{out: v1_field(name) for out, name in fields.items()}}}
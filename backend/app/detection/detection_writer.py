@@ -0,0 +1,181 @@
+import atexit
+import queue
+import threading
+import time
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+BATCH_SIZE = 64          # documents per insert_many
+FLUSH_INTERVAL = 1.0     # seconds a partial batch may wait before it is flushed
+MAX_QUEUE_SIZE = 1024    # documents buffered before write() applies backpressure
+
+_STOP = object()
+_FLUSH = object()
+
+
+class DetectionWriter:
+    """
+    Background bulk writer for detection documents.
+
+    The inference loop hands documents to write(), which only enqueues them
+    on a bounded queue. A daemon thread drains the queue and persists the
+    documents with insert_many(ordered=False), flushing whenever BATCH_SIZE
+    documents are pending or FLUSH_INTERVAL seconds have passed since the
+    first pending document arrived. When the queue is full, write() blocks
+    (backpressure) unless block=False, in which case the document is dropped
+    and counted.
+
+    Listeners registered with add_listener() are called from the writer
+    thread with the documents of every flushed batch that were inserted.
+    """
+
+    def __init__(self, collection, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_queue_size=MAX_QUEUE_SIZE, block=True):
+        self.collection = collection
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.block = block
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._listeners = []
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "size_flushes": 0,
+            "time_flushes": 0,
+            "forced_flushes": 0,
+            "blocked_writes": 0,
+            "blocked_seconds": 0.0,
+            "flush_seconds": 0.0,
+            "max_queue_depth": 0,
+        }
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_listener(self, fn):
+        """Register fn(docs) to be called with the inserted documents of each flush."""
+        self._listeners.append(fn)
+
+    def write(self, doc, timeout=None):
+        """Enqueue one document. Returns False if it was dropped."""
+        if self._closed:
+            raise RuntimeError("DetectionWriter is closed")
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            if not self.block:
+                self._count("dropped")
+                return False
+            start = time.monotonic()
+            try:
+                self._queue.put(doc, timeout=timeout)
+            except queue.Full:
+                self._count("dropped")
+                return False
+            finally:
+                with self._stats_lock:
+                    self._stats["blocked_writes"] += 1
+                    self._stats["blocked_seconds"] += time.monotonic() - start
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return True
+
+    def flush(self, timeout=None):
+        """Ask the writer thread to flush everything enqueued so far and wait for it."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Flush every pending document and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        try:
+            atexit.unregister(self.close)
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = stats["written"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _flush_batch(self, batch, reason):
+        if not batch:
+            return
+        start = time.monotonic()
+        inserted = batch
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted = [doc for i, doc in enumerate(batch) if i not in failed]
+            logger.error(f"bulk insert partially failed: {len(failed)} of {len(batch)} documents")
+        except PyMongoError as e:
+            inserted = []
+            logger.error(f"bulk insert failed for {len(batch)} documents: {e}")
+        written = len(inserted)
+        with self._stats_lock:
+            self._stats["written"] += written
+            self._stats["failed"] += len(batch) - written
+            self._stats["batches"] += 1
+            self._stats[reason] += 1
+            self._stats["flush_seconds"] += time.monotonic() - start
+        # listeners (rollups, heatmaps, cache) must only see stored documents
+        if written:
+            for fn in self._listeners:
+                try:
+                    fn(inserted)
+                except Exception as e:
+                    logger.error(f"detection writer listener failed: {e}")
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_batch(batch, "time_flushes")
+                batch, deadline = [], None
+                continue
+
+            if item is _STOP:
+                self._flush_batch(batch, "forced_flushes")
+                return
+            if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                self._flush_batch(batch, "forced_flushes")
+                batch, deadline = [], None
+                item[1].set()
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._flush_batch(batch, "size_flushes")
+                batch, deadline = [], None
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Occupancy heatmaps (SurveillanceAI.heatmaps).
+
+One document per camera, hour and class:
+
+    {camera_id, hour, class, shape, points, grid, version, updated_at}
+
+grid counts the foot-points (bottom centre of the bounding box) of every
+stored detection of that class over a GRID_SHAPE grid laid over the
+frame, as zlib-compressed little endian uint32 (a few hundred bytes for a
+typical hour); points is their total. Persons are placed by the tracker's
+boxes, including the interpolated frames, so the grids count the same
+boxes as the frame documents and a range of hours is merged by adding its
+grids.
+
+The detection pipeline keeps the grids current with a HeatmapWriter
+listener on its DetectionWriter. Frame documents do not record the frame
+size, so stored frames cannot be turned into grids afterwards.
+"""
+import datetime
+import threading
+import time
+import zlib
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+# the pipeline imports the detection modules flat, the application as a package
+try:
+    from detection_schema import detection_boxes, frame_field
+except ImportError:
+    from app.detection.detection_schema import detection_boxes, frame_field
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+HEATMAPS_COLLECTION = "heatmaps"
+GRID_SHAPE = (36, 64)   # rows, columns (16:9 cells for 16:9 video)
+FLUSH_INTERVAL = 30.0   # seconds between two merges into the stored grids
+MAX_RETRIES = 5         # concurrent updates of one grid before giving up
+
+
+def encode_grid(grid):
+    return zlib.compress(np.ascontiguousarray(grid, dtype='<u4').tobytes())
+
+
+def decode_grid(data, shape):
+    return np.frombuffer(zlib.decompress(data), dtype='<u4').reshape(shape)
+
+
+def foot_cells(boxes, frame_size, shape=GRID_SHAPE):
+    """(rows, columns) of the grid cells holding the foot-points of (x_min, y_min, x_max, y_max) boxes."""
+    width, height = frame_size
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    x = (boxes[:, 0] + boxes[:, 2]) / 2 / width
+    y = boxes[:, 3] / height
+    rows = np.clip((y * shape[0]).astype(np.int64), 0, shape[0] - 1)
+    cols = np.clip((x * shape[1]).astype(np.int64), 0, shape[1] - 1)
+    return rows, cols
+
+
+class HeatmapWriter:
+    """
+    DetectionWriter listener that accumulates the foot-points of every
+    flushed batch of frame documents (of one frame size) and merges them
+    into the stored grids every `flush_interval` seconds and on close().
+
+        doc_writer.add_listener(HeatmapWriter(db["heatmaps"], (im_w, im_h)))
+    """
+
+    def __init__(self, collection, frame_size, shape=GRID_SHAPE, flush_interval=FLUSH_INTERVAL):
+        self.collection = collection
+        self.frame_size = frame_size
+        self.shape = tuple(shape)
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._next_flush = time.monotonic() + flush_interval
+        self.points = 0
+        self.merges = 0
+        self.conflicts = 0
+        self.failures = 0
+
+    def __call__(self, docs):
+        with self._lock:
+            for doc in docs:
+                ts = frame_field(doc, "frame_timestamp")
+                if ts is None:
+                    continue
+                classes, boxes = detection_boxes(doc)
+                if not classes:
+                    continue
+                rows, cols = foot_cells(boxes, self.frame_size, self.shape)
+                hour = ts.replace(minute=0, second=0, microsecond=0)
+                camera_id = frame_field(doc, "camera_id")
+                for class_name, row, col in zip(classes, rows, cols):
+                    grid = self._pending.get((camera_id, hour, class_name))
+                    if grid is None:
+                        grid = self._pending[(camera_id, hour, class_name)] = np.zeros(self.shape, dtype=np.uint32)
+                    grid[row, col] += 1
+                self.points += len(classes)
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._next_flush = time.monotonic() + self.flush_interval
+        for (camera_id, hour, class_name), grid in pending.items():
+            try:
+                self._merge({"camera_id": camera_id, "hour": hour, "class": class_name}, grid)
+            except PyMongoError as e:
+                self.failures += 1
+                logger.error(f"heatmap update failed for {camera_id} {hour} {class_name}: {e}")
+
+    def _merge(self, key, grid):
+        # read, add and write back only if nobody else wrote in between
+        for _ in range(MAX_RETRIES):
+            now = datetime.datetime.utcnow()
+            doc = self.collection.find_one(key)
+            if doc is None:
+                try:
+                    self.collection.insert_one(dict(key, shape=list(self.shape), points=int(grid.sum()),
+                                                    grid=encode_grid(grid), version=1, updated_at=now))
+                    self.merges += 1
+                    return
+                except DuplicateKeyError:
+                    self.conflicts += 1
+                    continue
+            if tuple(doc["shape"]) != self.shape:
+                raise ValueError(f"stored heatmap shape {doc['shape']} differs from {self.shape}")
+            merged = decode_grid(doc["grid"], self.shape) + grid
+            result = self.collection.update_one(
+                {"_id": doc["_id"], "version": doc["version"]},
+                {"$set": {"grid": encode_grid(merged), "points": int(merged.sum()), "updated_at": now},
+                 "$inc": {"version": 1}})
+            if result.modified_count:
+                self.merges += 1
+                return
+            self.conflicts += 1
+        self.failures += 1
+        logger.error(f"heatmap {key} kept changing, {int(grid.sum())} points not merged")
+
+    def close(self):
+        self.flush()
+
+    def stats(self):
+        return {"points": self.points, "merges": self.merges, "conflicts": self.conflicts, "failures": self.failures}
+
+
+# ======================
+# Reading
+# ======================
+
+def merge_grids(collection, camera_id, start, end, classes, shape=GRID_SHAPE):
+    """
+    Sum of the grids of `camera_id` and `classes` over the hours in
+    [start, end) (widened to whole hours). Returns (grid, number of
+    distinct hours with a grid).
+    """
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if end != end.replace(minute=0, second=0, microsecond=0):
+        end = end.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    total = np.zeros(shape, dtype=np.uint64)
+    hours = set()
+    for doc in collection.find({"camera_id": camera_id, "class": {"$in": classes},
+                                "hour": {"$gte": start, "$lt": end}}, {"hour": 1, "shape": 1, "grid": 1}):
+        if tuple(doc["shape"]) != tuple(shape):
+            logger.warning(f"skipping heatmap {doc['_id']} of shape {doc['shape']}")
+            continue
+        total += decode_grid(doc["grid"], shape)
+        hours.add(doc["hour"])
+    return total, len(hours)
+
+
+# black -> red -> yellow -> white
+COLORMAP = np.array([[0, 0, 0], [180, 0, 0], [255, 90, 0], [255, 220, 0], [255, 255, 255]], dtype=np.float64)
+
+
+def render_png(grid, scale=10):
+    """PNG bytes of a grid, square-root scaled to its maximum and `scale` pixels per cell."""
+    from io import BytesIO
+    from PIL import Image
+
+    grid = np.asarray(grid, dtype=np.float64)
+    peak = grid.max()
+    level = np.sqrt(grid / peak) if peak > 0 else grid
+    stops = np.linspace(0.0, 1.0, len(COLORMAP))
+    rgb = np.stack([np.interp(level, stops, COLORMAP[:, c]) for c in range(3)], axis=-1).astype(np.uint8)
+    image = Image.fromarray(rgb, "RGB")
+    image = image.resize((grid.shape[1] * scale, grid.shape[0] * scale), Image.BILINEAR)
+    out = BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
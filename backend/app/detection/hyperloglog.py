@@ -0,0 +1,62 @@
+"""
+HyperLogLog sketches for distinct counts (unique tracks per camera and hour).
+
+A sketch has 2**PRECISION registers. Only non-zero registers are kept, as
+{register index: rank}, which is also the stored form: in a document the
+keys are strings ("hll": {"1234": 3}), so sketches are merged in place by
+Mongo with {"$max": {"hll.1234": 3}} and across documents by a $group with
+$max per register. The standard error is 1.04 / sqrt(2**PRECISION), 1.6%.
+"""
+import hashlib
+import math
+
+PRECISION = 12
+HASH_BITS = 64
+
+
+def register(key, precision=PRECISION):
+    """(register index, rank) of a key."""
+    x = int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=HASH_BITS // 8).digest(), "big")
+    rest_bits = HASH_BITS - precision
+    rest = x & ((1 << rest_bits) - 1)
+    return x >> rest_bits, rest_bits - rest.bit_length() + 1
+
+
+class HyperLogLog:
+    """Sparse HyperLogLog sketch."""
+
+    def __init__(self, registers=None, precision=PRECISION):
+        self.precision = precision
+        self.registers = {}
+        if registers:
+            self.update(registers)
+
+    def add(self, key):
+        index, rank = register(key, self.precision)
+        if rank > self.registers.get(index, 0):
+            self.registers[index] = rank
+
+    def update(self, other):
+        """Merge another sketch or {index: rank} (stored string keys are accepted)."""
+        registers = other.registers if isinstance(other, HyperLogLog) else other
+        for index, rank in registers.items():
+            index = int(index)
+            if rank > self.registers.get(index, 0):
+                self.registers[index] = rank
+
+    def count(self):
+        m = 1 << self.precision
+        if not self.registers:
+            return 0
+        zeros = m - len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / (zeros + sum(2.0 ** -rank for rank in self.registers.values()))
+        if estimate <= 2.5 * m and zeros:
+            # small range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_document(self):
+        return {str(index): rank for index, rank in sorted(self.registers.items())}
+
+    def __len__(self):
+        return self.count()
@@ -0,0 +1,201 @@
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+# the socket and its key file live in a directory only this user can enter
+if os.getenv("XDG_RUNTIME_DIR"):
+    RUNTIME_DIR = os.path.join(os.environ["XDG_RUNTIME_DIR"], "surveillance-inference")
+else:
+    RUNTIME_DIR = os.path.join(tempfile.gettempdir(), f"surveillance-inference-{getattr(os, 'getuid', str)()}")
+if sys.platform.startswith('win'):
+    DEFAULT_ADDRESS = r'\\.\pipe\surveillance-inference'
+else:
+    DEFAULT_ADDRESS = os.path.join(RUNTIME_DIR, 'inference.sock')
+INFERENCE_ADDRESS = os.getenv("INFERENCE_SOCKET", DEFAULT_ADDRESS)
+# connections unpickle what the peer sends, so the key must stay secret: set
+# INFERENCE_AUTHKEY, or the server generates one per start in a 0600 file
+AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "").encode() or None
+AUTHKEY_BYTES = 32
+
+
+class InferenceServerError(RuntimeError):
+    pass
+
+
+def private_dir(path):
+    """Create `path` (mode 0700) if needed and make sure no other user can use it."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise InferenceServerError(f"{path} belongs to another user")
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        if path == RUNTIME_DIR:
+            os.chmod(path, 0o700)
+        else:
+            raise InferenceServerError(f"{path} is accessible by other users; use a 0700 directory")
+    return path
+
+
+def authkey_path(address):
+    """Key file of a server: next to its socket, or in RUNTIME_DIR for a named pipe."""
+    if address.startswith('\\\\'):
+        return os.path.join(RUNTIME_DIR, address.rsplit('\\', 1)[-1] + '.key')
+    return address + '.key'
+
+
+def create_authkey(address):
+    """A fresh random key for a server on `address`, written to its 0600 key file."""
+    path = authkey_path(address)
+    private_dir(os.path.dirname(path) or '.')
+    key = secrets.token_hex(AUTHKEY_BYTES).encode()
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def load_authkey(address):
+    """The key of the server on `address`: INFERENCE_AUTHKEY or its key file."""
+    if AUTHKEY:
+        return AUTHKEY
+    path = authkey_path(address)
+    try:
+        st = os.stat(path)
+        if stat.S_IMODE(st.st_mode) & 0o077:
+            raise InferenceServerError(f"{path} is readable by other users")
+        with open(path, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise InferenceServerError(f"no inference server key at {path}; set INFERENCE_AUTHKEY or start the server")
+
+
+class InferenceClient:
+    """
+    Connection to a local inference_server.py.
+
+    Requests are synchronous; every calling thread gets its own connection,
+    so the pipeline's worker threads can all have a request in flight (which
+    is what lets the server batch them).
+    """
+
+    def __init__(self, address=INFERENCE_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # the key file changes whenever the server restarts
+            authkey = self.authkey or load_authkey(self.address)
+            conn = self._local.conn = Client(self.address, authkey=authkey)
+        return conn
+
+    def request(self, kind, payload=None):
+        conn = self._conn()
+        try:
+            conn.send((kind, payload))
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            self._local.conn = None
+            raise InferenceServerError(f"inference server connection lost: {e}")
+        if status != "ok":
+            raise InferenceServerError(result)
+        return result
+
+    def ping(self):
+        return self.request("ping")
+
+    def stats(self):
+        return self.request("stats")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- proxies that stand in for the locally loaded models ----
+
+    def yolo(self):
+        return RemoteNet(self, "yolo")
+
+    def attributes(self):
+        return RemoteAttributeRecognizer(self)
+
+    def cloth(self):
+        return RemoteClothDetector(self)
+
+
+class _Name:
+    def __init__(self, name):
+        self.name = name
+
+
+class RemoteNet:
+    """Looks like an ailia.Net (predict) or an onnxruntime session (run)."""
+
+    def __init__(self, client, model):
+        self.client = client
+        self.model = model
+
+    def predict(self, inputs):
+        return self.client.request(self.model, inputs[0])
+
+    # onnxruntime style access, for callers that pick it with --onnx
+    def get_inputs(self):
+        return [_Name("images")]
+
+    def get_outputs(self):
+        return [_Name("output0")]
+
+    def run(self, output_names, feeds):
+        return self.predict(list(feeds.values()))
+
+
+class RemoteAttributeRecognizer:
+    """Same interface as person_attributes.PersonAttributeRecognizer."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, crops):
+        return self.client.request("attributes", list(crops))
+
+
+class RemoteClothDetector:
+    """Same interface as cloth_detection.ClothDetector."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def detect_one(self, image_frame):
+        return self.detect([image_frame])[0]
+
+    def detect(self, frames_or_crops):
+        return self.client.request("cloth", list(frames_or_crops))
+
+
+def server_available(address=INFERENCE_ADDRESS, authkey=None):
+    try:
+        client = InferenceClient(address, authkey)
+        client.ping()
+        client.close()
+        return True
+    except (OSError, EOFError, AuthenticationError, InferenceServerError):
+        return False
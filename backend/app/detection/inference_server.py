@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Local model-serving daemon.
+
+Hosts the YOLO, person attribute and clothing networks once per node and
+serves every camera worker over a local socket (AF_UNIX, or a named pipe on
+Windows):
+
+    python ./app/detection/inference_server.py [--socket PATH] [--max_batch 8] [--max_wait 0.005] \
+        [working_yolov9 model options, e.g. -m v9c --env_id 1]
+
+Requests from all connections are collected per model into dynamic batches:
+a batch is run as soon as it holds max_batch items or its oldest request has
+waited max_wait seconds. Workers connect with inference_client.InferenceClient
+(working_yolov9.py --inference_server PATH).
+
+The socket lives in a directory only this user can enter (by default under
+$XDG_RUNTIME_DIR). Connections are authenticated with INFERENCE_AUTHKEY or,
+without it, a random key the server writes to <socket>.key (mode 0600) on
+every start.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from multiprocessing.connection import Listener
+
+import numpy as np
+
+from inference_client import INFERENCE_ADDRESS, AUTHKEY, create_authkey, private_dir
+
+# ======================
+# Parameters
+# ======================
+
+MAX_BATCH = 8          # frames (or crops) per network call
+MAX_WAIT = 0.005       # seconds the first request of a batch may wait for company
+MAX_CROP_BATCH = 64    # attribute/clothing crops per batch
+STATS_INTERVAL = 60.0  # seconds between stats log lines
+
+
+class DynamicBatcher:
+    """
+    Collects requests for one model from many threads and runs them in batches.
+
+    fn(inputs) takes a list of request payloads and returns one result per
+    payload. size(payload) is how many items a payload adds to the batch
+    (1 for a frame, the number of crops for a crop list).
+    """
+
+    def __init__(self, name, fn, max_batch=MAX_BATCH, max_wait=MAX_WAIT, size=None):
+        self.name = name
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait
+        self.size = size or (lambda payload: 1)
+        self._queue = queue.Queue()
+        self._carry = None
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._stats = {"requests": 0, "items": 0, "batches": 0, "errors": 0,
+                       "max_queue_depth": 0, "wait_seconds": 0.0, "run_seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, payload):
+        """Queue one payload and block until its result is ready."""
+        future = Future()
+        self._queue.put((payload, future, time.monotonic()))
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return future.result()
+
+    def _next(self, timeout=None):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        return self._queue.get(timeout=timeout)
+
+    def _next_nowait(self):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        return self._queue.get_nowait()
+
+    def _collect(self):
+        first = self._next()
+        batch, total = [first], self.size(first[0])
+        deadline = first[2] + self.max_wait
+        while total < self.max_batch:
+            # requests that are already queued always join; max_wait only
+            # bounds how long we hold the batch open for new ones
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._next(timeout=remaining) if remaining else self._next_nowait()
+            except queue.Empty:
+                break
+            n = self.size(item[0])
+            if total + n > self.max_batch:
+                # does not fit, it opens the next batch
+                self._carry = item
+                break
+            batch.append(item)
+            total += n
+        return batch, total
+
+    def _run(self):
+        while True:
+            batch, total = self._collect()
+            start = time.monotonic()
+            try:
+                results = self.fn([payload for payload, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                errors = 0
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                errors = 1
+            now = time.monotonic()
+            with self._stats_lock:
+                self._stats["items"] += total
+                self._stats["batches"] += 1
+                self._stats["errors"] += errors
+                self._stats["run_seconds"] += now - start
+                self._stats["wait_seconds"] += sum(start - t for _, _, t in batch)
+                self._batch_sizes[total] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+            sizes = dict(sorted(self._batch_sizes.items()))
+        stats["queue_depth"] = self._queue.qsize() + (self._carry is not None)
+        stats["batch_sizes"] = sizes
+        stats["avg_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_wait_ms"] = 1e3 * stats.pop("wait_seconds") / stats["requests"] if stats["requests"] else 0.0
+        stats["avg_run_ms"] = 1e3 * stats.pop("run_seconds") / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+
+# ======================
+# Server
+# ======================
+
+def parse_server_args():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--socket', default=INFERENCE_ADDRESS)
+    parser.add_argument('--max_batch', default=MAX_BATCH, type=int)
+    parser.add_argument('--max_wait', default=MAX_WAIT, type=float)
+    parser.add_argument('--max_crop_batch', default=MAX_CROP_BATCH, type=int)
+    server_args, rest = parser.parse_known_args()
+    # what is left belongs to the detection script (model type, env id, ...)
+    sys.argv = sys.argv[:1] + rest
+    if '-v' not in sys.argv and '--video' not in sys.argv:
+        sys.argv += ['--video', '0']
+    return server_args
+
+
+import working_yolov9 as detector  # noqa: E402
+from detection_pipeline import DetectionPipeline  # noqa: E402
+
+from logging import getLogger  # noqa: E402
+logger = getLogger(__name__)
+
+
+class YoloBatchRunner:
+    """Runs a list of (1, 3, H, W) inputs, batching those with the same shape."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.net = pipeline.yolo_net
+        self.onnx = pipeline.config.onnx
+        self._shape = None
+        self._batching = True
+
+    def _run(self, inp):
+        if not self.onnx and inp.shape != self._shape:
+            self.net.set_input_shape(inp.shape)
+            self._shape = inp.shape
+        return self.pipeline.run_yolo(inp)
+
+    def _run_group(self, inputs):
+        if len(inputs) > 1 and self._batching:
+            try:
+                outputs = self._run(np.concatenate(inputs))
+                return [[o[i:i + 1] for o in outputs] for i in range(len(inputs))]
+            except Exception as e:
+                # model exported with a fixed batch of 1
+                logger.warning(f'batched YOLO inference unavailable, falling back to batch size 1: {e}')
+                self._batching = False
+        return [list(self._run(inp)) for inp in inputs]
+
+    def __call__(self, inputs):
+        results = [None] * len(inputs)
+        groups = {}
+        for i, inp in enumerate(inputs):
+            groups.setdefault(inp.shape, []).append(i)
+        for idx in groups.values():
+            for i, out in zip(idx, self._run_group([inputs[i] for i in idx])):
+                results[i] = out
+        return results
+
+
+def split_crop_batches(fn):
+    # run a list of crop lists as one list and hand every request its slice
+    def run(payloads):
+        crops = [crop for payload in payloads for crop in payload]
+        out = fn(crops)
+        results, start = [], 0
+        for payload in payloads:
+            results.append(out[start:start + len(payload)])
+            start += len(payload)
+        return results
+    return run
+
+
+class InferenceServer:
+    def __init__(self, address, pipeline, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_crop_batch=MAX_CROP_BATCH):
+        attr_recognizer, cloth_detector = pipeline.attr_recognizer, pipeline.cloth_detector
+        self.address = address
+        self.batchers = {
+            "yolo": DynamicBatcher("yolo", YoloBatchRunner(pipeline),
+                                   max_batch=max_batch, max_wait=max_wait),
+            "attributes": DynamicBatcher("attributes", split_crop_batches(attr_recognizer.run),
+                                         max_batch=max_crop_batch, max_wait=max_wait, size=len),
+            "cloth": DynamicBatcher("cloth", split_crop_batches(cloth_detector.detect),
+                                    max_batch=max_crop_batch, max_wait=max_wait, size=len),
+        }
+
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+    def _handle(self, kind, payload):
+        if kind == "ping":
+            return "pong"
+        if kind == "stats":
+            return self.stats()
+        batcher = self.batchers.get(kind)
+        if batcher is None:
+            raise ValueError(f"unknown request: {kind}")
+        if kind != "yolo" and not payload:
+            return []
+        return batcher.submit(payload)
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self._handle(kind, payload))
+                except Exception as e:
+                    reply = ("error", str(e))
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _log_stats(self):
+        while True:
+            time.sleep(STATS_INTERVAL)
+            logger.info(f"inference server stats: {self.stats()}")
+
+    def serve_forever(self):
+        if not self.address.startswith('\\\\'):
+            private_dir(os.path.dirname(os.path.abspath(self.address)))
+            if os.path.exists(self.address):
+                os.unlink(self.address)   # stale socket from a previous run
+        # clients authenticate with INFERENCE_AUTHKEY or the key file written here
+        authkey = AUTHKEY or create_authkey(self.address)
+        with Listener(self.address, authkey=authkey) as listener:
+            if not self.address.startswith('\\\\'):
+                os.chmod(self.address, 0o600)
+            logger.info(f"inference server listening on {self.address}")
+            threading.Thread(target=self._log_stats, name="inference-stats", daemon=True).start()
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # failed handshake (e.g. wrong authkey); keep serving
+                    logger.warning(f"inference server: rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+
+def main():
+    server_args = parse_server_args()
+    args = detector.parse_args()
+    # the server hosts the models itself, whatever the workers were told
+    pipeline = DetectionPipeline(detector.get_config(args, headless=True, inference_server=None))
+    server = InferenceServer(server_args.socket, pipeline, max_batch=server_args.max_batch,
+                             max_wait=server_args.max_wait, max_crop_batch=server_args.max_crop_batch)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Convert stored v1 frame documents to the compact v2 layout (detection_schema).
+
+    python ./app/detection/migrate_detections.py [--collection detected_objects] [--target NAME]
+        [--batch_size 500] [--limit N] [--dry_run]
+
+Documents are streamed in _id order and rewritten in batches: in place by
+default (same _id, so readers never see a frame twice), or copied into
+--target. Only documents without a schema version are read, so an
+interrupted migration simply continues where it stopped. Readers handle both
+layouts (detection_schema.adapt_query / to_v1), so this can run while the
+application is serving.
+"""
+import argparse
+import os
+import time
+
+import bson
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne
+
+from detection_schema import v1_to_v2
+
+# logger
+from logging import getLogger, basicConfig, INFO
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+BATCH_SIZE = 500          # documents per bulk write
+LOG_INTERVAL = 10.0       # seconds between progress lines
+V1_QUERY = {"v": {"$exists": False}}
+
+
+def migrate(source, target=None, batch_size=BATCH_SIZE, limit=None, dry_run=False):
+    """
+    Rewrite the v1 documents of `source` as v2, into `target` (default: in place).
+
+    Returns {"documents", "v1_bytes", "v2_bytes"}.
+    """
+    in_place = target is None or target.full_name == source.full_name
+    stats = {"documents": 0, "v1_bytes": 0, "v2_bytes": 0}
+    batch = []
+    last_log = time.monotonic()
+
+    def flush():
+        if batch and not dry_run:
+            if in_place:
+                source.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc) for doc in batch], ordered=False)
+            else:
+                target.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+                                  ordered=False)
+        batch.clear()
+
+    cursor = source.find(V1_QUERY, batch_size=batch_size).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    for doc in cursor:
+        converted = v1_to_v2(doc)
+        stats["documents"] += 1
+        stats["v1_bytes"] += len(bson.encode(doc))
+        stats["v2_bytes"] += len(bson.encode(converted))
+        batch.append(converted)
+        if len(batch) >= batch_size:
+            flush()
+        if time.monotonic() - last_log > LOG_INTERVAL:
+            last_log = time.monotonic()
+            logger.info(f"migrated {stats['documents']} documents")
+    flush()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate detected_objects frame documents to schema v2')
+    parser.add_argument('--mongo_uri', default=None)
+    parser.add_argument('--database', default='SurveillanceAI')
+    parser.add_argument('--collection', default='detected_objects')
+    parser.add_argument('--target', default=None, help='write into this collection instead of in place')
+    parser.add_argument('--batch_size', default=BATCH_SIZE, type=int)
+    parser.add_argument('--limit', default=None, type=int)
+    parser.add_argument('--dry_run', action='store_true', help='only report the size reduction')
+    args = parser.parse_args()
+
+    load_dotenv()
+    basicConfig(level=INFO)
+    db = MongoClient(args.mongo_uri or os.getenv("MONGO_URI"))[args.database]
+    target = db[args.target] if args.target else None
+    stats = migrate(db[args.collection], target, args.batch_size, args.limit, args.dry_run)
+    ratio = stats["v1_bytes"] / stats["v2_bytes"] if stats["v2_bytes"] else 0.0
+    print(f"{'Would migrate' if args.dry_run else 'Migrated'} {stats['documents']} documents: "
+          f"{stats['v1_bytes']} -> {stats['v2_bytes']} bytes ({ratio:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
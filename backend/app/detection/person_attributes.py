@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+ATTR_INPUT_WIDTH = 80
+ATTR_INPUT_HEIGHT = 160
+ATTR_NUM_SCORES = 8
+MAX_BATCH_SIZE = 16
+
+
+class PersonAttributeRecognizer:
+    """
+    Batched wrapper around the person-attributes-recognition-crossroad net.
+
+    All 80x160 person crops handed to run() (one frame, or a window of
+    frames) are stacked into a single NCHW float32 tensor and pushed through
+    the network in chunks of at most max_batch_size, instead of one
+    transpose/cast/run per person.
+    """
+
+    def __init__(self, net, max_batch_size=MAX_BATCH_SIZE):
+        self.net = net
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._input = np.zeros(
+            (self.max_batch_size, 3, ATTR_INPUT_HEIGHT, ATTR_INPUT_WIDTH), dtype=np.float32
+        )
+        self._batch_shape = None
+        self._batching = True
+        self._lock = threading.Lock()
+
+    def _set_batch(self, n):
+        if self._batch_shape == n:
+            return
+        self.net.set_input_shape((n, 3, ATTR_INPUT_HEIGHT, ATTR_INPUT_WIDTH))
+        self._batch_shape = n
+
+    def _run_batch(self, batch):
+        n = len(batch)
+        if self._batching:
+            try:
+                self._set_batch(n)
+                result = self.net.run(batch)
+                return np.asarray(result[0]).reshape(n, -1)[:, :ATTR_NUM_SCORES]
+            except Exception as e:
+                # model exported with a fixed batch of 1
+                logger.warning(f'batched attribute inference unavailable, falling back to batch size 1: {e}')
+                self._batching = False
+                self._batch_shape = None
+
+        self._set_batch(1)
+        scores = []
+        for x in batch:
+            result = self.net.run(x)
+            scores.append(np.asarray(result[0]).reshape(-1)[:ATTR_NUM_SCORES])
+        return np.stack(scores)
+
+    def run(self, crops):
+        """
+        Parameters
+        ----------
+        crops : list of numpy array
+            BGR person crops of shape (160, 80, 3), as made by crop_and_resize
+
+        Returns
+        -------
+        scores : numpy array (N, 8)
+            attribute scores, one row per crop
+        """
+        n = len(crops)
+        if n == 0:
+            return np.zeros((0, ATTR_NUM_SCORES), dtype=np.float32)
+
+        out = []
+        with self._lock:
+            for start in range(0, n, self.max_batch_size):
+                chunk = crops[start:start + self.max_batch_size]
+                batch = self._input[:len(chunk)]
+                for i, crop in enumerate(chunk):
+                    batch[i] = crop.transpose(2, 0, 1)
+                out.append(self._run_batch(batch))
+        return np.concatenate(out)
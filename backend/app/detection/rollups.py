@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Hourly detection rollups (SurveillanceAI.detection_rollups).
+
+One document per camera, hour and class:
+
+    {camera_id, hour, class, detections, frames, max_concurrent, hll, updated_at}
+
+detections counts the stored detections of that class, frames the frame
+documents that contain at least one, max_concurrent the most detections
+of the class in a single frame and hll is a HyperLogLog sketch
+(hyperloglog.py) of the distinct "run_id:tracking_id" of tracked
+detections. Tracking ids restart with every analysis run, so the run
+tells apart the tracks of repeated runs of one camera; frames stored
+without a run_id use their video_id instead. Sketches merge across
+cameras and hours, so unique counts of any range cost one register-wise
+$max over its rollups.
+
+The detection pipeline keeps the rollups current with a RollupWriter
+listener on its DetectionWriter ($inc / $max upserts per flushed batch). Frames stored before that, or by older workers, are
+rolled up with the backfill command, which recomputes whole hours and is
+safe to run again:
+
+    python ./app/detection/rollups.py [--since 2025-04-01] [--until 2025-05-01] [--camera_id cam1]
+"""
+import argparse
+import datetime
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from detection_schema import detection_classes, frame_field, adapt_query
+from hyperloglog import HyperLogLog
+
+# logger
+from logging import getLogger, basicConfig, INFO
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+ROLLUPS_COLLECTION = "detection_rollups"
+BACKFILL_BATCH = 1000   # frame documents per cursor batch
+
+
+def hour_of(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupAccumulator:
+    """Per (camera_id, hour, class) totals of a set of frame documents."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, docs):
+        for doc in docs:
+            ts = frame_field(doc, "frame_timestamp")
+            if ts is None:
+                continue
+            camera_id = frame_field(doc, "camera_id")
+            run_id = frame_field(doc, "run_id") or frame_field(doc, "video_id")
+            hour = hour_of(ts)
+            per_class = {}
+            for class_name, tracking_id in detection_classes(doc):
+                count, tracks = per_class.get(class_name, (0, []))
+                if tracking_id is not None:
+                    tracks.append(f"{run_id}:{tracking_id}")
+                per_class[class_name] = (count + 1, tracks)
+            for class_name, (count, tracks) in per_class.items():
+                row = self.rows.get((camera_id, hour, class_name))
+                if row is None:
+                    row = self.rows[(camera_id, hour, class_name)] = {
+                        "detections": 0, "frames": 0, "max_concurrent": 0, "hll": HyperLogLog()}
+                row["detections"] += count
+                row["frames"] += 1
+                row["max_concurrent"] = max(row["max_concurrent"], count)
+                for key in tracks:
+                    row["hll"].add(key)
+
+    def increments(self):
+        """Upserts that add these totals to the stored rollups."""
+        now = datetime.datetime.utcnow()
+        for (camera_id, hour, class_name), row in self.rows.items():
+            update = {
+                "$inc": {"detections": row["detections"], "frames": row["frames"]},
+                "$max": {"max_concurrent": row["max_concurrent"],
+                         **{f"hll.{index}": rank for index, rank in row["hll"].to_document().items()}},
+                "$set": {"updated_at": now},
+            }
+            if not row["hll"].registers:
+                update["$setOnInsert"] = {"hll": {}}
+            yield UpdateOne({"camera_id": camera_id, "hour": hour, "class": class_name}, update, upsert=True)
+
+    def replacements(self):
+        """Upserts that replace the stored rollups with these totals."""
+        now = datetime.datetime.utcnow()
+        for (camera_id, hour, class_name), row in self.rows.items():
+            key = {"camera_id": camera_id, "hour": hour, "class": class_name}
+            doc = dict(key, detections=row["detections"], frames=row["frames"],
+                       max_concurrent=row["max_concurrent"], hll=row["hll"].to_document(), updated_at=now)
+            yield ReplaceOne(key, doc, upsert=True)
+
+
+class RollupWriter:
+    """
+    DetectionWriter listener that folds every flushed batch of frame
+    documents into the rollups collection.
+
+        doc_writer.add_listener(RollupWriter(db["detection_rollups"]))
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.batches = 0
+        self.updates = 0
+        self.failures = 0
+
+    def __call__(self, docs):
+        acc = RollupAccumulator()
+        acc.add(docs)
+        ops = list(acc.increments())
+        if not ops:
+            return
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+            self.batches += 1
+            self.updates += len(ops)
+        except PyMongoError as e:
+            self.failures += 1
+            logger.error(f"rollup update failed for {len(docs)} frames: {e}")
+
+    def stats(self):
+        return {"batches": self.batches, "updates": self.updates, "failures": self.failures}
+
+
+def backfill(frames, rollups, since=None, until=None, camera_id=None, batch_size=BACKFILL_BATCH):
+    """
+    Recompute the rollups of every hour touched by the frame documents in
+    [since, until) (optionally of one camera) from `frames`.
+
+    The bounds are widened to whole hours so that no rollup is replaced
+    with a partial count. Returns the number of frames read and rollups
+    written.
+    """
+    query = {}
+    window = {}
+    if since is not None:
+        window["$gte"] = hour_of(since)
+    if until is not None:
+        window["$lt"] = hour_of(until) + datetime.timedelta(hours=1) if until != hour_of(until) else until
+    if window:
+        query["frame_timestamp"] = window
+    if camera_id:
+        query["camera_id"] = camera_id
+    acc = RollupAccumulator()
+    count = 0
+    for doc in frames.find(adapt_query(query), batch_size=batch_size):
+        acc.add([doc])
+        count += 1
+    ops = list(acc.replacements())
+    for i in range(0, len(ops), batch_size):
+        rollups.bulk_write(ops[i:i + batch_size], ordered=False)
+    return {"frames": count, "rollups": len(ops)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the hourly detection rollups from stored frames')
+    parser.add_argument('--mongo_uri', default=None)
+    parser.add_argument('--since', default=None, type=datetime.datetime.fromisoformat)
+    parser.add_argument('--until', default=None, type=datetime.datetime.fromisoformat)
+    parser.add_argument('--camera_id', default=None)
+    parser.add_argument('--batch_size', default=BACKFILL_BATCH, type=int)
+    args = parser.parse_args()
+
+    load_dotenv()
+    basicConfig(level=INFO)
+    db = MongoClient(args.mongo_uri or os.getenv("MONGO_URI"))["SurveillanceAI"]
+    result = backfill(db["detected_objects"], db[ROLLUPS_COLLECTION], args.since, args.until,
+                      args.camera_id, args.batch_size)
+    print(f"Rolled up {result['frames']} frames into {result['rollups']} hourly rollups")
+
+
+if __name__ == '__main__':
+    main()
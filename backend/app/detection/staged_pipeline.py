@@ -0,0 +1,196 @@
+import queue
+import threading
+import time
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+QUEUE_SIZE = 8    # items buffered between two stages
+POLL_INTERVAL = 0.1
+
+_END = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class Stage:
+    """
+    One step of a StagedPipeline.
+
+    fn is called with one item and returns the item handed to the next
+    stage. A stage with workers > 1 runs fn on several threads at once (this
+    only pays off when fn releases the GIL, e.g. inside OpenCV or the
+    inference runtime); its outputs are put back into input order before
+    they reach the next stage.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size
+
+
+class StagedPipeline:
+    """
+    Runs a source iterator and a chain of stages on their own threads,
+    connected by bounded queues, and yields the results in source order.
+
+    The source (e.g. capture/decode) runs on a feeder thread, every stage on
+    its worker threads, and the caller consumes the final results, so the
+    stages overlap instead of running strictly in sequence. Bounded queues
+    keep a slow consumer from letting frames pile up in memory.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self._stop = threading.Event()
+        self._errors = []
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._stats = {stage.name: {"items": 0, "busy_seconds": 0.0} for stage in stages}
+
+    # ---- queue helpers that give up once the pipeline is stopped ----
+
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        raise PipelineStopped()
+
+    def _fail(self, where, e):
+        logger.error(f"pipeline stage '{where}' failed: {e}")
+        self._errors.append(e)
+        self._stop.set()
+
+    # ---- threads ----
+
+    def _feed(self, source, out_q):
+        try:
+            for seq, item in enumerate(source):
+                if not self._put(out_q, (seq, item)):
+                    return
+            self._put(out_q, _END)
+        except Exception as e:
+            self._fail("source", e)
+
+    def _work(self, stage, in_q, out_q, remaining):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    # let the other workers of this stage see the end too
+                    self._put(in_q, _END)
+                    break
+                seq, value = item
+                start = time.monotonic()
+                value = stage.fn(value)
+                with self._stats_lock:
+                    stats = self._stats[stage.name]
+                    stats["items"] += 1
+                    stats["busy_seconds"] += time.monotonic() - start
+                if not self._put(out_q, (seq, value)):
+                    return
+        except PipelineStopped:
+            return
+        except Exception as e:
+            self._fail(stage.name, e)
+            return
+
+        with remaining[1]:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            self._put(out_q, _END)
+
+    def _reorder(self, in_q, out_q):
+        # put the outputs of a multi-worker stage back into source order
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    break
+                pending[item[0]] = item
+                while next_seq in pending:
+                    if not self._put(out_q, pending.pop(next_seq)):
+                        return
+                    next_seq += 1
+            for seq in sorted(pending):
+                if not self._put(out_q, pending.pop(seq)):
+                    return
+            self._put(out_q, _END)
+        except PipelineStopped:
+            return
+
+    def _start(self, target, *args, name=None):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    # ---- public API ----
+
+    def run(self, source):
+        """
+        Generator over the outputs of the last stage, in source order.
+
+        Closing the generator early (e.g. breaking out of the loop) stops
+        every stage. An exception raised by the source or any stage is
+        re-raised here.
+        """
+        q = queue.Queue(maxsize=self.stages[0].queue_size if self.stages else QUEUE_SIZE)
+        self._start(self._feed, source, q, name="pipeline-source")
+        for stage in self.stages:
+            out_q = queue.Queue(maxsize=stage.queue_size)
+            remaining = [stage.workers, threading.Lock()]
+            for i in range(stage.workers):
+                self._start(self._work, stage, q, out_q, remaining, name=f"pipeline-{stage.name}-{i}")
+            q = out_q
+            if stage.workers > 1:
+                ordered_q = queue.Queue(maxsize=stage.queue_size)
+                self._start(self._reorder, q, ordered_q, name=f"pipeline-{stage.name}-order")
+                q = ordered_q
+
+        try:
+            while True:
+                try:
+                    item = self._get(q)
+                except PipelineStopped:
+                    break
+                if item is _END:
+                    break
+                yield item[1]
+        finally:
+            self.stop()
+
+        if self._errors:
+            raise self._errors[0]
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
@@ -0,0 +1,189 @@
+import uuid
+from collections import Counter
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Parameters
+# ======================
+
+TRACKS_COLLECTION = "tracks"
+TRAJECTORY_INTERVAL = 10   # source frames between two stored trajectory points
+ATTRIBUTE_THRESHOLD = 0.5  # mean score above which a summarised attribute is True
+
+
+class _Track:
+    __slots__ = ('tracking_id', 'first_frame', 'last_frame', 'first_seen', 'last_seen', 'observations',
+                 'max_confidence', 'scores', 'labels', 'frames', 'boxes', 'last_box')
+
+    def __init__(self, tracking_id, frame_number, frame_timestamp):
+        self.tracking_id = tracking_id
+        self.first_frame = self.last_frame = frame_number
+        self.first_seen = self.last_seen = frame_timestamp
+        self.observations = 0
+        self.max_confidence = 0.0
+        self.scores = {}      # attribute -> [sum, count]
+        self.labels = {}      # attribute -> Counter of values (colours)
+        self.frames = []
+        self.boxes = []
+        self.last_box = None
+
+
+class TrackRecorder:
+    """
+    Summarises the tracked persons of one video run into one document per track.
+
+    observe() is called with every analysed frame, in frame order. When the
+    tracker drops a track, finish() turns it into a document with the
+    first/last frame and timestamp, an attribute summary (mean scores,
+    booleans above ATTRIBUTE_THRESHOLD, most frequent colours) and a
+    trajectory downsampled to one box every `trajectory_interval` source
+    frames (plus the last one). Documents go to `writer`, usually a
+    DetectionWriter on the tracks collection; close() finishes the tracks
+    that are still open when the video ends.
+    """
+
+    def __init__(self, writer, video_id, camera_id, sampling=None, trajectory_interval=TRAJECTORY_INTERVAL,
+                 run_id=None):
+        self.writer = writer
+        self.video_id = video_id
+        self.camera_id = camera_id
+        self.sampling = dict(sampling or {})
+        self.trajectory_interval = max(1, int(trajectory_interval))
+        # the pipeline passes the run_id of its frame documents
+        self.run_id = run_id or uuid.uuid4().hex
+        self._open = {}
+        self.tracks_written = 0
+        self.observations = 0
+
+    def observe(self, frame_number, frame_timestamp, tracking_ids, persons):
+        """
+        Parameters
+        ----------
+        frame_number : int
+        frame_timestamp : datetime
+        tracking_ids : list of int or None
+        persons : list of (obj, (x, y, w, h), attribute_scores, attributes)
+        """
+        for tracking_id, (obj, (x, y, w, h), _, attributes) in zip(tracking_ids, persons):
+            if tracking_id is None:
+                continue
+            track = self._open.get(tracking_id)
+            if track is None:
+                track = self._open[tracking_id] = _Track(tracking_id, frame_number, frame_timestamp)
+            track.last_frame = frame_number
+            track.last_seen = frame_timestamp
+            track.observations += 1
+            track.max_confidence = max(track.max_confidence, float(obj.prob))
+            for key, value in attributes.items():
+                if isinstance(value, str):
+                    track.labels.setdefault(key, Counter())[value] += 1
+                elif value is not None:
+                    acc = track.scores.setdefault(key, [0.0, 0])
+                    acc[0] += float(value)
+                    acc[1] += 1
+            box = [int(x), int(y), int(x + w), int(y + h)]
+            if not track.frames or frame_number - track.frames[-1] >= self.trajectory_interval:
+                track.frames.append(frame_number)
+                track.boxes.append(box)
+                track.last_box = None
+            else:
+                track.last_box = (frame_number, box)
+            self.observations += 1
+
+    def _document(self, track):
+        frames, boxes = list(track.frames), list(track.boxes)
+        if track.last_box is not None:
+            frames.append(track.last_box[0])
+            boxes.append(track.last_box[1])
+        attribute_scores = {key: round(total / count, 4) for key, (total, count) in track.scores.items()}
+        attributes = {key: score > ATTRIBUTE_THRESHOLD for key, score in attribute_scores.items()}
+        attributes.update({key: counts.most_common(1)[0][0] for key, counts in track.labels.items()})
+        return {
+            "run_id": self.run_id,
+            "tracking_id": int(track.tracking_id),
+            "video_id": self.video_id,
+            "camera_id": self.camera_id,
+            "class": "person",
+            "first_frame": track.first_frame,
+            "last_frame": track.last_frame,
+            "first_seen": track.first_seen,
+            "last_seen": track.last_seen,
+            "observations": track.observations,
+            "max_confidence": round(track.max_confidence, 4),
+            "attributes": attributes,
+            "attribute_scores": attribute_scores,
+            "trajectory": {"frames": frames, "boxes": boxes},
+            **self.sampling,
+        }
+
+    def finish(self, tracking_ids):
+        """Write the documents of tracks that ended."""
+        for tracking_id in tracking_ids:
+            track = self._open.pop(tracking_id, None)
+            if track is not None:
+                self.writer.write(self._document(track))
+                self.tracks_written += 1
+
+    def close(self):
+        self.finish(list(self._open))
+
+    def stats(self):
+        return {
+            "observations": self.observations,
+            "tracks_written": self.tracks_written,
+            "open_tracks": len(self._open),
+        }
+
+
+# ======================
+# Queries
+# ======================
+
+def _summary_condition(condition):
+    # a track's attributes are booleans over its mean score, so only boolean
+    # equality reads the same on the summary as on the frames; score
+    # thresholds, colours, $ne, $exists ... need the per-frame values
+    if isinstance(condition, bool):
+        return True
+    return isinstance(condition, dict) and list(condition) == ["$eq"] and isinstance(condition["$eq"], bool)
+
+
+def to_track_query(query):
+    """
+    Translate a frame query (v1 layout) into a query on the track store
+    (one document per tracked person), or return None if it needs
+    per-frame data.
+
+    Only person presence queries translate: boolean attribute equality and
+    the class inside detections.$elemMatch, camera_id/video_id and a
+    frame_timestamp range (a track matches when it overlaps the range).
+    """
+    track_query = {}
+    for key, value in query.items():
+        if key in ("camera_id", "video_id"):
+            track_query[key] = value
+        elif key == "frame_timestamp" and isinstance(value, dict):
+            for op, bound in value.items():
+                if op in ("$gte", "$gt"):
+                    track_query["last_seen"] = {op: bound}
+                elif op in ("$lte", "$lt"):
+                    track_query["first_seen"] = {op: bound}
+                else:
+                    return None
+        elif key == "detections" and isinstance(value, dict) and list(value) == ["$elemMatch"]:
+            for field, condition in value["$elemMatch"].items():
+                if field == "class" or (field.startswith("attributes.") and _summary_condition(condition)):
+                    track_query[field] = condition
+                else:
+                    return None
+        elif key == "detections.class":
+            track_query["class"] = value
+        else:
+            return None
+    # only persons are tracked
+    if track_query.get("class") != "person":
+        return None
+    return track_query
@@ -0,0 +1,149 @@
+import threading
+
+import cv2
+import numpy as np
+
+REFRESH_INTERVAL = 10        # recompute a track's attributes at least every N frames
+DRIFT_THRESHOLD = 0.35       # Bhattacharyya distance that counts as a changed appearance
+EMA_ALPHA = 0.5              # weight of a fresh attribute score against the smoothed one
+HIST_BINS = (8, 4)           # hue x saturation bins of the appearance signature
+SIGNATURE_SIZE = (16, 32)    # crops are reduced to this (w, h) before the histogram
+
+
+def appearance_signature(crop, bins=HIST_BINS):
+    """
+    Hue/saturation histogram of a person crop, normalised to sum 1.
+
+    Parameters
+    ----------
+    crop : np.ndarray
+        BGR image.
+    bins : tuple of int
+        Number of hue and saturation bins.
+
+    Returns
+    -------
+    out : np.ndarray or None
+        float32 histogram, None for an empty crop.
+    """
+    if crop is None or crop.size == 0:
+        return None
+    small = cv2.resize(crop, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, list(bins), [0, 180, 0, 256])
+    cv2.normalize(hist, hist, 1, 0, cv2.NORM_L1)
+    return hist
+
+
+class _Entry:
+    __slots__ = ('signature', 'age', 'scores', 'attributes')
+
+    def __init__(self):
+        self.signature = None
+        self.age = 0
+        self.scores = None
+        self.attributes = None
+
+
+class AttributeCache:
+    """
+    Per-track memo of person attributes, clothing and colours.
+
+    A tracked person's clothes do not change between frames, so the
+    secondary models only need to run when a track is born, every
+    `refresh_interval` frames, or when the crop's hue/saturation histogram
+    drifted more than `drift_threshold` (Bhattacharyya distance) from the
+    one seen at the last refresh. Fresh attribute scores are blended into
+    the cached ones with an exponential moving average (weight
+    `ema_alpha`); colours are categorical and take the latest value.
+
+    needs_refresh() and update() may be called from different threads (the
+    video pipeline decides in its tracking stage and fills the cache in a
+    later, ordered stage).
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, drift_threshold=DRIFT_THRESHOLD, ema_alpha=EMA_ALPHA):
+        self.refresh_interval = max(1, int(refresh_interval))
+        self.drift_threshold = drift_threshold
+        self.ema_alpha = ema_alpha
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.births = 0
+        self.interval_refreshes = 0
+        self.drift_refreshes = 0
+
+    def needs_refresh(self, track_id, crop):
+        """True if the attributes of track_id must be recomputed for this crop."""
+        if track_id is None:
+            return True
+        signature = appearance_signature(crop) if self.drift_threshold is not None else None
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get(track_id)
+            if entry is None:
+                entry = self._entries[track_id] = _Entry()
+                self.births += 1
+                refresh = True
+            elif entry.age + 1 >= self.refresh_interval or entry.scores is None:
+                self.interval_refreshes += 1
+                refresh = True
+            elif (signature is not None and entry.signature is not None
+                  and cv2.compareHist(entry.signature, signature, cv2.HISTCMP_BHATTACHARYYA) > self.drift_threshold):
+                self.drift_refreshes += 1
+                refresh = True
+            else:
+                refresh = False
+            if refresh:
+                entry.signature = signature
+                entry.age = 0
+            else:
+                entry.age += 1
+                self.hits += 1
+        return refresh
+
+    def update(self, track_id, scores, attributes):
+        """
+        Store freshly computed scores and attributes for track_id.
+
+        Returns the smoothed (scores, attributes) to report.
+        """
+        scores = np.asarray(scores, dtype=np.float32)
+        if track_id is None:
+            return scores, attributes
+        with self._lock:
+            entry = self._entries.get(track_id)
+            if entry is None:
+                entry = self._entries[track_id] = _Entry()
+            if entry.scores is not None and entry.scores.shape == scores.shape:
+                scores = self.ema_alpha * scores + (1.0 - self.ema_alpha) * entry.scores
+            entry.scores = scores
+            entry.attributes = dict(attributes)
+        return scores, attributes
+
+    def get(self, track_id):
+        """Cached (scores, attributes) of track_id, or None."""
+        with self._lock:
+            entry = self._entries.get(track_id)
+            if entry is None or entry.scores is None:
+                return None
+            return entry.scores, dict(entry.attributes)
+
+    def forget(self, track_ids):
+        """Drop the entries of tracks the tracker removed."""
+        with self._lock:
+            for track_id in track_ids:
+                self._entries.pop(track_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracks": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "births": self.births,
+                "interval_refreshes": self.interval_refreshes,
+                "drift_refreshes": self.drift_refreshes,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            }
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Per-crop benchmark of color_utils.dominant_color against the per-pixel
+closest_color loop it replaced.
+
+    python ./app/detection/util/bench_color.py [--crops 300] [--size 300 150]
+        [--sample_steps 10 2] [--bits 6] [--space rgb]
+
+Also reports how often the two name the same colour for the random crops.
+"""
+import argparse
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from color_utils import ColorLUT, closest_color, dominant_color, known_colors
+
+
+def loop_dominant_color(img_crop, sample_step=10, center_crop_ratio=0.5):
+    # dominant_color before the lookup table
+    image_rgb = cv2.cvtColor(img_crop, cv2.COLOR_BGR2RGB)
+    height, width, _ = image_rgb.shape
+    crop_h = int(height * center_crop_ratio)
+    crop_w = int(width * center_crop_ratio)
+    start_y = (height - crop_h) // 2
+    start_x = (width - crop_w) // 2
+    center_crop = image_rgb[start_y:start_y + crop_h, start_x:start_x + crop_w]
+
+    color_counts = Counter()
+    for y in range(0, center_crop.shape[0], sample_step):
+        for x in range(0, center_crop.shape[1], sample_step):
+            color_counts[closest_color(center_crop[y, x], known_colors)] += 1
+    for color, _ in color_counts.most_common():
+        return color
+    return None
+
+
+def make_crops(n, height, width, seed=0):
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(n):
+        patches = rng.integers(0, 256, (int(rng.integers(1, 4)), 3))
+        crop = patches[rng.integers(0, len(patches), (height, 1))] + rng.integers(-25, 26, (height, width, 3))
+        crops.append(np.clip(crop, 0, 255).astype(np.uint8))
+    return crops
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time dominant_color against the per-pixel loop')
+    parser.add_argument('--crops', type=int, default=300)
+    parser.add_argument('--size', type=int, nargs=2, default=[300, 150], metavar=('HEIGHT', 'WIDTH'))
+    parser.add_argument('--sample_steps', type=int, nargs='+', default=[10, 2])
+    parser.add_argument('--bits', type=int, default=6)
+    parser.add_argument('--space', default='rgb', choices=['rgb', 'lab'])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    lut = ColorLUT(bits=args.bits, space=args.space)
+    print(f"{args.bits}-bit {args.space} table built in {time.perf_counter() - start:.2f}s")
+
+    crops = make_crops(args.crops, *args.size)
+    for sample_step in args.sample_steps:
+        start = time.perf_counter()
+        expected = [loop_dominant_color(crop, sample_step) for crop in crops]
+        loop = (time.perf_counter() - start) / len(crops)
+        start = time.perf_counter()
+        actual = [dominant_color(crop, sample_step, lut=lut) for crop in crops]
+        fast = (time.perf_counter() - start) / len(crops)
+        agree = sum(a == e for a, e in zip(actual, expected)) / len(crops)
+        print(f"sample_step={sample_step}: {loop * 1000:.3f} ms -> {fast * 1000:.3f} ms per crop "
+              f"({loop / fast:.0f}x), {agree:.1%} agree")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of fast_nms_utils against the nms_utils loops.
+
+    python ./app/detection/util/bench_nms.py [--sizes 100 1000 10000] [--repeat 5]
+        [--classes 10] [--max_reference 10000]
+
+Boxes are drawn in clusters around random centres, as a detector emits them
+before NMS, and sorted by score like post_processing does. Every size is
+checked for identical output before it is timed. The nms_utils loops are
+quadratic in Python (one to two minutes for 10000 boxes); --max_reference skips
+them above that size.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import fast_nms_utils
+import nms_utils
+
+
+def make_boxes(n, classes, seed=0, size=1920, per_cluster=8):
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform(0, size, (max(1, n // per_cluster), 2))
+    xy = centres[rng.integers(0, len(centres), n)] + rng.normal(0, 6, (n, 2))
+    wh = rng.uniform(20, 120, (n, 2))
+    boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+    scores = -np.sort(-rng.random(n))
+    labels = rng.integers(0, classes, n)
+    return boxes, scores, labels
+
+
+def best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time fast_nms_utils against nms_utils')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--iou', type=float, default=0.45)
+    parser.add_argument('--max_reference', type=int, default=10000,
+                        help='largest size the nms_utils loops are run for')
+    args = parser.parse_args()
+
+    functions = [
+        ('nms_boxes', lambda m, b, s, l: m.nms_boxes(b, s, args.iou)),
+        ('batched_nms', lambda m, b, s, l: m.batched_nms(b, s, l, args.iou)),
+    ]
+    print(f"{'function':<12} {'boxes':>6} {'nms_utils':>12} {'fast':>10} {'speedup':>8}")
+    for n in args.sizes:
+        boxes, scores, labels = make_boxes(n, args.classes)
+        for name, call in functions:
+            fast, fast_keep = best_time(lambda: call(fast_nms_utils, boxes, scores, labels), args.repeat)
+            if n <= args.max_reference:
+                # the loops are slow enough that one run is representative
+                ref, ref_keep = best_time(lambda: call(nms_utils, boxes, scores, labels), 1 if n > 1000 else args.repeat)
+                if not np.array_equal(ref_keep, fast_keep):
+                    raise SystemExit(f"{name} differs from nms_utils for {n} boxes")
+                print(f"{name:<12} {n:>6} {ref * 1000:>10.1f}ms {fast * 1000:>8.2f}ms {ref / fast:>7.0f}x")
+            else:
+                print(f"{name:<12} {n:>6} {'-':>12} {fast * 1000:>8.2f}ms {'-':>8}")
+
+
+if __name__ == '__main__':
+    main()
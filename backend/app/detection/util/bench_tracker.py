@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Synthetic crowd benchmark of tracker_utils.Tracker against the centroid
+tracker and match_tracker pass it replaced.
+
+    python ./app/detection/util/bench_tracker.py [--people 10 50 100 200] [--frames 100]
+
+Every person is a 40x100 box drifting at a random velocity over a
+1920x1080 frame (bouncing off the edges), with a little detection jitter.
+Reports the time per frame and the identity switches, i.e. frames in
+which a person's track id differs from the one it had the frame before,
+plus the detections left without an id.
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy.spatial import distance as dist
+
+from tracker_utils import Tracker
+
+FRAME_SIZE = (1920, 1080)
+BOX_SIZE = (40, 100)
+
+
+class CentroidTracker:
+    # the tracker of working_yolov9/main_yolo9 before tracker_utils
+    def __init__(self, maxDisappeared=20, maxDistance=50):
+        self.nextObjectID = 0
+        self.objects = {}
+        self.disappeared = {}
+        self.maxDisappeared = maxDisappeared
+        self.maxDistance = maxDistance
+
+    def register(self, bbox):
+        cX = int(bbox[0] + bbox[2] / 2)
+        cY = int(bbox[1] + bbox[3] / 2)
+        self.objects[self.nextObjectID] = (bbox, (cX, cY))
+        self.disappeared[self.nextObjectID] = 0
+        self.nextObjectID += 1
+
+    def deregister(self, objectID):
+        del self.objects[objectID]
+        del self.disappeared[objectID]
+
+    def update(self, rects):
+        if not rects:
+            for objectID in list(self.disappeared.keys()):
+                self.disappeared[objectID] += 1
+                if self.disappeared[objectID] > self.maxDisappeared:
+                    self.deregister(objectID)
+            return self.objects
+        inputCentroids = np.array([(int(x + w / 2), int(y + h / 2)) for (x, y, w, h) in rects])
+        if not self.objects:
+            for bbox in rects:
+                self.register(bbox)
+        else:
+            objectIDs = list(self.objects.keys())
+            objectCentroids = np.array([self.objects[id][1] for id in objectIDs])
+            D = dist.cdist(objectCentroids, inputCentroids)
+            rows = D.min(axis=1).argsort()
+            cols = D.argmin(axis=1)[rows]
+            usedRows, usedCols = set(), set()
+            for (row, col) in zip(rows, cols):
+                if row in usedRows or col in usedCols or D[row, col] > self.maxDistance:
+                    continue
+                objectID = objectIDs[row]
+                self.objects[objectID] = (rects[col], tuple(inputCentroids[col]))
+                self.disappeared[objectID] = 0
+                usedRows.add(row)
+                usedCols.add(col)
+            unusedRows = set(range(D.shape[0])).difference(usedRows)
+            unusedCols = set(range(D.shape[1])).difference(usedCols)
+            if D.shape[0] >= D.shape[1]:
+                for row in unusedRows:
+                    objectID = objectIDs[row]
+                    self.disappeared[objectID] += 1
+                    if self.disappeared[objectID] > self.maxDisappeared:
+                        self.deregister(objectID)
+            else:
+                for col in unusedCols:
+                    self.register(rects[col])
+        return self.objects
+
+
+def match_tracker(detection_box, tracker_objects, max_distance=30):
+    cX = detection_box[0] + detection_box[2] / 2
+    cY = detection_box[1] + detection_box[3] / 2
+    best_id, best_dist = None, max_distance
+    for tid, (bbox, centroid) in tracker_objects.items():
+        d = np.linalg.norm(np.array([cX, cY]) - np.array(centroid))
+        if d < best_dist:
+            best_dist = d
+            best_id = tid
+    return best_id
+
+
+def make_crowd(people, frames, seed=0):
+    """(frames, people, 4) (x, y, w, h) boxes; row i is always person i."""
+    rng = np.random.default_rng(seed)
+    limit = np.array(FRAME_SIZE) - np.array(BOX_SIZE)
+    pos = rng.uniform(0, limit, (people, 2))
+    vel = rng.uniform(-8, 8, (people, 2))
+    out = np.empty((frames, people, 4))
+    for f in range(frames):
+        pos += vel
+        bounce = (pos < 0) | (pos > limit)
+        vel[bounce] = -vel[bounce]
+        pos = np.clip(pos, 0, limit)
+        out[f, :, :2] = pos + rng.normal(0, 1.5, (people, 2))
+        out[f, :, 2:] = np.array(BOX_SIZE) + rng.normal(0, 2, (people, 2))
+    return np.rint(out).astype(int)
+
+
+def run_old(crowd):
+    tracker = CentroidTracker(maxDisappeared=20, maxDistance=50)
+    ids = []
+    for boxes in crowd:
+        rects = [tuple(box) for box in boxes.tolist()]
+        objects = tracker.update(rects)
+        ids.append([match_tracker(box, objects, max_distance=50) for box in rects])
+    return ids
+
+
+def run_new(crowd):
+    tracker = Tracker()
+    ids = []
+    for boxes in crowd:
+        assignments = tracker.update(boxes)
+        ids.append([assignments.get(i) for i in range(len(boxes))])
+    return ids
+
+
+def identity_errors(ids):
+    """(id switches, detections without an id) of per-frame id lists."""
+    switches = missing = 0
+    last = {}
+    for frame_ids in ids:
+        for person, track_id in enumerate(frame_ids):
+            if track_id is None:
+                missing += 1
+                continue
+            if person in last and last[person] != track_id:
+                switches += 1
+            last[person] = track_id
+    return switches, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the tracker on synthetic crowds')
+    parser.add_argument('--people', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('--frames', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'people':>6} {'old ms':>8} {'new ms':>8} {'switches old/new':>17} {'no id old/new':>14}")
+    for people in args.people:
+        crowd = make_crowd(people, args.frames)
+        results = []
+        for run in (run_old, run_new):
+            start = time.perf_counter()
+            ids = run(crowd)
+            results.append(((time.perf_counter() - start) / args.frames * 1000, identity_errors(ids)))
+        (old_ms, (old_sw, old_no)), (new_ms, (new_sw, new_no)) = results
+        print(f"{people:>6} {old_ms:>8.2f} {new_ms:>8.2f} {f'{old_sw} / {new_sw}':>17} {f'{old_no} / {new_no}':>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Reference colours used to name the dominant colour of a crop
+known_colors = {
+    "Red":      np.array([255, 0, 0]),
+    "Green":    np.array([0, 255, 0]),
+    "Blue":     np.array([0, 0, 255]),
+    "Yellow":   np.array([255, 255, 0]),
+    "Orange":   np.array([255, 165, 0]),
+    "Purple":   np.array([128, 0, 128]),
+    "Cyan":     np.array([0, 255, 255]),
+    "Magenta":  np.array([255, 0, 255]),
+    "Black":    np.array([0, 0, 0]),
+    "White":    np.array([255, 255, 255]),
+    "Gray":     np.array([128, 128, 128])
+}
+
+# 6 bits per channel: 64^3 entries (256 KB), built in a fraction of a second
+DEFAULT_LUT_BITS = 6
+
+
+def closest_color(pixel, color_dict):
+    pixel = np.array(pixel, dtype=np.float32)
+    min_dist = float("inf")
+    best_color = None
+    for name, value in color_dict.items():
+        d = np.linalg.norm(pixel - value)
+        if d < min_dist:
+            min_dist = d
+            best_color = name
+    return best_color
+
+
+def _rgb_to_lab(rgb):
+    # rgb: (N, 3) values in 0..255 -> (N, 3) CIELAB (L in 0..100)
+    img = (np.asarray(rgb, dtype=np.float32) / 255.0).reshape(-1, 1, 3)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2Lab).reshape(-1, 3)
+
+
+class ColorLUT:
+    """
+    Precomputed quantized RGB -> colour name lookup table.
+
+    Every RGB value is reduced to `bits` bits per channel and the resulting
+    bin is labelled once, up front, with its nearest reference colour (by
+    Euclidean distance in RGB, or in CIELAB when space='lab'). Labelling a
+    whole crop is then a single fancy-indexing operation.
+    """
+
+    def __init__(self, colors=None, bits=DEFAULT_LUT_BITS, space='rgb'):
+        if space not in ('rgb', 'lab'):
+            raise ValueError(f'Unknown colour space: {space}')
+        colors = known_colors if colors is None else colors
+        self.names = list(colors.keys())
+        self.bits = bits
+        self.space = space
+        self.shift = 8 - bits
+
+        levels = 1 << bits
+        # label each bin by its centre value (bins are exact when bits == 8)
+        centers = (np.arange(levels) << self.shift) + ((1 << self.shift) >> 1)
+        r, g, b = np.meshgrid(centers, centers, centers, indexing='ij')
+        grid = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+        palette = np.array([colors[name] for name in self.names])
+
+        if space == 'lab':
+            grid = _rgb_to_lab(grid)
+            palette = _rgb_to_lab(palette)
+        else:
+            # integer squared distances are exact, so ties resolve like
+            # closest_color (first colour in dict order wins)
+            grid = grid.astype(np.int32)
+            palette = palette.astype(np.int32)
+
+        self.table = np.empty(len(grid), dtype=np.uint8)
+        chunk = 1 << 18
+        for start in range(0, len(grid), chunk):
+            c = grid[start:start + chunk]
+            d = ((c[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
+            self.table[start:start + chunk] = d.argmin(axis=1)
+
+    def label_bgr(self, pixels):
+        """Map an (..., 3) BGR uint8 array to colour indices, in one lookup."""
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        bits, shift = self.bits, self.shift
+        b = pixels[..., 0] >> shift
+        g = pixels[..., 1] >> shift
+        r = pixels[..., 2] >> shift
+        idx = (r.astype(np.intp) << (2 * bits)) | (g.astype(np.intp) << bits) | b
+        return self.table[idx]
+
+
+_color_luts = {}
+_color_luts_lock = threading.Lock()
+
+
+def get_color_lut(bits=DEFAULT_LUT_BITS, space='rgb'):
+    # process-wide cache of the default-palette tables
+    key = (bits, space)
+    with _color_luts_lock:
+        if key not in _color_luts:
+            _color_luts[key] = ColorLUT(bits=bits, space=space)
+        return _color_luts[key]
+
+
+def dominant_color(img_crop, sample_step=10, center_crop_ratio=0.5, lut=None):
+    """
+    Finds the dominant color in the center portion of the cropped clothing item.
+    center_crop_ratio: how much of the center (0.5 = 50%) to focus on
+
+    Every sample_step-th pixel of the centre region is labelled through a
+    ColorLUT (the default RGB table unless `lut` is given) and the most
+    frequent label wins; ties go to the label seen first in raster order.
+    """
+    if img_crop is None or img_crop.size == 0:
+        return None
+    height, width = img_crop.shape[:2]
+
+    # Calculate central region
+    crop_h = int(height * center_crop_ratio)
+    crop_w = int(width * center_crop_ratio)
+    start_y = (height - crop_h) // 2
+    start_x = (width - crop_w) // 2
+    end_y = start_y + crop_h
+    end_x = start_x + crop_w
+
+    # Sampled pixels of the focused center crop (still BGR)
+    samples = img_crop[start_y:end_y:sample_step, start_x:end_x:sample_step]
+    if samples.size == 0:
+        return None
+
+    lut = get_color_lut() if lut is None else lut
+    labels = lut.label_bgr(samples).ravel()
+    counts = np.bincount(labels, minlength=len(lut.names))
+    best = np.flatnonzero(counts == counts.max())
+    if len(best) > 1:
+        first_seen = [np.argmax(labels == i) for i in best]
+        best = best[np.argmin(first_seen)]
+    else:
+        best = best[0]
+    return lut.names[best]
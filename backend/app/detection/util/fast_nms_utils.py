@@ -0,0 +1,275 @@
+import numpy as np
+
+# The greedy pass works on blocks of this many score-sorted boxes, so the
+# largest IoU matrix held in memory is (kept boxes) x NMS_BLOCK_SIZE.
+NMS_BLOCK_SIZE = 1024
+
+
+def box_areas(boxes):
+    # same "+1 pixel" convention as nms_utils.bb_intersection_over_union
+    return (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise IoU of two sets of xyxy boxes, computed in one shot.
+
+    Parameters
+    ----------
+    boxes_a : numpy array (N, 4)
+    boxes_b : numpy array (M, 4)
+
+    Returns
+    -------
+    iou : numpy array (N, M)
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    inter = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    inter -= np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    inter += 1
+    np.maximum(inter, 0, out=inter)
+    ih = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    ih -= np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    ih += 1
+    np.maximum(ih, 0, out=ih)
+    inter *= ih
+
+    union = box_areas(boxes_a)[:, None] + box_areas(boxes_b)[None, :]
+    union -= inter
+    inter /= union
+    return inter
+
+
+def _iou_row(boxes, areas, i, others):
+    # IoU of boxes[i] against boxes[others], without building the full matrix
+    xA = np.maximum(boxes[i, 0], boxes[others, 0])
+    yA = np.maximum(boxes[i, 1], boxes[others, 1])
+    xB = np.minimum(boxes[i, 2], boxes[others, 2])
+    yB = np.minimum(boxes[i, 3], boxes[others, 3])
+    inter = np.maximum(0, xB - xA + 1) * np.maximum(0, yB - yA + 1)
+    return inter / (areas[i] + areas[others] - inter)
+
+
+def _greedy_nms(boxes, iou_thres):
+    # Standard greedy NMS over boxes that are already sorted by score
+    # (descending). Returns a boolean keep mask.
+    n = len(boxes)
+    suppressed = np.zeros(n, dtype=bool)
+    kept = np.zeros(0, dtype=np.int64)
+    for start in range(0, n, NMS_BLOCK_SIZE):
+        stop = min(start + NMS_BLOCK_SIZE, n)
+        block = boxes[start:stop]
+        block_suppressed = suppressed[start:stop]
+
+        # boxes kept in earlier blocks are final, apply them in one go
+        if kept.size:
+            block_suppressed |= (box_iou_matrix(boxes[kept], block) >= iou_thres).any(axis=0)
+
+        # rows that overlap nothing later in the block cannot suppress
+        # anything, so only the others need the sequential pass
+        overlap = np.triu(box_iou_matrix(block, block) >= iou_thres, k=1)
+        for i in np.nonzero(overlap.any(axis=1))[0]:
+            if not block_suppressed[i]:
+                block_suppressed |= overlap[i]
+
+        kept = np.concatenate([kept, start + np.nonzero(~block_suppressed)[0]])
+
+    return ~suppressed
+
+
+def _sequential_nms(boxes, scores, iou_thres):
+    # Row-at-a-time replay of nms_utils.nms_boxes for boxes that are not
+    # sorted by score: box i is compared against the earlier boxes that are
+    # still kept, suppresses those it beats and stops at the first one that
+    # beats it.
+    n = len(boxes)
+    keep = np.zeros(n, dtype=bool)
+    areas = box_areas(boxes)
+    for i in range(n):
+        prev = np.nonzero(keep[:i])[0]
+        if prev.size:
+            hits = prev[_iou_row(boxes, areas, i, prev) >= iou_thres]
+            losers = scores[i] > scores[hits]
+            if not losers.all():
+                first_winner = np.argmin(losers)
+                keep[hits[:first_winner]] = False
+                continue
+            keep[hits] = False
+        keep[i] = True
+    return keep
+
+
+def _is_sorted_desc(scores):
+    return bool(np.all(scores[1:] <= scores[:-1]))
+
+
+def nms_boxes(boxes, scores, iou_thres):
+    """
+    Vectorized drop-in for nms_utils.nms_boxes.
+
+    Returns the indices of the kept boxes in ascending order. Score-sorted
+    input (what post_processing produces) takes the greedy fast path; any
+    other order is replayed with the same semantics as the original loop.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores)
+    if _is_sorted_desc(scores):
+        keep = _greedy_nms(boxes, iou_thres)
+    else:
+        keep = _sequential_nms(boxes, scores, iou_thres)
+    return keep.nonzero()[0]
+
+
+def _offset_boxes(boxes, labels):
+    # Class-offset trick: shift every class into its own disjoint region so a
+    # single NMS pass can never suppress across classes.
+    _, label_idx = np.unique(labels, return_inverse=True)
+    span = boxes.max() - min(boxes.min(), 0) + 2
+    return boxes + (label_idx.reshape(-1) * span)[:, None]
+
+
+def batched_nms(boxes, scores, labels, iou_thres):
+    """
+    Vectorized drop-in for nms_utils.batched_nms (per-class NMS).
+
+    Returns the kept indices ordered by descending score.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores)
+    labels = np.asarray(labels)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if _is_sorted_desc(scores):
+        keep = _greedy_nms(_offset_boxes(boxes, labels), iou_thres).nonzero()[0]
+    else:
+        a = []
+        for i in np.unique(labels):
+            idx = np.nonzero(labels == i)[0]
+            idx = idx[nms_boxes(boxes[idx], scores[idx], iou_thres)]
+            a.append(idx)
+        keep = np.concatenate(a)
+
+    # same grouping (by label, then index) before the final sort as the
+    # original, so ties come out in the same order
+    keep = keep[np.lexsort((keep, labels[keep]))]
+    idxs = np.argsort(-scores[keep])
+    return keep[idxs]
+
+
+def packed_nms(boxes, scores, iou_thres):
+    """
+    Vectorized drop-in for nms_utils.packed_nms.
+
+    Returns a list of index lists, each group led by its highest scoring box.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    areas = box_areas(boxes)
+    packed_idx = []
+    remained = np.argsort(-np.asarray(scores))
+    while 0 < len(remained):
+        i = remained[0]
+        rest = remained[1:]
+        similar = _iou_row(boxes, areas, i, rest) > iou_thres
+        packed_idx.append([i] + rest[similar].tolist())
+        remained = rest[~similar]
+
+    return packed_idx
+
+
+def nms_between_categories(detections, w, h, categories=None, iou_threshold=0.25):
+    """
+    Vectorized drop-in for nms_utils.nms_between_categories.
+
+    The IoU matrix of all detections is computed once; the keep/suppress
+    rules of the original (input order, compare against earlier survivors)
+    are then applied one row at a time.
+    """
+    n = len(detections)
+    if n == 0:
+        return []
+
+    boxes = np.array([
+        [w * d.x, h * d.y, w * (d.x + d.w), h * (d.y + d.h)] for d in detections
+    ], dtype=np.float64)
+    probs = np.array([d.prob for d in detections], dtype=np.float64)
+    overlap = box_iou_matrix(boxes, boxes) >= iou_threshold
+    if categories is not None:
+        in_categories = np.array([d.category in categories for d in detections])
+        overlap &= in_categories[:, None] & in_categories[None, :]
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = True
+    for idx in range(1, n):
+        hits = np.nonzero(keep[:idx] & overlap[idx, :idx])[0]
+        beaten = probs[hits] <= probs[idx]
+        keep[hits[beaten]] = False
+        keep[idx] = beaten.all()
+
+    return [detections[idx] for idx in range(n) if keep[idx]]
+
+
+def soft_nms(boxes, scores, iou_thres=0.3, sigma=0.5, score_thres=0.001, method='gaussian'):
+    """
+    Soft-NMS (Bodla et al.): instead of discarding overlapping boxes, decay
+    their scores by their overlap with each selected box.
+
+    Parameters
+    ----------
+    boxes : numpy array (N, 4)
+        xyxy boxes
+    scores : numpy array (N,)
+    iou_thres : float
+        overlap above which the 'linear' method starts decaying scores
+    sigma : float
+        spread of the 'gaussian' decay
+    score_thres : float
+        boxes whose decayed score falls below this are dropped
+    method : str
+        'gaussian', 'linear' or 'hard' (plain NMS)
+
+    Returns
+    -------
+    keep : numpy array
+        kept indices ordered by their (decayed) score
+    scores : numpy array (N,)
+        decayed scores for every input box
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.array(scores, dtype=np.float64)
+    areas = box_areas(boxes)
+    remaining = np.arange(len(boxes))
+    keep = []
+    while remaining.size > 0:
+        best = np.argmax(scores[remaining])
+        i = remaining[best]
+        keep.append(i)
+        remaining = np.delete(remaining, best)
+        if remaining.size == 0:
+            break
+        iou = _iou_row(boxes, areas, i, remaining)
+        if method == 'gaussian':
+            decay = np.exp(-(iou * iou) / sigma)
+        elif method == 'linear':
+            decay = np.where(iou > iou_thres, 1 - iou, 1.0)
+        elif method == 'hard':
+            decay = np.where(iou >= iou_thres, 0.0, 1.0)
+        else:
+            raise ValueError(f'Unknown soft-nms method: {method}')
+        scores[remaining] *= decay
+        remaining = remaining[scores[remaining] >= score_thres]
+
+    return np.array(keep, dtype=np.int64), scores
+
+
+def batched_soft_nms(boxes, scores, labels, iou_thres=0.3, sigma=0.5, score_thres=0.001, method='gaussian'):
+    # per-class Soft-NMS using the same class-offset trick as batched_nms
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64), np.asarray(scores, dtype=np.float64)
+    return soft_nms(
+        _offset_boxes(boxes, np.asarray(labels)), scores,
+        iou_thres=iou_thres, sigma=sigma, score_thres=score_thres, method=method
+    )
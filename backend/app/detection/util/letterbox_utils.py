@@ -0,0 +1,93 @@
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+PAD_VALUE = 114
+STRIDE = 32
+
+# ratio: resize gain, (left, top): padding added before the resized image,
+# (ow, oh): size of the resized image, (width, height): network input size
+Letterbox = namedtuple('Letterbox', ['ratio', 'left', 'top', 'ow', 'oh', 'width', 'height'])
+
+
+def letterbox_params(im_h, im_w, size, stride=STRIDE):
+    """Letterbox geometry used by YOLO preprocessing for an im_h x im_w frame."""
+    r = min(size / im_h, size / im_w)
+    oh, ow = int(round(im_h * r)), int(round(im_w * r))
+    dh, dw = size - oh, size - ow
+    dw, dh = np.mod(dw, stride) / 2, np.mod(dh, stride) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return Letterbox(r, left, top, ow, oh, ow + left + right, oh + top + bottom)
+
+
+class LetterboxPreprocessor:
+    """
+    YOLO letterbox preprocessing into reusable float32 buffers.
+
+    For every input frame shape a (1, 3, H, W) float32 buffer is allocated
+    once, with the padding already filled in. Each call resizes the frame
+    into a preallocated uint8 image and writes the channels of that image,
+    swapped to RGB and divided by 255, straight into the padded region of
+    the buffer. Nothing frame sized is allocated per call.
+
+    Buffers are kept per thread, so several inference workers can share one
+    preprocessor; the returned array is overwritten by the next call from
+    the same thread.
+    """
+
+    def __init__(self, size, stride=STRIDE, pad_value=PAD_VALUE):
+        self.size = size
+        self.stride = stride
+        self.pad_value = pad_value
+        self._params = {}
+        self._local = threading.local()
+
+    def params(self, orig_shape):
+        """Letterbox parameters used for frames of shape orig_shape."""
+        key = tuple(orig_shape[:2])
+        params = self._params.get(key)
+        if params is None:
+            params = letterbox_params(key[0], key[1], self.size, self.stride)
+            self._params[key] = params
+        return params
+
+    def _buffers(self, params):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        entry = buffers.get(params)
+        if entry is None:
+            blob = np.full((1, 3, params.height, params.width), self.pad_value / 255.0, dtype=np.float32)
+            resized = np.empty((params.oh, params.ow, 3), dtype=np.uint8)
+            entry = buffers[params] = (blob, resized)
+        return entry
+
+    def __call__(self, img):
+        """Letterboxed (1, 3, H, W) float32 RGB input for a BGR uint8 frame."""
+        im_h, im_w = img.shape[:2]
+        params = self.params(img.shape)
+        blob, resized = self._buffers(params)
+        if params.ow != im_w or params.oh != im_h:
+            cv2.resize(img, (params.ow, params.oh), dst=resized, interpolation=cv2.INTER_LINEAR)
+            src = resized
+        else:
+            src = img
+        top, left = params.top, params.left
+        for c in range(3):
+            # BGR -> RGB by reading the channels in reverse order
+            np.divide(src[:, :, 2 - c], 255.0,
+                      out=blob[0, c, top:top + params.oh, left:left + params.ow], casting='unsafe')
+        return blob
+
+    def scale_boxes(self, boxes, orig_shape):
+        """Map xyxy boxes from network input back to the original frame, in place."""
+        params = self.params(orig_shape)
+        boxes[..., [0, 2]] -= params.left
+        boxes[..., [1, 3]] -= params.top
+        boxes[..., :4] /= params.ratio
+        boxes[..., [0, 2]] = boxes[..., [0, 2]].clip(0, orig_shape[1])
+        boxes[..., [1, 3]] = boxes[..., [1, 3]].clip(0, orig_shape[0])
+        return boxes
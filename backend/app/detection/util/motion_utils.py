@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+# Available gating methods
+MOTION_METHODS = ['off', 'diff', 'mog2']
+
+MOTION_THRESHOLD = 0.002     # fraction of changed pixels that counts as motion
+PIXEL_THRESHOLD = 25         # per-pixel grey level change that counts as changed
+DOWNSCALE_WIDTH = 160
+MAX_CARRY = 30               # force a full inference after this many skipped frames
+
+
+class MotionGate:
+    """
+    Cheap motion detector placed in front of the object detector.
+
+    Frames are reduced to a small blurred greyscale image. With
+    method='diff' the image is compared against the last frame that was let
+    through (so slow drift still adds up to motion eventually); with
+    method='mog2' an OpenCV background subtractor decides what is
+    foreground. A frame is "static" when the changed fraction of pixels
+    stays below `threshold`. At most `max_carry` consecutive frames are
+    reported static, so detections are refreshed periodically anyway.
+    """
+
+    def __init__(self, method='diff', threshold=MOTION_THRESHOLD, pixel_threshold=PIXEL_THRESHOLD,
+                 downscale_width=DOWNSCALE_WIDTH, max_carry=MAX_CARRY):
+        if method not in MOTION_METHODS:
+            raise ValueError(f'Unknown motion gate method: {method}')
+        self.method = method
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.downscale_width = downscale_width
+        self.max_carry = max_carry
+        self._reference = None
+        self._carried = 0
+        self._subtractor = None
+        if method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=500, varThreshold=16, detectShadows=False
+            )
+        self.frames = 0
+        self.static_frames = 0
+        self.last_motion = 0.0
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.downscale_width / float(w)
+        small = cv2.resize(frame, (self.downscale_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def motion(self, small):
+        """Fraction of pixels that changed in the downscaled frame."""
+        if self.method == 'mog2':
+            mask = self._subtractor.apply(small)
+            return float(np.count_nonzero(mask)) / mask.size
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self._reference)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def is_static(self, frame):
+        """True if the frame can reuse the previous detections."""
+        self.frames += 1
+        if self.method == 'off':
+            return False
+
+        small = self._small(frame)
+        self.last_motion = self.motion(small)
+        static = self.last_motion < self.threshold and self._carried < self.max_carry
+        if static:
+            self._carried += 1
+            self.static_frames += 1
+        else:
+            self._carried = 0
+            self._reference = small
+        return static
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "static_frames": self.static_frames,
+            "inference_ratio": 1.0 - self.static_frames / self.frames if self.frames else 1.0,
+        }
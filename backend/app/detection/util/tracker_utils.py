@@ -0,0 +1,188 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from fast_nms_utils import box_iou_matrix
+
+MAX_DISAPPEARED = 20   # frames a track survives without a matching detection
+MAX_DISTANCE = 50      # pixels a centroid may move and still match without overlap
+MIN_IOU = 0.1          # overlap that is always enough to match
+
+# cost given to pairs that are not allowed to match
+_INVALID = 1e6
+
+
+def _xywh_to_state(rects):
+    # (x, y, w, h) -> (cx, cy, w, h)
+    rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    return np.concatenate([rects[:, :2] + rects[:, 2:] / 2, rects[:, 2:]], axis=1)
+
+
+def _state_to_xyxy(z):
+    return np.concatenate([z[:, :2] - z[:, 2:4] / 2, z[:, :2] + z[:, 2:4] / 2], axis=1)
+
+
+class Tracker:
+    """
+    Multi-object tracker with vectorized association.
+
+    Every track carries a constant-velocity Kalman filter over
+    (cx, cy, w, h, vx, vy, vw, vh); all tracks are predicted and updated at
+    once with batched matrix operations. Detections are associated with the
+    predicted boxes by Hungarian assignment on an IoU cost, falling back to
+    centroid distance for pairs that do not overlap (fast motion, small
+    boxes). update() returns the detection -> track_id mapping directly.
+    """
+
+    def __init__(self, max_disappeared=MAX_DISAPPEARED, max_distance=MAX_DISTANCE, min_iou=MIN_IOU):
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        self.min_iou = min_iou
+        self.next_id = 0
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.x = np.zeros((0, 8))            # Kalman state
+        self.P = np.zeros((0, 8, 8))         # state covariance
+        self.disappeared = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4))        # last matched (x, y, w, h)
+        self.removed = []                    # ids dropped by the last update()
+
+        dt = 1.0
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4) * dt
+        self.H = np.eye(4, 8)
+        self.Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001, 0.0001])
+        self.R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    @property
+    def objects(self):
+        """Live tracks as {track_id: (bbox, centroid)}, like CentroidTracker."""
+        return {
+            int(tid): (tuple(int(v) for v in box), (int(box[0] + box[2] / 2), int(box[1] + box[3] / 2)))
+            for tid, box in zip(self.ids, self.boxes)
+        }
+
+    def predicted_boxes(self):
+        """Predicted (x, y, w, h) of every live track, without advancing the filter."""
+        z = self.x[:, :4]
+        return np.concatenate([z[:, :2] - z[:, 2:] / 2, z[:, 2:]], axis=1)
+
+    def _predict(self):
+        if not len(self.ids):
+            return
+        self.x = self.x @ self.F.T
+        # keep the box size positive when the size velocity overshoots
+        self.x[:, 2:4] = np.maximum(self.x[:, 2:4], 1.0)
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def _correct(self, rows, z):
+        # batched Kalman update for the matched tracks
+        x, P = self.x[rows], self.P[rows]
+        y = z - x[:, :4]
+        S = P[:, :4, :4] + self.R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        self.x[rows] = x + np.einsum('nij,nj->ni', K, y)
+        self.P[rows] = P - K @ P[:, :4, :]
+
+    def _register(self, z, rects):
+        n = len(z)
+        ids = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        x = np.zeros((n, 8))
+        x[:, :4] = z
+        P = np.tile(np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4, 1e4]), (n, 1, 1))
+        self.ids = np.concatenate([self.ids, ids])
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, P])
+        self.disappeared = np.concatenate([self.disappeared, np.zeros(n, dtype=np.int64)])
+        self.boxes = np.concatenate([self.boxes, rects])
+        return ids
+
+    def _cost(self, z):
+        pred = self.x[:, :4]
+        iou = box_iou_matrix(_state_to_xyxy(pred), _state_to_xyxy(z))
+        d = np.linalg.norm(pred[:, None, :2] - z[None, :, :2], axis=2)
+        # overlapping pairs cost 1 - IoU (< 1); non-overlapping pairs within
+        # max_distance cost 1 + d / max_distance (always worse than overlap)
+        cost = np.where(iou >= self.min_iou, 1.0 - iou, 1.0 + d / self.max_distance)
+        cost[(iou < self.min_iou) & (d > self.max_distance)] = _INVALID
+        return cost
+
+    def update(self, rects):
+        """
+        Parameters
+        ----------
+        rects : list of (x, y, w, h)
+
+        Returns
+        -------
+        assignments : dict
+            detection index -> track id, for every detection
+        """
+        self.removed = []
+        rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        z = _xywh_to_state(rects)
+        self._predict()
+
+        assignments = {}
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+        unmatched_dets = np.ones(len(z), dtype=bool)
+        if len(self.ids) and len(z):
+            cost = self._cost(z)
+            rows, cols = linear_sum_assignment(cost)
+            valid = cost[rows, cols] < _INVALID
+            rows, cols = rows[valid], cols[valid]
+            if len(rows):
+                self._correct(rows, z[cols])
+                self.boxes[rows] = rects[cols]
+                self.disappeared[rows] = 0
+                matched_tracks[rows] = True
+                unmatched_dets[cols] = False
+                assignments.update(zip(cols.tolist(), self.ids[rows].tolist()))
+
+        # age unmatched tracks and drop the stale ones
+        self.disappeared[~matched_tracks] += 1
+        alive = self.disappeared <= self.max_disappeared
+        if not alive.all():
+            self.removed = self.ids[~alive].tolist()
+            self.ids = self.ids[alive]
+            self.x = self.x[alive]
+            self.P = self.P[alive]
+            self.disappeared = self.disappeared[alive]
+            self.boxes = self.boxes[alive]
+
+        # every unmatched detection starts a new track
+        new_dets = np.nonzero(unmatched_dets)[0]
+        if len(new_dets):
+            new_ids = self._register(z[new_dets], rects[new_dets])
+            assignments.update(zip(new_dets.tolist(), new_ids.tolist()))
+
+        return assignments
+
+
+def interpolate_boxes(prev, curr, steps):
+    """
+    Linearly interpolate the boxes of tracks seen in two analysed frames.
+
+    Parameters
+    ----------
+    prev, curr : dict
+        track id -> (x, y, w, h) at the two analysed frames.
+    steps : int
+        Distance between the two frames; steps - 1 frames lie in between.
+
+    Returns
+    -------
+    out : list of dict
+        track id -> (x, y, w, h) for every frame in between, in order.
+        Only tracks present in both frames are interpolated.
+    """
+    ids = [track_id for track_id in prev if track_id in curr]
+    if steps <= 1:
+        return []
+    if not ids:
+        return [{} for _ in range(steps - 1)]
+    a = np.asarray([prev[i] for i in ids], dtype=np.float64)
+    b = np.asarray([curr[i] for i in ids], dtype=np.float64)
+    t = (np.arange(1, steps, dtype=np.float64) / steps)[:, None, None]
+    boxes = np.rint(a + (b - a) * t).astype(int)
+    return [dict(zip(ids, map(tuple, frame_boxes.tolist()))) for frame_boxes in boxes]
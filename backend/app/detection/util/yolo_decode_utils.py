@@ -0,0 +1,93 @@
+import numpy as np
+
+from fast_nms_utils import batched_nms
+
+MAX_NMS = 30000   # candidates kept for NMS
+MAX_DET = 300     # detections kept after NMS
+
+
+def class_indices(names, categories):
+    """
+    Indices of the allowed class names in `categories`.
+
+    Parameters
+    ----------
+    names : iterable of str or None
+        Allowed class names. None (or empty) means every class.
+    categories : list of str
+        Class names in model output order, e.g. COCO_CATEGORY.
+
+    Returns
+    -------
+    indices : numpy.ndarray or None
+    """
+    if not names:
+        return None
+    lookup = {name: i for i, name in enumerate(categories)}
+    unknown = [name for name in names if name not in lookup]
+    if unknown:
+        raise ValueError(f"Unknown classes: {', '.join(unknown)}")
+    return np.array(sorted({lookup[name] for name in names}), dtype=np.intp)
+
+
+def _xywh2xyxy(x):
+    y = np.empty_like(x)
+    y[:, :2] = x[:, :2] - x[:, 2:] / 2
+    y[:, 2:] = x[:, :2] + x[:, 2:] / 2
+    return y
+
+
+def decode_predictions(preds, conf_thres, iou_thres, classes=None, max_nms=MAX_NMS, max_det=MAX_DET):
+    """
+    Decode raw YOLOv8/v9 output into NMS-filtered detections.
+
+    The output is channel-major, (1, 4 + nc, N): thresholding happens on
+    the class rows as they are, so only the surviving candidates are ever
+    transposed, and the max_nms best of them are picked with argpartition
+    instead of a full sort. Class rows outside `classes` are dropped before
+    anything else is computed.
+
+    Parameters
+    ----------
+    preds : numpy.ndarray
+        Raw network output of shape (1, 4 + nc, N).
+    conf_thres : float
+    iou_thres : float
+    classes : numpy.ndarray or None
+        Allowed class indices (see class_indices). None keeps every class.
+    max_nms : int
+    max_det : int
+
+    Returns
+    -------
+    dets : numpy.ndarray
+        (M, 6) array of x1, y1, x2, y2, confidence, class in network input
+        coordinates, sorted by confidence.
+    """
+    p = preds[0]
+    scores = p[4:]
+    if classes is not None:
+        scores = scores[classes]
+
+    conf = scores.max(axis=0)
+    keep = np.flatnonzero(conf > conf_thres)
+    if not len(keep):
+        return np.zeros((0, 6))
+    conf = conf[keep]
+
+    if len(keep) > max_nms:
+        top = np.sort(np.argpartition(-conf, max_nms)[:max_nms])
+        keep, conf = keep[top], conf[top]
+
+    # gather while the columns are still in ascending order, sort afterwards
+    j = scores[:, keep].argmax(axis=0)
+    if classes is not None:
+        j = classes[j]
+    x = np.empty((len(keep), 6))
+    x[:, :4] = _xywh2xyxy(p[:4, keep].T)
+    x[:, 4] = conf
+    x[:, 5] = j
+    x = x[np.argsort(-conf, kind='stable')]
+
+    i = batched_nms(x[:, :4], x[:, 4], x[:, 5], iou_thres)[:max_det]
+    return x[i]
@@ -1,11 +1,17 @@
-from flask import Blueprint, jsonify,request
+from flask import Blueprint, Response, jsonify,request
 from datetime import datetime, timedelta
 from flask import current_app
 from dotenv import load_dotenv
 from pymongo import MongoClient
-from collections import defaultdict
 import os
 
+from app.detection.detection_schema import adapt_query, project_v1
+from app.detection.hyperloglog import HyperLogLog
+from app.detection.heatmaps import HEATMAPS_COLLECTION, merge_grids, render_png
+from app.detection.analytics_cache import (
+    AnalyticsCache, LRUBackend, MongoBackend, CACHE_COLLECTION, EVENTS_COLLECTION, MAX_ENTRIES, OPEN_TTL
+)
+
 load_dotenv()
 
 analytics_bp = Blueprint('analytics', __name__)
@@ -13,192 +19,476 @@ analytics_bp = Blueprint('analytics', __name__)
 client = MongoClient(os.getenv('MONGO_URI'))
 db = client.get_database('SurveillanceAI')
 
-@analytics_bp.route('/person-count-delta', methods=['GET'])
-def person_count_delta():
-    collection = db['detected_objects']
+# windows made of whole hours are answered from the hourly rollups
+# (detection/rollups.py) instead of the raw frame documents
+USE_ROLLUPS = os.getenv('ANALYTICS_ROLLUPS', 'true').lower() != 'false'
+
+# response cache (detection/analytics_cache.py): 'lru' (per process),
+# 'mongo' (shared by all processes) or 'off'
+CACHE_BACKEND = os.getenv('ANALYTICS_CACHE', 'lru').lower()
+if CACHE_BACKEND == 'off':
+    cache = None
+else:
+    cache = AnalyticsCache(
+        MongoBackend(db[CACHE_COLLECTION]) if CACHE_BACKEND == 'mongo'
+        else LRUBackend(int(os.getenv('ANALYTICS_CACHE_SIZE', MAX_ENTRIES))),
+        db[EVENTS_COLLECTION],
+        open_ttl=float(os.getenv('ANALYTICS_CACHE_TTL', OPEN_TTL)),
+    )
+
+
+def cached(key, start, end, compute, classes=None, additive=False):
+    """compute() through the response cache; see AnalyticsCache.cached."""
+    if cache is None:
+        return compute()
+    return cache.cached(key, start, end, compute, classes=classes, additive=additive)
+
+
+def whole_hour(ts):
+    return ts == ts.replace(minute=0, second=0, microsecond=0)
+
+
+def count_rollups(start, end, classes=None):
+    """Detections (of `classes`) in [start, end) from the hourly rollups; both must be whole hours."""
+    match = {"hour": {"$gte": start, "$lt": end}}
+    if classes is not None:
+        match["class"] = {"$in": classes}
+    result = list(db['detection_rollups'].aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "count": {"$sum": "$detections"}}},
+    ]))
+    return result[0]["count"] if result else 0
+
+
+def count_detections(start, end, classes=None):
+    """
+    Detections in the frames of [start, end), only those of `classes` if
+    given, counted by Mongo. Frame documents of both layouts are matched
+    on the indexed frame_timestamp/detections.class fields, and only the
+    total comes back. Cached; new detections increment the cached count.
+    """
+    key = f"detections|{start.isoformat()}|{end.isoformat()}|{','.join(classes) if classes is not None else '*'}"
+    return cached(key, start, end, lambda: query_detection_count(start, end, classes),
+                  classes=classes, additive=True)
+
+
+def query_detection_count(start, end, classes=None):
+    if USE_ROLLUPS and whole_hour(start) and whole_hour(end):
+        return count_rollups(start, end, classes)
+    query = {"frame_timestamp": {"$gte": start, "$lt": end}}
+    if classes is None:
+        query["detections.0"] = {"$exists": True}
+        count = {"$size": "$classes"}
+    else:
+        query["detections.class"] = {"$in": classes}
+        count = {"$size": {"$filter": {"input": "$classes", "cond": {"$in": ["$$this", classes]}}}}
+    pipeline = [
+        {"$match": adapt_query(query)},
+        project_v1(classes="detections.class"),
+        {"$group": {"_id": None, "count": {"$sum": count}}},
+    ]
+    result = list(db['detected_objects'].aggregate(pipeline))
+    return result[0]["count"] if result else 0
+
+
+def count_tracks(start, end, camera_id=None):
+    """Distinct tracked persons seen in [start, end), from the track store."""
+    query = {"class": "person", "first_seen": {"$lt": end}, "last_seen": {"$gte": start}}
+    if camera_id:
+        query["camera_id"] = camera_id
+    key = f"tracks|{start.isoformat()}|{end.isoformat()}|{camera_id or '*'}"
+    return cached(key, start, end, lambda: db['tracks'].count_documents(query))
+
+
+# classes the detection pipeline tracks; only they have rollup sketches
+TRACKED_CLASSES = ["person"]
+
+
+def count_unique(start, end, classes, cameras=None):
+    """
+    Estimated distinct tracks of `classes` seen in [start, end) (widened to
+    whole hours), optionally only on `cameras`: the HyperLogLog sketches of
+    the hourly rollups merged register-wise by Mongo, so the cost does not
+    depend on the number of frames. A track seen on several cameras counts
+    once per camera. None when none of `classes` is tracked, as there is
+    nothing to count.
+    """
+    classes = [c for c in classes if c in TRACKED_CLASSES]
+    if not classes:
+        return None
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if not whole_hour(end):
+        end = end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    match = {"hour": {"$gte": start, "$lt": end}, "class": {"$in": classes}}
+    if cameras:
+        match["camera_id"] = {"$in": cameras}
+
+    def compute():
+        rows = db['detection_rollups'].aggregate([
+            {"$match": match},
+            {"$project": {"_id": 0, "r": {"$objectToArray": "$hll"}}},
+            {"$unwind": "$r"},
+            {"$group": {"_id": "$r.k", "rank": {"$max": "$r.v"}}},
+        ])
+        return HyperLogLog({row["_id"]: row["rank"] for row in rows}).count()
+
+    key = f"unique|{start.isoformat()}|{end.isoformat()}|{','.join(classes)}|{','.join(sorted(cameras or [])) or '*'}"
+    return cached(key, start, end, compute)
+
+
+def person_counter(source):
+    """
+    count(start, end) of persons for ?source=: person detections summed over
+    frames (default), tracks (one document per track in the track store) or
+    unique (distinct tracks from the rollup sketches).
+    """
+    if source == 'tracks':
+        return count_tracks
+    if source == 'unique':
+        return lambda start, end: count_unique(start, end, ["person"])
+    return lambda start, end: count_detections(start, end, ["person"])
+
+
+VEHICLE_CLASSES = ["car", "truck", "bus", "motorcycle", "bicycle"]
+
+
+def detection_stream(start, end=None):
+    """
+    Aggregation source for detections in [start, end): (collection, stages)
+    producing one {t, class, n} document per hourly rollup (n detections of
+    the class in the hour starting at t) or, without rollups or for a
+    window that does not start on a whole hour, per raw detection (n = 1).
+    """
+    window = {"$gte": start} if end is None else {"$gte": start, "$lt": end}
+    if USE_ROLLUPS and whole_hour(start) and (end is None or whole_hour(end)):
+        return db['detection_rollups'], [
+            {"$match": {"hour": window}},
+            {"$project": {"_id": 0, "t": "$hour", "class": 1, "n": "$detections"}},
+        ]
+    return db['detected_objects'], [
+        {"$match": adapt_query({"frame_timestamp": window})},
+        project_v1(t="frame_timestamp", classes="detections.class"),
+        {"$unwind": "$classes"},
+        {"$project": {"t": 1, "class": "$classes", "n": {"$literal": 1}}},
+    ]
+
+
+def window_counts(windows, classes=None):
+    """Stages counting the detections (of `classes`) of a detection_stream per named [start, end) window."""
+    match = {"t": {"$gte": min(s for s, _ in windows.values()), "$lt": max(e for _, e in windows.values())}}
+    if classes is not None:
+        match["class"] = {"$in": classes}
+    branches = [{"case": {"$and": [{"$gte": ["$t", s]}, {"$lt": ["$t", e]}]}, "then": name}
+                for name, (s, e) in windows.items()]
+    return [
+        {"$match": match},
+        {"$group": {"_id": {"$switch": {"branches": branches, "default": None}}, "count": {"$sum": "$n"}}},
+    ]
+
+
+def trend_stages(start_time, unit):
+    """Stages grouping a detection_stream into (time bucket, class) counts, in chronological order."""
+    return [
+        {"$match": {"t": {"$gte": start_time}}},
+        {"$group": {
+            "_id": {"bucket": {"$dateTrunc": {"date": "$t", "unit": unit}}, "class": "$class"},
+            "count": {"$sum": "$n"}
+        }},
+        {"$sort": {"_id.bucket": 1}},
+    ]
+
+
+def trend_window(range_param, now):
+    """(start_time, label format, bucket unit) of a trend range: 24h, 7d (default) or 30d."""
+    if range_param == '24h':
+        return now - timedelta(hours=24), "%H:00", "hour"  # hour of the day
+    if range_param == '30d':
+        return now - timedelta(days=30), "%d %b", "day"
+    return now - timedelta(days=7), "%d %b", "day"
 
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    yesterday = today - timedelta(days=1)
-    tomorrow = today + timedelta(days=1)
 
-    def get_person_count(start, end):
-        docs = collection.find({
-            "frame_timestamp": {"$gte": start, "$lt": end},
-            "detections.class": "person"
-        })
-        count = 0
-        for doc in docs:
-            for det in doc.get("detections", []):
-                if det.get("class") == "person":
-                    count += 1
-        return count
+def trend_series(rows, group_format):
+    grouped_data = {}
+    for row in rows:
+        label = row["_id"]["bucket"].strftime(group_format)
+        grouped_data.setdefault(label, {"label": label})[row["_id"]["class"]] = row["count"]
+    return list(grouped_data.values())
 
-    today_count = get_person_count(today, tomorrow)
-    yesterday_count = get_person_count(yesterday, today)
 
+def daily_delta(today_count, yesterday_count):
+    if today_count is None or yesterday_count is None:
+        return {"today_count": today_count, "yesterday_count": yesterday_count, "percent_change": None}
     if yesterday_count == 0 and today_count == 0:
         percent_change = 0.0
     elif yesterday_count == 0 and today_count > 0:
         percent_change = 100.0
-    elif today_count == 0:
-        percent_change = -100.0
     else:
         percent_change = ((today_count - yesterday_count) / yesterday_count) * 100
-
-    return jsonify({
+    return {
         "today_count": today_count,
         "yesterday_count": yesterday_count,
         "percent_change": round(percent_change, 2)
-    })
+    }
 
-@analytics_bp.route('/vehicle-count-delta', methods=['GET'])
-def vehicle_count_delta():
-    collection = db['detected_objects']
 
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    yesterday = today - timedelta(days=1)
-    tomorrow = today + timedelta(days=1)
+def weekly_delta(this_week_count, last_week_count):
+    if last_week_count == 0:
+        percent_change = float('inf') if this_week_count > 0 else 0.0
+    else:
+        percent_change = ((this_week_count - last_week_count) / last_week_count) * 100
+    return {
+        "this_week_count": this_week_count,
+        "last_week_count": last_week_count,
+        "percent_change": round(percent_change, 2) if percent_change != float('inf') else "Infinity"
+    }
 
-    # Modify class filter for vehicle types
-    vehicle_classes = ["car", "truck", "bus", "motorcycle", "bicycle"]
 
-    def get_vehicle_count(start, end):
-        docs = collection.find({
-            "frame_timestamp": {"$gte": start, "$lt": end},
-            "detections.class": {"$in": vehicle_classes}
-        })
-        count = 0
-        for doc in docs:
-            for det in doc.get("detections", []):
-                if det.get("class") in vehicle_classes:
-                    count += 1
-        return count
+def day_bounds(now):
+    """(yesterday, today, tomorrow) midnights."""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=1), today, today + timedelta(days=1)
 
-    today_count = get_vehicle_count(today, tomorrow)
-    yesterday_count = get_vehicle_count(yesterday, today)
 
-    # Updated calculation logic
-    if yesterday_count == 0 and today_count == 0:
-        percent_change = 0.0
-    elif yesterday_count == 0 and today_count > 0:
-        percent_change = 100.0
-    else:
-        percent_change = ((today_count - yesterday_count) / yesterday_count) * 100
+def week_bounds(today):
+    """(start of last week, start of this week); weeks start on Monday."""
+    start_of_this_week = today - timedelta(days=today.weekday())
+    return start_of_this_week - timedelta(days=7), start_of_this_week
 
-    return jsonify({
-        "today_count": today_count,
-        "yesterday_count": yesterday_count,
-        "percent_change": round(percent_change, 2)
-    })
+
+@analytics_bp.route('/person-count-delta', methods=['GET'])
+def person_count_delta():
+    yesterday, today, tomorrow = day_bounds(datetime.utcnow())
+
+    # ?source=tracks / unique count distinct people instead of person
+    # detections summed over frames
+    get_person_count = person_counter(request.args.get('source'))
+
+    return jsonify(daily_delta(get_person_count(today, tomorrow), get_person_count(yesterday, today)))
+
+@analytics_bp.route('/vehicle-count-delta', methods=['GET'])
+def vehicle_count_delta():
+    yesterday, today, tomorrow = day_bounds(datetime.utcnow())
+
+    # ?source=unique counts distinct tracked vehicles; vehicles are not
+    # tracked (TRACKED_CLASSES), so the counts are null
+    def get_vehicle_count(start, end):
+        if request.args.get('source') == 'unique':
+            return count_unique(start, end, VEHICLE_CLASSES)
+        return count_detections(start, end, VEHICLE_CLASSES)
+
+    return jsonify(daily_delta(get_vehicle_count(today, tomorrow), get_vehicle_count(yesterday, today)))
 
 @analytics_bp.route('/object-count-delta', methods=['GET'])
 def overall_count_delta():
-    collection = db['detected_objects']
-
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    yesterday = today - timedelta(days=1)
-    tomorrow = today + timedelta(days=1)
+    yesterday, today, tomorrow = day_bounds(datetime.utcnow())
 
     def get_overall_count(start, end):
-        docs = collection.find({
-            "frame_timestamp": {"$gte": start, "$lt": end},
-            "detections.0": {"$exists": True}  # Ensures detections array is not empty
-        })
-        count = 0
-        for doc in docs:
-            count += len(doc.get("detections", []))  # Count all objects in detections
-        return count
+        return count_detections(start, end)
+
+    return jsonify(daily_delta(get_overall_count(today, tomorrow), get_overall_count(yesterday, today)))
+@analytics_bp.route('/person-weekly-delta', methods=['GET'])
+def person_weekly_delta():
+    today = day_bounds(datetime.utcnow())[1]
+    start_of_last_week, start_of_this_week = week_bounds(today)
+    end_of_last_week = start_of_this_week
 
-    today_count = get_overall_count(today, tomorrow)
-    yesterday_count = get_overall_count(yesterday, today)
+    get_weekly_person_count = person_counter(request.args.get('source'))
 
-    if yesterday_count == 0 and today_count == 0:
-        percent_change = 0.0
-    elif yesterday_count == 0 and today_count > 0:
-        percent_change = 100.0
-    else:
-        percent_change = ((today_count - yesterday_count) / yesterday_count) * 100
+    return jsonify(weekly_delta(get_weekly_person_count(start_of_this_week, today),
+                                get_weekly_person_count(start_of_last_week, end_of_last_week)))
 
+@analytics_bp.route('/trend', methods=['GET'])
+def trend_data():
+    range_param = request.args.get('range', '7d')  # default to 7d
+    now = datetime.utcnow()
+    start_time, group_format, unit = trend_window(range_param, now)
+    if USE_ROLLUPS:
+        # rollups have hourly resolution, so the window starts on a whole hour
+        start_time = start_time.replace(minute=0, second=0, microsecond=0)
+
+    def compute():
+        collection, stages = detection_stream(start_time)
+        rows = collection.aggregate(stages + trend_stages(start_time, unit))
+        return trend_series(rows, group_format)
+
+    # the window is open, so the series is served for at most the cache TTL
+    key = f"trend|{range_param}|{start_time:%Y-%m-%dT%H:%M}"
     return jsonify({
-        "today_count": today_count,
-        "yesterday_count": yesterday_count,
-        "percent_change": round(percent_change, 2)
+        "range": range_param,
+        "trend_data": cached(key, start_time, now, compute)
     })
-@analytics_bp.route('/person-weekly-delta', methods=['GET'])
-def person_weekly_delta():
-    collection = db['detected_objects']
 
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    start_of_this_week = today - timedelta(days=today.weekday())  # Monday this week
-    start_of_last_week = start_of_this_week - timedelta(days=7)
-    end_of_last_week = start_of_this_week
 
-    def get_weekly_person_count(start, end):
-        docs = collection.find({
-            "frame_timestamp": {"$gte": start, "$lt": end},
-            "detections.class": "person"
-        })
-        count = 0
-        for doc in docs:
-            for det in doc.get("detections", []):
-                if det.get("class") == "person":
-                    count += 1
-        return count
+SUMMARY_METRICS = ('person_count_delta', 'vehicle_count_delta', 'object_count_delta', 'person_weekly_delta', 'trend')
 
-    this_week_count = get_weekly_person_count(start_of_this_week, today)
-    last_week_count = get_weekly_person_count(start_of_last_week, end_of_last_week)
 
-    if last_week_count == 0:
-        percent_change = float('inf') if this_week_count > 0 else 0.0
-    else:
-        percent_change = ((this_week_count - last_week_count) / last_week_count) * 100
+@analytics_bp.route('/summary', methods=['GET'])
+def summary():
+    """
+    All dashboard KPIs in one aggregation.
+
+    ?metrics= is a comma separated subset of SUMMARY_METRICS (default all)
+    and ?range= the trend range (24h, 7d, 30d). Every metric has the same
+    payload as its own endpoint. One scan over the detection stream
+    covering the widest window feeds a $facet with one branch per metric.
+    """
+    metrics = [m.strip() for m in request.args.get('metrics', ','.join(SUMMARY_METRICS)).split(',') if m.strip()]
+    unknown = [m for m in metrics if m not in SUMMARY_METRICS]
+    if unknown or not metrics:
+        return jsonify({"error": f"unknown metrics: {', '.join(unknown)}", "metrics": list(SUMMARY_METRICS)}), 400
+    range_param = request.args.get('range', '7d')
+
+    now = datetime.utcnow()
+    yesterday, today, tomorrow = day_bounds(now)
+    start_of_last_week, start_of_this_week = week_bounds(today)
+    days = {"today": (today, tomorrow), "yesterday": (yesterday, today)}
+    weeks = {"this_week": (start_of_this_week, today), "last_week": (start_of_last_week, start_of_this_week)}
+    trend_start, group_format, unit = trend_window(range_param, now)
+    if USE_ROLLUPS:
+        trend_start = trend_start.replace(minute=0, second=0, microsecond=0)
+
+    facets = {}
+    starts = []
+    if 'person_count_delta' in metrics:
+        facets['person_count_delta'] = window_counts(days, ["person"])
+        starts.append(yesterday)
+    if 'vehicle_count_delta' in metrics:
+        facets['vehicle_count_delta'] = window_counts(days, VEHICLE_CLASSES)
+        starts.append(yesterday)
+    if 'object_count_delta' in metrics:
+        facets['object_count_delta'] = window_counts(days)
+        starts.append(yesterday)
+    if 'person_weekly_delta' in metrics:
+        facets['person_weekly_delta'] = window_counts(weeks, ["person"])
+        starts.append(start_of_last_week)
+    if 'trend' in metrics:
+        facets['trend'] = trend_stages(trend_start, unit)
+        starts.append(trend_start)
+
+    def compute():
+        collection, stages = detection_stream(min(starts), tomorrow)
+        return next(collection.aggregate(stages + [{"$facet": facets}]), {})
+
+    key = f"summary|{','.join(sorted(facets))}|{range_param}|{today.isoformat()}|{trend_start:%Y-%m-%dT%H:%M}"
+    result = cached(key, min(starts), tomorrow, compute)
+
+    def counts(metric):
+        return {row["_id"]: row["count"] for row in result.get(metric, [])}
+
+    response = {}
+    for metric in ('person_count_delta', 'vehicle_count_delta', 'object_count_delta'):
+        if metric in facets:
+            c = counts(metric)
+            response[metric] = daily_delta(c.get("today", 0), c.get("yesterday", 0))
+    if 'person_weekly_delta' in facets:
+        c = counts('person_weekly_delta')
+        response['person_weekly_delta'] = weekly_delta(c.get("this_week", 0), c.get("last_week", 0))
+    if 'trend' in facets:
+        response['trend'] = {"range": range_param, "trend_data": trend_series(result.get('trend', []), group_format)}
+    return jsonify(response)
+
+
+@analytics_bp.route('/unique-counts', methods=['GET'])
+def unique_counts():
+    """
+    Distinct persons and vehicles (tracks) seen in a time window, from the
+    HyperLogLog sketches of the hourly rollups.
+
+    Query parameters: start and end (ISO 8601, default the last 24 hours,
+    widened to whole hours) and camera_id (comma separated, default all).
+    Only tracked classes (TRACKED_CLASSES) can be counted; the tracker
+    follows persons, so "vehicle" is null.
+    """
+    now = datetime.utcnow()
+    try:
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else now - timedelta(hours=24)
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else now
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 timestamps"}), 400
+    cameras = [c for c in request.args.get('camera_id', '').split(',') if c] or None
 
     return jsonify({
-        "this_week_count": this_week_count,
-        "last_week_count": last_week_count,
-        "percent_change": round(percent_change, 2) if percent_change != float('inf') else "Infinity"
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "cameras": cameras,
+        "person": count_unique(start, end, ["person"], cameras),
+        "vehicle": count_unique(start, end, VEHICLE_CLASSES, cameras),
     })
 
-@analytics_bp.route('/trend', methods=['GET'])
-def trend_data():
-    range_param = request.args.get('range', '7d')  # default to 7d
+
+@analytics_bp.route('/heatmap/<camera_id>', methods=['GET'])
+def heatmap(camera_id):
+    """
+    Where detections of a camera stand: its hourly foot-point grids
+    (detection/heatmaps.py) summed over a time window.
+
+    Query parameters: class (comma separated, default person), start and
+    end (ISO 8601, default the last 24 hours, widened to whole hours),
+    format=png (default) or json, and scale (PNG pixels per grid cell).
+    """
     now = datetime.utcnow()
+    try:
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else now - timedelta(hours=24)
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else now
+        scale = min(max(int(request.args.get('scale', 10)), 1), 40)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 timestamps and scale an integer"}), 400
+    classes = [c for c in request.args.get('class', 'person').split(',') if c]
+
+    grid, hours = merge_grids(db[HEATMAPS_COLLECTION], camera_id, start, end, classes)
+    if request.args.get('format', 'png') == 'json':
+        return jsonify({
+            "camera_id": camera_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "classes": classes,
+            "hours": hours,
+            "points": int(grid.sum()),
+            "shape": list(grid.shape),
+            "grid": grid.tolist()
+        })
+    return Response(render_png(grid, scale), mimetype='image/png')
 
-    collection = db['detected_objects']
-    if range_param == '24h':
-        start_time = now - timedelta(hours=24)
-        group_format = "%H:00"  # hour of the day
-    elif range_param == '30d':
-        start_time = now - timedelta(days=30)
-        group_format = "%d %b"
-    else:  # default to 7d
-        start_time = now - timedelta(days=7)
-        group_format = "%d %b"
-
-    docs = collection.find({"frame_timestamp": {"$gte": start_time}})
-
-    grouped_data = defaultdict(lambda: defaultdict(int))
-
-    for doc in docs:
-        timestamp = doc.get("frame_timestamp")
-        if not timestamp:
-            continue
-
-        label = timestamp.strftime(group_format)
-        for det in doc.get("detections", []):
-            obj_class = det.get("class", "unknown")
-            grouped_data[label][obj_class] += 1
-
-    # Sort labels chronologically
-    sorted_labels = sorted(grouped_data.keys(), key=lambda x: datetime.strptime(x, group_format))
-    trend_data = []
-
-    for label in sorted_labels:
-        entry = {"label": label}
-        entry.update(grouped_data[label])
-        trend_data.append(entry)
+
+@analytics_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit rate and size of the analytics response cache of this process."""
+    if cache is None:
+        return jsonify({"backend": None})
+    return jsonify(cache.stats())
+
+
+@analytics_bp.route('/presence', methods=['GET'])
+def presence():
+    """
+    Tracked persons seen in a time window, answered from the track store.
+
+    Query parameters: camera_id, start and end (ISO 8601, default the last
+    24 hours) and attribute filters as attr.<name>=true|false|<colour>.
+    """
+    now = datetime.utcnow()
+    try:
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else now - timedelta(hours=24)
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else now
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 timestamps"}), 400
+
+    query = {"class": "person", "first_seen": {"$lt": end}, "last_seen": {"$gte": start}}
+    if request.args.get('camera_id'):
+        query["camera_id"] = request.args['camera_id']
+    for key, value in request.args.items():
+        if key.startswith('attr.'):
+            query["attributes." + key[len('attr.'):]] = {"true": True, "false": False}.get(value.lower(), value)
+
+    projection = {"_id": 0, "trajectory": 0, "attribute_scores": 0}
+    tracks = list(db['tracks'].find(query, projection).sort("first_seen", 1).limit(500))
+    for track in tracks:
+        track["first_seen"] = track["first_seen"].isoformat()
+        track["last_seen"] = track["last_seen"].isoformat()
 
     return jsonify({
-        "range": range_param,
-        "trend_data": trend_data
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "count": db['tracks'].count_documents(query),
+        "tracks": tracks
     })
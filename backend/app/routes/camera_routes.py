@@ -1,10 +1,12 @@
 from flask import Flask, Response, jsonify, Blueprint, request
 import cv2
 import threading
-from app.detection.detect import start_analysis
+from app.detection.detect import start_analysis, scheduler
+from app.detection.detection_schema import COCO_CATEGORY
 from werkzeug.utils import secure_filename
 from pymongo import MongoClient
 from dotenv import load_dotenv
+import math
 import os
 from datetime import datetime
 import uuid
@@ -69,6 +71,18 @@ def add_camera():
     fps = request.form.get('fps')
     status = request.form.get('status') == 'true'
     audio = request.form.get('audio') == 'true'
+    # optional comma separated COCO class names the analysis should keep
+    classes = [c.strip() for c in request.form.get('classes', '').split(',') if c.strip()] or None
+    unknown = [c for c in classes or [] if c not in COCO_CATEGORY]
+    if unknown:
+        return jsonify({'error': f"Unknown classes: {', '.join(unknown)}"}), 400
+    # optional analysis frame rate; the analysis only decodes this many frames per second
+    try:
+        analysis_fps = float(request.form['analysis_fps']) if request.form.get('analysis_fps') else None
+    except ValueError:
+        return jsonify({'error': 'analysis_fps must be a number'}), 400
+    if analysis_fps is not None and not math.isfinite(analysis_fps):
+        return jsonify({'error': 'analysis_fps must be a finite number'}), 400
 
     if not location or not file:
         return jsonify({'error': 'Missing location or video_file'}), 400
@@ -101,6 +115,8 @@ def add_camera():
         "fps": fps,
         "status": status,
         "audio": audio,
+        "classes": classes,
+        "analysis_fps": analysis_fps,
         "storage": os.path.getsize(save_path),
         "path": save_path,
         "added_on": datetime.utcnow(),
@@ -202,8 +218,29 @@ def analyze_camera(camera_id):
         return jsonify({'error': 'Video file missing or path invalid'}), 404
 
     try:
-        # Call your analysis function (custom to your pipeline)
-        result = start_analysis(video_path, camera_id)
-        return jsonify({'message': 'Analysis started', 'result': result}), 200
+        # Queue the analysis; it runs on one of the warm detection workers
+        job_id = start_analysis(video_path, camera_id, classes=camera.get('classes'),
+                                analysis_fps=camera.get('analysis_fps'))
+        return jsonify({'message': 'Analysis queued', 'job_id': job_id}), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@camera_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    camera_id = request.args.get('camera_id')
+    jobs = [job.to_dict() for job in scheduler.list_jobs(camera_id)]
+    return jsonify({'jobs': jobs, 'stats': scheduler.stats()}), 200
+
+@camera_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = scheduler.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@camera_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = scheduler.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
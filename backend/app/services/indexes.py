@@ -0,0 +1,282 @@
+"""
+MongoDB index registry.
+
+Every index the routes, the detection pipeline and the query tool rely on is
+declared in INDEXES (database -> collection -> IndexModels). create_app calls
+ensure_indexes() at startup, which creates the missing ones and leaves
+existing ones alone, so it is cheap to run on every start.
+
+    python -m app.services.indexes --report             # missing / unused indexes
+    python -m app.services.indexes --benchmark 10000000 # synthetic frame collection
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel, MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+# logger
+from logging import getLogger
+logger = getLogger(__name__)
+
+# ======================
+# Registry
+# ======================
+
+# detected_objects holds both frame layouts (see detection/detection_schema):
+# every index exists once per layout and is sparse, so each one only covers
+# the documents of its own layout.
+FRAME_INDEXES = [
+    # analytics: time windows, per class
+    IndexModel([("frame_timestamp", ASCENDING)], name="frame_timestamp_1", sparse=True),
+    IndexModel([("detections.class", ASCENDING), ("frame_timestamp", ASCENDING)],
+               name="detections.class_1_frame_timestamp_1", sparse=True),
+    IndexModel([("camera_id", ASCENDING), ("frame_timestamp", ASCENDING)],
+               name="camera_id_1_frame_timestamp_1", sparse=True),
+    # query tool: frames of a video in order
+    IndexModel([("video_id", ASCENDING), ("frame_number", ASCENDING)],
+               name="video_id_1_frame_number_1", sparse=True),
+    # the same for schema v2
+    IndexModel([("ts", ASCENDING)], name="ts_1", sparse=True),
+    IndexModel([("d.c", ASCENDING), ("ts", ASCENDING)], name="d.c_1_ts_1", sparse=True),
+    IndexModel([("cam", ASCENDING), ("ts", ASCENDING)], name="cam_1_ts_1", sparse=True),
+    IndexModel([("vid", ASCENDING), ("f", ASCENDING)], name="vid_1_f_1", sparse=True),
+]
+
+INDEXES = {
+    "SurveillanceAI": {
+        "detected_objects": FRAME_INDEXES,
+        "tracks": [
+            # presence queries: class/camera and an overlapping time window
+            IndexModel([("class", ASCENDING), ("last_seen", ASCENDING), ("first_seen", ASCENDING)],
+                       name="class_1_last_seen_1_first_seen_1"),
+            IndexModel([("camera_id", ASCENDING), ("last_seen", ASCENDING)], name="camera_id_1_last_seen_1"),
+        ],
+        "detection_rollups": [
+            IndexModel([("camera_id", ASCENDING), ("hour", ASCENDING), ("class", ASCENDING)],
+                       name="camera_id_1_hour_1_class_1", unique=True),
+            IndexModel([("hour", ASCENDING), ("class", ASCENDING)], name="hour_1_class_1"),
+        ],
+        "heatmaps": [
+            IndexModel([("camera_id", ASCENDING), ("hour", ASCENDING), ("class", ASCENDING)],
+                       name="camera_id_1_hour_1_class_1", unique=True),
+        ],
+        # detection/analytics_cache.py: open windows expire, write events after an hour (EVENT_TTL)
+        "analytics_cache": [
+            IndexModel([("start", ASCENDING), ("end", ASCENDING)], name="start_1_end_1"),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_1", expireAfterSeconds=0),
+        ],
+        "analytics_cache_events": [
+            IndexModel([("created", ASCENDING)], name="created_1", expireAfterSeconds=3600),
+        ],
+        "camera_feeds": [
+            IndexModel([("camera_id", ASCENDING)], name="camera_id_1", unique=True),
+        ],
+        "reports": [
+            IndexModel([("camera_id", ASCENDING)], name="camera_id_1"),
+        ],
+        "video_metadata": [
+            IndexModel([("video_id", ASCENDING)], name="video_id_1", unique=True),
+        ],
+    },
+    "chat": {
+        "sessions": [
+            IndexModel([("session_id", ASCENDING)], name="session_id_1", unique=True),
+        ],
+    },
+    "ai_surveillance": {
+        "users": [
+            IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+        ],
+    },
+}
+
+
+def _declared(registry=INDEXES):
+    for database, collections in registry.items():
+        for collection, models in collections.items():
+            yield database, collection, models
+
+
+def _same_key(existing, model):
+    return list(existing["key"].items()) == list(model.document["key"].items())
+
+
+# ======================
+# Provisioning
+# ======================
+
+def ensure_indexes(client, registry=INDEXES):
+    """
+    Create the declared indexes that do not exist yet.
+
+    Existing indexes are never dropped or rebuilt. An index that cannot be
+    built (e.g. a unique index over duplicate values) is logged and skipped,
+    and an unreachable server only produces a warning, so the application
+    still starts. Returns {"created": [...], "failed": [...]} with
+    "database.collection.index" names.
+    """
+    result = {"created": [], "failed": []}
+    try:
+        for database, collection, models in _declared(registry):
+            coll = client[database][collection]
+            existing = {ix["name"] for ix in coll.list_indexes()}
+            for model in models:
+                name = model.document["name"]
+                if name in existing:
+                    continue
+                full_name = f"{database}.{collection}.{name}"
+                try:
+                    coll.create_indexes([model])
+                    result["created"].append(full_name)
+                except OperationFailure as e:
+                    logger.error(f"Cannot create index {full_name}: {e}")
+                    result["failed"].append(full_name)
+    except PyMongoError as e:
+        logger.warning(f"Index provisioning skipped: {e}")
+    if result["created"]:
+        logger.info(f"Created indexes: {', '.join(result['created'])}")
+    return result
+
+
+def index_report(client, registry=INDEXES):
+    """
+    Compare the declared indexes with the server's.
+
+    Returns {"database.collection": {"missing", "conflicting", "undeclared",
+    "unused"}}: declared but absent, present under the declared name with
+    other keys, present but not declared (besides _id), and declared
+    indexes without a single access since the server started ($indexStats;
+    None where the server does not report it).
+    """
+    report = {}
+    for database, collection, models in _declared(registry):
+        coll = client[database][collection]
+        existing = {ix["name"]: ix for ix in coll.list_indexes()}
+        declared = {model.document["name"]: model for model in models}
+        try:
+            accesses = {s["name"]: s["accesses"]["ops"] for s in coll.aggregate([{"$indexStats": {}}])}
+            unused = sorted(name for name in declared if accesses.get(name) == 0)
+        except (OperationFailure, NotImplementedError):
+            unused = None
+        report[f"{database}.{collection}"] = {
+            "missing": sorted(name for name in declared if name not in existing),
+            "conflicting": sorted(name for name, model in declared.items()
+                                  if name in existing and not _same_key(existing[name], model)),
+            "undeclared": sorted(name for name in existing if name != "_id_" and name not in declared),
+            "unused": unused,
+        }
+    return report
+
+
+# ======================
+# Benchmark
+# ======================
+
+BENCHMARK_DATABASE = "index_benchmark"
+BENCHMARK_BATCH = 10000
+BENCHMARK_CAMERAS = 20
+BENCHMARK_DAYS = 30
+
+
+def _synthetic_frames(count, start):
+    from app.detection.detection_schema import COCO_CATEGORY, encode_detection, encode_frame
+
+    rng = random.Random(0)
+    per_camera = max(1, count // BENCHMARK_CAMERAS)
+    step = timedelta(days=BENCHMARK_DAYS) / per_camera
+    for i in range(count):
+        camera = i % BENCHMARK_CAMERAS
+        frame_number = i // BENCHMARK_CAMERAS
+        detections, boxes = [], []
+        for _ in range(rng.randint(0, 6)):
+            category = "person" if rng.random() < 0.5 else rng.choice(COCO_CATEGORY[1:10])
+            detections.append(encode_detection(category, rng.uniform(0.4, 1.0)))
+            x, y = rng.randint(0, 1200), rng.randint(0, 640)
+            boxes.append((x, y, x + 60, y + 160))
+        yield encode_frame(f"video{camera}", f"cam{camera}", start + step * frame_number, frame_number,
+                           detections, boxes, sampling={"frame_step": 1, "source_fps": 30.0})
+
+
+def _benchmark_queries(end):
+    from app.detection.detection_schema import adapt_query
+
+    day = end - timedelta(days=1)
+    week = end - timedelta(days=7)
+    return {
+        "person count, last day": adapt_query({"frame_timestamp": {"$gte": day, "$lt": end},
+                                               "detections.class": "person"}),
+        "vehicle count, last week": adapt_query({"frame_timestamp": {"$gte": week, "$lt": end},
+                                                 "detections.class": {"$in": ["car", "truck", "bus"]}}),
+        "camera window, last day": adapt_query({"camera_id": "cam3", "frame_timestamp": {"$gte": day, "$lt": end}}),
+        "video frames": adapt_query({"video_id": "video5", "frame_number": {"$gte": 1000, "$lt": 2000}}),
+    }
+
+
+def _explain(coll, query):
+    stats = coll.find(query).explain()["executionStats"]
+    return {
+        "ms": stats["executionTimeMillis"],
+        "docs_examined": stats["totalDocsExamined"],
+        "keys_examined": stats["totalKeysExamined"],
+        "returned": stats["nReturned"],
+    }
+
+
+def benchmark(client, frames=10_000_000, database=BENCHMARK_DATABASE, keep=False):
+    """
+    Fill database.detected_objects with `frames` synthetic frames (schema v2,
+    BENCHMARK_CAMERAS cameras over BENCHMARK_DAYS days) and explain the
+    analytics and query tool queries without and with the registry indexes.
+    """
+    coll = client[database]["detected_objects"]
+    coll.drop()
+    end = datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=BENCHMARK_DAYS)
+    batch = []
+    t0 = time.monotonic()
+    for doc in _synthetic_frames(frames, start):
+        batch.append(doc)
+        if len(batch) >= BENCHMARK_BATCH:
+            coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+    results = {"frames": frames, "load_seconds": round(time.monotonic() - t0, 1)}
+
+    queries = _benchmark_queries(end)
+    results["without_indexes"] = {name: _explain(coll, q) for name, q in queries.items()}
+    t0 = time.monotonic()
+    ensure_indexes(client, {database: {"detected_objects": FRAME_INDEXES}})
+    results["index_build_seconds"] = round(time.monotonic() - t0, 1)
+    results["with_indexes"] = {name: _explain(coll, q) for name, q in queries.items()}
+    results["index_sizes"] = client[database].command("collstats", "detected_objects")["indexSizes"]
+    if not keep:
+        client.drop_database(database)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Provision and check the MongoDB indexes')
+    parser.add_argument('--mongo_uri', default=None)
+    parser.add_argument('--report', action='store_true', help='only report, create nothing')
+    parser.add_argument('--benchmark', nargs='?', const=10_000_000, default=None, type=int, metavar='FRAMES')
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark database')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri or os.getenv("MONGO_URI"))
+    if args.benchmark:
+        result = benchmark(client, args.benchmark, keep=args.keep)
+    elif args.report:
+        result = index_report(client)
+    else:
+        result = ensure_indexes(client)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the detection code imports its modules flat (working_yolov9.py puts these
+# directories on sys.path), so the tests do the same
+DETECTION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "detection")
+for path in (DETECTION_DIR, os.path.join(DETECTION_DIR, "util")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,74 @@
+"""ColorLUT / dominant_color against the per-pixel closest_color loop they replaced."""
+from collections import Counter
+
+import cv2
+import numpy as np
+import pytest
+
+from color_utils import ColorLUT, closest_color, dominant_color, known_colors
+
+CROPS = 300
+
+
+def reference_dominant_color(img_crop, sample_step=10, center_crop_ratio=0.5):
+    # the loop dominant_color used before the lookup table
+    image_rgb = cv2.cvtColor(img_crop, cv2.COLOR_BGR2RGB)
+    height, width, _ = image_rgb.shape
+    crop_h = int(height * center_crop_ratio)
+    crop_w = int(width * center_crop_ratio)
+    start_y = (height - crop_h) // 2
+    start_x = (width - crop_w) // 2
+    center_crop = image_rgb[start_y:start_y + crop_h, start_x:start_x + crop_w]
+
+    color_counts = Counter()
+    for y in range(0, center_crop.shape[0], sample_step):
+        for x in range(0, center_crop.shape[1], sample_step):
+            color_counts[closest_color(center_crop[y, x], known_colors)] += 1
+    for color, _ in color_counts.most_common():
+        return color
+    return None
+
+
+def random_crops(rng, n):
+    # a few flat colour patches plus noise, like clothing crops
+    for _ in range(n):
+        h, w = rng.integers(20, 160, 2)
+        crop = np.empty((h, w, 3), dtype=np.int32)
+        patches = rng.integers(0, 256, (int(rng.integers(1, 4)), 3))
+        crop[:] = patches[rng.integers(0, len(patches), (h, 1))]
+        crop += rng.integers(-25, 26, crop.shape)
+        yield np.clip(crop, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture(scope="module")
+def exact_lut():
+    return ColorLUT(bits=8)
+
+
+def test_exact_table_matches_closest_color(exact_lut):
+    rng = np.random.default_rng(0)
+    bgr = rng.integers(0, 256, (20000, 3)).astype(np.uint8)
+    labels = exact_lut.label_bgr(bgr)
+    for pixel, label in zip(bgr, labels):
+        assert exact_lut.names[label] == closest_color(pixel[::-1], known_colors)
+
+
+def test_exact_table_matches_reference_crops(exact_lut):
+    rng = np.random.default_rng(1)
+    for crop in random_crops(rng, CROPS):
+        for sample_step in (2, 10):
+            assert dominant_color(crop, sample_step, lut=exact_lut) == reference_dominant_color(crop, sample_step)
+
+
+def test_default_table_agreement():
+    # 6-bit bins are labelled by their centre, so pixels near a decision
+    # boundary may flip; whole crops should still almost always agree
+    rng = np.random.default_rng(2)
+    crops = list(random_crops(rng, CROPS))
+    agree = sum(dominant_color(crop) == reference_dominant_color(crop) for crop in crops)
+    assert agree / len(crops) >= 0.95
+
+
+def test_empty_crop():
+    assert dominant_color(np.zeros((0, 0, 3), dtype=np.uint8)) is None
+    assert dominant_color(None) is None
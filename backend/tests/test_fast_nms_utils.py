@@ -0,0 +1,96 @@
+"""fast_nms_utils must return exactly what the nms_utils loops return."""
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+import fast_nms_utils
+import nms_utils
+
+Detection = namedtuple("Detection", "category prob x y w h")
+
+CASES = 100
+
+
+def random_boxes(rng, n, size=200, max_side=60):
+    xy = rng.integers(0, size, (n, 2)).astype(np.float64)
+    wh = rng.integers(1, max_side, (n, 2)).astype(np.float64)
+    return np.concatenate([xy, xy + wh], axis=1)
+
+
+def random_scores(rng, n, sort=True, ties=False):
+    scores = rng.integers(0, 5, n) / 5 if ties else rng.random(n)
+    return -np.sort(-scores) if sort else scores
+
+
+@pytest.mark.parametrize("sort", [True, False])
+@pytest.mark.parametrize("ties", [False, True])
+def test_nms_boxes(sort, ties):
+    rng = np.random.default_rng(1)
+    for _ in range(CASES):
+        n = int(rng.integers(0, 80))
+        boxes = random_boxes(rng, n)
+        scores = random_scores(rng, n, sort, ties)
+        iou_thres = rng.uniform(0.1, 0.7)
+        expected = nms_utils.nms_boxes(boxes, scores, iou_thres)
+        np.testing.assert_array_equal(fast_nms_utils.nms_boxes(boxes, scores, iou_thres), expected)
+
+
+def test_nms_boxes_across_blocks(monkeypatch):
+    # small blocks so the carry-over between blocks is exercised
+    monkeypatch.setattr(fast_nms_utils, "NMS_BLOCK_SIZE", 16)
+    rng = np.random.default_rng(2)
+    for _ in range(CASES):
+        n = int(rng.integers(20, 120))
+        boxes = random_boxes(rng, n)
+        scores = random_scores(rng, n)
+        expected = nms_utils.nms_boxes(boxes, scores, 0.3)
+        np.testing.assert_array_equal(fast_nms_utils.nms_boxes(boxes, scores, 0.3), expected)
+
+
+@pytest.mark.parametrize("sort", [True, False])
+@pytest.mark.parametrize("ties", [False, True])
+def test_batched_nms(sort, ties):
+    rng = np.random.default_rng(3)
+    for _ in range(CASES):
+        n = int(rng.integers(1, 80))
+        boxes = random_boxes(rng, n)
+        scores = random_scores(rng, n, sort, ties)
+        labels = rng.integers(0, 4, n)
+        expected = nms_utils.batched_nms(boxes, scores, labels, 0.45)
+        np.testing.assert_array_equal(fast_nms_utils.batched_nms(boxes, scores, labels, 0.45), expected)
+
+
+def test_packed_nms():
+    rng = np.random.default_rng(4)
+    for _ in range(CASES):
+        n = int(rng.integers(1, 60))
+        boxes = random_boxes(rng, n)
+        scores = random_scores(rng, n, sort=False)
+        expected = [[int(i) for i in group] for group in nms_utils.packed_nms(boxes, scores, 0.4)]
+        actual = [[int(i) for i in group] for group in fast_nms_utils.packed_nms(boxes, scores, 0.4)]
+        assert actual == expected
+
+
+@pytest.mark.parametrize("categories", [None, [0, 2]])
+def test_nms_between_categories(categories):
+    rng = np.random.default_rng(5)
+    for _ in range(CASES):
+        n = int(rng.integers(0, 40))
+        detections = [
+            Detection(int(rng.integers(0, 4)), float(rng.integers(0, 10)) / 10,
+                      float(rng.random()) * 0.8, float(rng.random()) * 0.8,
+                      float(rng.uniform(0.02, 0.3)), float(rng.uniform(0.02, 0.3)))
+            for _ in range(n)
+        ]
+        expected = nms_utils.nms_between_categories(detections, 640, 480, categories, 0.25)
+        actual = fast_nms_utils.nms_between_categories(detections, 640, 480, categories, 0.25)
+        assert [id(d) for d in actual] == [id(d) for d in expected]
+
+
+def test_empty():
+    boxes = np.zeros((0, 4))
+    scores = np.zeros(0)
+    assert len(fast_nms_utils.nms_boxes(boxes, scores, 0.5)) == 0
+    assert len(fast_nms_utils.batched_nms(boxes, scores, np.zeros(0, dtype=int), 0.5)) == 0
+    assert fast_nms_utils.packed_nms(boxes, scores, 0.5) == []
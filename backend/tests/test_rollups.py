@@ -0,0 +1,57 @@
+"""Rollup unique-track sketches."""
+import datetime
+
+from detection_schema import encode_detection, encode_frame
+from hyperloglog import HyperLogLog
+from rollups import RollupAccumulator
+
+HOUR = datetime.datetime(2025, 4, 17, 10)
+TOLERANCE = 0.05   # HyperLogLog estimates, 1.6% standard error
+
+
+def frames(run_id, tracking_ids, compact=False, minute=0):
+    # one frame per tracking id, all on camera "cam1" whose video_id is the camera
+    ts = HOUR + datetime.timedelta(minutes=minute)
+    for k, tracking_id in enumerate(tracking_ids):
+        if compact:
+            yield encode_frame("cam1", "cam1", ts, k, [encode_detection("person", 0.9, tracking_id)],
+                               [(0, 0, 10, 10)], run_id=run_id)
+        else:
+            yield {"video_id": "cam1", "camera_id": "cam1", "run_id": run_id, "frame_timestamp": ts,
+                   "frame_number": k, "detections": [{"class": "person", "tracking_id": tracking_id}]}
+
+
+def unique_persons(acc):
+    sketch = HyperLogLog()
+    for (_, _, class_name), row in acc.rows.items():
+        if class_name == "person":
+            sketch.update(row["hll"])
+    return sketch.count()
+
+
+def approx(n):
+    return range(int(n * (1 - TOLERANCE)), int(n * (1 + TOLERANCE)) + 1)
+
+
+def test_runs_of_one_camera_do_not_collide():
+    # two scheduled runs of the same camera, both numbering their tracks from 0
+    acc = RollupAccumulator()
+    acc.add(frames("run-a", range(50)))
+    acc.add(frames("run-b", range(50), compact=True, minute=30))
+    assert unique_persons(acc) in approx(100)
+
+
+def test_repeated_frames_of_one_run_count_once():
+    acc = RollupAccumulator()
+    acc.add(frames("run-a", range(50)))
+    acc.add(frames("run-a", range(50), minute=1))
+    assert unique_persons(acc) in approx(50)
+
+
+def test_frames_without_run_id_fall_back_to_video_id():
+    docs = list(frames(None, range(20)))
+    for doc in docs:
+        del doc["run_id"]
+    acc = RollupAccumulator()
+    acc.add(docs)
+    assert unique_persons(acc) in approx(20)
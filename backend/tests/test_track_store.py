@@ -0,0 +1,56 @@
+"""Track summaries and the frame query -> track query translation."""
+import datetime
+from collections import namedtuple
+
+from track_store import TrackRecorder, to_track_query
+
+Detection = namedtuple("Detection", "prob")
+T0 = datetime.datetime(2025, 4, 17, 17)
+
+
+class ListWriter(list):
+    write = list.append
+
+
+def person_query(**conditions):
+    return {"camera_id": "cam1", "frame_timestamp": {"$gte": T0},
+            "detections": {"$elemMatch": {"class": "person", **conditions}}}
+
+
+def test_boolean_attributes_translate():
+    assert to_track_query(person_query(**{"attributes.is_male": False, "attributes.has_bag": {"$eq": True}})) == {
+        "camera_id": "cam1", "last_seen": {"$gte": T0}, "class": "person",
+        "attributes.is_male": False, "attributes.has_bag": {"$eq": True},
+    }
+
+
+def test_numeric_attribute_conditions_fall_back_to_frames():
+    # tracks only keep a boolean per attribute, which a score threshold never matches
+    assert to_track_query(person_query(**{"attributes.is_male": {"$gt": 0.5}})) is None
+    assert to_track_query(person_query(**{"attributes.is_male": 1})) is None
+    assert to_track_query(person_query(**{"attributes.has_hat": {"$ne": True}})) is None
+
+
+def test_colours_fall_back_to_frames():
+    # a track keeps its most frequent colour, frames every colour seen
+    assert to_track_query(person_query(**{"attributes.top_color": "Red"})) is None
+
+
+def test_other_classes_are_not_tracked():
+    assert to_track_query({"detections": {"$elemMatch": {"class": "car"}}}) is None
+    assert to_track_query({"detections.class": "person"}) == {"class": "person"}
+
+
+def test_track_summary():
+    writer = ListWriter()
+    recorder = TrackRecorder(writer, "video1", "cam1", {"frame_step": 1, "source_fps": 30.0}, run_id="run1")
+    for k, score in enumerate([0.9, 0.8, 0.2]):
+        recorder.observe(k, T0 + datetime.timedelta(seconds=k), [7],
+                         [(Detection(0.5 + k / 10), (10 * k, 0, 20, 40), None,
+                           {"is_male": score, "top_color": "Red" if k else "Blue"})])
+    recorder.close()
+    [doc] = writer
+    assert (doc["run_id"], doc["tracking_id"], doc["first_frame"], doc["last_frame"]) == ("run1", 7, 0, 2)
+    assert doc["attribute_scores"] == {"is_male": round(1.9 / 3, 4)}
+    assert doc["attributes"] == {"is_male": True, "top_color": "Red"}
+    assert doc["max_confidence"] == 0.7
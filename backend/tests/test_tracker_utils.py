@@ -0,0 +1,48 @@
+"""Tracker association and interpolate_boxes."""
+import numpy as np
+
+from tracker_utils import Tracker, interpolate_boxes
+
+
+def test_ids_follow_moving_boxes():
+    tracker = Tracker()
+    boxes = np.array([[100, 100, 40, 100], [400, 100, 40, 100], [700, 300, 40, 100]], dtype=float)
+    velocity = np.array([[6, 0, 0, 0], [-6, 2, 0, 0], [0, -5, 0, 0]], dtype=float)
+    first = tracker.update(boxes)
+    assert sorted(first) == [0, 1, 2]
+    for _ in range(30):
+        boxes += velocity
+        # detections arrive in a different order every frame
+        order = np.random.default_rng(len(tracker.ids)).permutation(3)
+        assignments = tracker.update(boxes[order])
+        assert {int(order[det]): tid for det, tid in assignments.items()} == first
+
+
+def test_fast_motion_matches_by_prediction():
+    # 45 px per frame never overlaps the last box: the first step matches by
+    # centroid distance, the later ones by the predicted box
+    tracker = Tracker()
+    box = np.array([[0, 0, 40, 100]], dtype=float)
+    ids = set()
+    for step in range(10):
+        ids.update(tracker.update(box + [[45 * step, 0, 0, 0]]).values())
+    assert ids == {0}
+
+
+def test_stale_tracks_are_removed():
+    tracker = Tracker(max_disappeared=2)
+    tracker.update([(0, 0, 10, 10)])
+    for _ in range(2):
+        tracker.update([])
+        assert tracker.removed == []
+    tracker.update([])
+    assert tracker.removed == [0]
+    assert tracker.objects == {}
+    assert tracker.update([(0, 0, 10, 10)]) == {0: 1}
+
+
+def test_interpolate_boxes():
+    frames = interpolate_boxes({1: (0, 0, 10, 10), 2: (5, 5, 5, 5)}, {1: (30, 0, 10, 40)}, 3)
+    assert frames == [{1: (10, 0, 10, 20)}, {1: (20, 0, 10, 30)}]
+    assert interpolate_boxes({1: (0, 0, 1, 1)}, {2: (0, 0, 1, 1)}, 3) == [{}, {}]
+    assert interpolate_boxes({1: (0, 0, 1, 1)}, {1: (0, 0, 1, 1)}, 1) == []